@@ -1,7 +1,8 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django_admin_listfilter_dropdown.filters import RelatedDropdownFilter
 
-from core.models import Product, ProductSharingRequest, ProductBoMLineItem, Emission
+from core.models import Product, ProductSharingRequest, ProductBoMLineItem, Emission, ProductEmissionCache
 from core.models.product import ProductEmissionOverrideFactor
 
 
@@ -63,6 +64,58 @@ class ProductSharingRequestInline(admin.TabularInline):
     fields = ("requester", "status", "created_at")
     readonly_fields = ("created_at",)
 
+class EmissionTotalListFilter(admin.SimpleListFilter):
+    """
+    Filters products by ranges of their emission total, using the indexed summary column of their cache entry.
+    """
+
+    title = "total emissions"
+    parameter_name = "emission_total"
+    # key = parameter value; value = (label, lower bound, upper bound)
+    RANGES = {
+        "lt1": ("Less than 1", None, 1),
+        "1-10": ("1 to 10", 1, 10),
+        "10-100": ("10 to 100", 10, 100),
+        "100-1000": ("100 to 1000", 100, 1000),
+        "gte1000": ("1000 or more", 1000, None),
+    }
+
+    def lookups(self, request, model_admin):
+        """
+        Returns the ranges to filter by.
+        """
+        return [(value, label) for value, (label, _, _) in self.RANGES.items()]
+
+    def queryset(self, request, queryset):
+        """
+        Filters the products by the selected range.
+        """
+        if self.value() not in self.RANGES:
+            return queryset
+        _, lower, upper = self.RANGES[self.value()]
+        if lower is not None:
+            queryset = queryset.filter(emission_cache__emission_total__gte=lower)
+        if upper is not None:
+            queryset = queryset.filter(emission_cache__emission_total__lt=upper)
+        return queryset
+
+class ProductChangeList(ChangeList):
+    """
+    Change list of products that brings the cache entries of the listed products up to date at once, before they are
+     filtered and ordered by the summary columns of their cache entries.
+    """
+
+    def get_queryset(self, request, exclude_parameters=None):
+        """
+        Recomputes the stale cache entries of the products selected by the search and the other filters in a single
+         pass (see ProductEmissionCache.validate_all), then filters and orders them.
+        """
+        if exclude_parameters is None:
+            ProductEmissionCache.validate_all(
+                super().get_queryset(request, exclude_parameters=[EmissionTotalListFilter.parameter_name])
+            )
+        return super().get_queryset(request, exclude_parameters)
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     """
@@ -71,16 +124,40 @@ class ProductAdmin(admin.ModelAdmin):
 
     model = Product
     list_display = ("name", "supplier", "manufacturer_name", "sku", "is_public", "get_emission_total",
-                    "get_emission_total_non_biogenic", "get_emission_total_biogenic")
+                    "get_emission_total_non_biogenic", "get_emission_total_biogenic", "get_line_item_count",
+                    "get_emission_count")
+    list_select_related = ("supplier", "emission_cache")
     search_fields = ("name", "supplier__name", "manufacturer_name", "sku",)
     ordering = ("name",)
     list_filter = (
         ("supplier", RelatedDropdownFilter),
         ("is_public", admin.BooleanFieldListFilter),
+        EmissionTotalListFilter,
     )
     inlines = [ProductSharingRequestInline, ProductBoMLineItemInline,
                ProductBoMLineItemUsedInInline, ProductEmissionOverrideFactorInline]
 
+    def get_changelist(self, request, **kwargs):
+        """
+        Returns the change list that validates the cache entries of the listed products before using them.
+        """
+        return ProductChangeList
+
+    def _get_emission_cache(self, product:Product) -> ProductEmissionCache:
+        """
+        Returns the cache entry loaded with the product, recomputing it only if it has been invalidated since.
+
+        Args:
+            product: Product object.
+        Returns:
+            valid ProductEmissionCache object for the Product
+        """
+
+        entry = getattr(product, "emission_cache", None)
+        if entry is None or not entry.is_valid:
+            entry = ProductEmissionCache.get_for_product(product)
+        return entry
+
     def get_emission_total(self, product:Product) -> float:
         """
         Returns the emission total for provided Product object.
@@ -91,8 +168,9 @@ class ProductAdmin(admin.ModelAdmin):
             total emission of the Product object
         """
 
-        return product.get_emission_trace().total
+        return self._get_emission_cache(product).total
     get_emission_total.short_description = "Total emissions"
+    get_emission_total.admin_order_field = "emission_cache__emission_total"
 
     def get_emission_total_non_biogenic(self, product:Product) -> float:
         """
@@ -104,8 +182,9 @@ class ProductAdmin(admin.ModelAdmin):
             total non-biogenic emission of the Product object
         """
 
-        return product.get_emission_trace().total_non_biogenic
+        return self._get_emission_cache(product).total_non_biogenic
     get_emission_total_non_biogenic.short_description = "Total non-biogenic emissions"
+    get_emission_total_non_biogenic.admin_order_field = "emission_cache__emission_total_non_biogenic"
 
     def get_emission_total_biogenic(self, product:Product) -> float:
         """
@@ -117,5 +196,34 @@ class ProductAdmin(admin.ModelAdmin):
             total biogenic emission of the Product object
         """
 
-        return product.get_emission_trace().total_biogenic
-    get_emission_total_biogenic.short_description = "Total biogenic emissions"
\ No newline at end of file
+        return self._get_emission_cache(product).total_biogenic
+    get_emission_total_biogenic.short_description = "Total biogenic emissions"
+    get_emission_total_biogenic.admin_order_field = "emission_cache__emission_total_biogenic"
+
+    def get_line_item_count(self, product:Product) -> int:
+        """
+        Returns the number of BoM line items of provided Product object.
+
+        Args:
+            product: Product object.
+        Returns:
+            number of BoM line items of the Product object
+        """
+
+        return self._get_emission_cache(product).line_item_count
+    get_line_item_count.short_description = "BoM line items"
+    get_line_item_count.admin_order_field = "emission_cache__line_item_count"
+
+    def get_emission_count(self, product:Product) -> int:
+        """
+        Returns the number of emissions of provided Product object.
+
+        Args:
+            product: Product object.
+        Returns:
+            number of emissions of the Product object
+        """
+
+        return self._get_emission_cache(product).emission_count
+    get_emission_count.short_description = "Emissions"
+    get_emission_count.admin_order_field = "emission_cache__emission_count"
\ No newline at end of file
@@ -0,0 +1,77 @@
+from typing import List
+
+from django_filters import rest_framework as filters
+
+from core.models import Product
+
+
+class ProductFilter(filters.FilterSet):
+    """
+    Filters products by their fields, and by ranges of their PCF and BoM size using the summary columns of their
+     cache entries (see ProductEmissionCache), e.g. `?emission_total_min=10&emission_total_max=100`. Products can be
+     ordered by the same columns, e.g. `?ordering=-emission_total`. There are no summary columns per lifecycle stage,
+     so products cannot be filtered or ordered by the emissions of a single stage.
+    """
+
+    # Names of the filters and orderings that read the summary columns
+    SUMMARY_FIELDS = (
+        "emission_total",
+        "emission_total_biogenic",
+        "emission_total_non_biogenic",
+        "line_item_count",
+        "emission_count",
+    )
+
+    emission_total = filters.RangeFilter(field_name="emission_cache__emission_total")
+    emission_total_biogenic = filters.RangeFilter(field_name="emission_cache__emission_total_biogenic")
+    emission_total_non_biogenic = filters.RangeFilter(field_name="emission_cache__emission_total_non_biogenic")
+    line_item_count = filters.RangeFilter(field_name="emission_cache__line_item_count")
+    emission_count = filters.RangeFilter(field_name="emission_cache__emission_count")
+    ordering = filters.OrderingFilter(
+        fields=(
+            ("name", "name"),
+            ("sku", "sku"),
+            *((f"emission_cache__{field}", field) for field in SUMMARY_FIELDS),
+        ),
+    )
+
+    class Meta:
+        model = Product
+        fields = ["name", "description", "manufacturer_name", "sku", "is_public"]
+
+    @classmethod
+    def uses_summary(cls, query_params) -> bool:
+        """
+        Checks if a request filters or orders products by the summary columns of their cache entries.
+
+        Args:
+            query_params: query parameters of the request
+        Returns:
+            True if any summary column is used
+        """
+
+        ordering = {term.strip().lstrip("-") for term in query_params.get("ordering", "").split(",")}
+        return any(
+            field in ordering or f"{field}_min" in query_params or f"{field}_max" in query_params
+            for field in cls.SUMMARY_FIELDS
+        )
+
+    @classmethod
+    def get_ordering(cls, query_params) -> List[str]:
+        """
+        Returns the model fields a request orders products by with the `ordering` parameter.
+
+        Args:
+            query_params: query parameters of the request
+        Returns:
+            list of model field names, descending ones prefixed with "-"
+        """
+
+        param_map = cls.base_filters["ordering"].param_map
+        ordering = []
+        for term in query_params.get("ordering", "").split(","):
+            term = term.strip()
+            field = param_map.get(term.lstrip("-"))
+            if field is not None:
+                ordering.append(f"-{field}" if term.startswith("-") else field)
+        return ordering
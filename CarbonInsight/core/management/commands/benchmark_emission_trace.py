@@ -0,0 +1,259 @@
+import sys
+import time
+from collections import defaultdict, deque
+from typing import List
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Company, Product, ProductBoMLineItem, ProductEmissionCache, TransportEmission, \
+    TransportEmissionReference, TransportEmissionReferenceFactor
+from core.models.lifecycle_stage import LifecycleStage
+from core.serializers.emission_trace_serializer import EmissionTraceSerializer
+from core.services import bom_closure
+from core.services.bom_graph import BoMGraph, cumulative_use_counts
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the emission trace engine on a deep chain of products, and the use counts of a product on a DAG with
+     many paths.
+
+    The chain is created inside a transaction that is rolled back afterwards, so the database is left untouched.
+    """
+
+    help = "Benchmarks the emission trace engine on a deep chain of products (changes are rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--depth", type=int, default=2000, help="Number of products in the chain")
+        parser.add_argument("--layers", type=int, default=16,
+                            help="Number of layers of the DAG used to benchmark cumulative use counts")
+        parser.add_argument("--width", type=int, default=5000,
+                            help="Number of line items of the product used to benchmark serializing its trace")
+
+    def handle(self, *args, **options):
+        depth = options["depth"]
+        with transaction.atomic():
+            chain = self._create_chain(depth)
+            root = chain[0]
+            self.stdout.write(f"Chain of {depth} products (recursion limit {sys.getrecursionlimit()})")
+            # Bulk creation bypasses the signals that maintain the BoM closure used for cycle checks
+            self._measure("BoM closure rebuild", bom_closure.rebuild)
+
+            graph = BoMGraph.load([root.pk])
+            self._measure("Recursive evaluation (before)", lambda: self._evaluate_recursively(graph, root.pk))
+
+            graph = BoMGraph.load([root.pk])
+            self._measure("Iterative evaluation", lambda: graph.get_emission_totals(root.pk))
+            self._measure("Product.get_emission_totals", root.get_emission_totals)
+            trace = self._measure("Product.get_emission_trace", root.get_emission_trace)
+            if trace is not None:
+                self._measure("EmissionTraceSerializer", lambda: EmissionTraceSerializer(trace).data)
+            self._measure("Cycle check", ProductBoMLineItem(
+                parent_product=root, line_item_product=root.line_items.get().line_item_product, quantity=1
+            )._creates_cycle)
+            self._benchmark_delta_propagation(chain)
+            self._benchmark_use_counts(options["layers"])
+            self._benchmark_serialization(options["width"])
+
+            transaction.set_rollback(True)
+
+    def _create_chain(self, depth: int) -> List[Product]:
+        """
+        Creates a chain of products where every product uses the next one.
+
+        Args:
+            depth: number of products in the chain
+        Returns:
+            products of the chain, starting with the one using all others
+        """
+
+        supplier = Company.objects.create(
+            name="Benchmark supplier",
+            vat_number="BENCHMARK",
+            business_registration_number="BENCHMARK",
+        )
+        chain = Product.objects.bulk_create([
+            Product(name=f"Stage {index}", description="Benchmark", supplier=supplier, year_of_construction=2025)
+            for index in range(depth)
+        ])
+        ProductBoMLineItem.objects.bulk_create([
+            ProductBoMLineItem(parent_product=parent, line_item_product=child, quantity=1)
+            for parent, child in zip(chain, chain[1:])
+        ])
+        return chain
+
+    def _benchmark_delta_propagation(self, chain: List[Product]):
+        """
+        Measures how long it takes to update the materialized PCF of the whole chain after an emission of the last
+         product changes, propagated as a delta and recomputed from scratch.
+
+        Args:
+            chain: products of the chain, starting with the one using all others
+        """
+
+        root, leaf = chain[0], chain[-1]
+        totals = BoMGraph.load([root.pk]).get_all_emission_totals([product.pk for product in chain])
+        entries = []
+        for product in chain:
+            entry = ProductEmissionCache(product=product, is_valid=True)
+            entry._set_emissions_subtotal(totals[product.pk])
+            entries.append(entry)
+        ProductEmissionCache.objects.bulk_create(entries)
+
+        reference = TransportEmissionReference.objects.create(common_name="Benchmark transport")
+        TransportEmissionReferenceFactor.objects.create(
+            emission_reference=reference,
+            lifecycle_stage=LifecycleStage.A4,
+            co_2_emission_factor_non_biogenic=0.1,
+        )
+        emission = TransportEmission(parent_product=leaf, distance=100, weight=1, reference=reference)
+        self._measure("Delta propagation (create)", emission.save)
+        emission.weight = 2
+        self._measure("Delta propagation (update)", emission.save)
+        self._measure("Full recompute of the root", lambda: (
+            ProductEmissionCache.invalidate([leaf.pk]),
+            ProductEmissionCache.get_for_product(root),
+        ))
+
+    def _benchmark_use_counts(self, layers: int):
+        """
+        Measures how long it takes to count how many times the product of a company is used, on a DAG of layers of
+         two products where every product uses both products of the next layer, so the number of paths doubles with
+         every layer.
+
+        Args:
+            layers: number of layers of the DAG
+        """
+
+        supplier = Company.objects.create(
+            name="Benchmark leaf supplier",
+            vat_number="BENCHMARK-LEAF",
+            business_registration_number="BENCHMARK-LEAF",
+        )
+        assembler = Company.objects.create(
+            name="Benchmark assembler",
+            vat_number="BENCHMARK-DAG",
+            business_registration_number="BENCHMARK-DAG",
+        )
+        leaf = Product.objects.create(name="Leaf", description="Benchmark", supplier=supplier,
+                                      year_of_construction=2025)
+        dag = [[leaf]] + [
+            Product.objects.bulk_create([
+                Product(name=f"Layer {index} {side}", description="Benchmark", supplier=assembler,
+                        year_of_construction=2025)
+                for side in ("left", "right")
+            ])
+            for index in range(layers)
+        ]
+        ProductBoMLineItem.objects.bulk_create([
+            ProductBoMLineItem(parent_product=parent, line_item_product=child, quantity=1)
+            for children, parents in zip(dag, dag[1:])
+            for parent in parents
+            for child in children
+        ])
+
+        self.stdout.write(f"DAG of {layers} layers ({2 ** (layers + 1) - 2} paths from the leaf)")
+        self._measure("Use counts by path (before)", lambda: self._count_uses_by_path(supplier))
+        self._measure("Use counts in topological order", lambda: cumulative_use_counts(
+            supplier.products.values_list("id", flat=True)
+        ))
+
+    def _benchmark_serialization(self, width: int):
+        """
+        Measures how long it takes to serialize the emission trace of a product with many line items and emissions,
+         whose trace has a node per line item and two per emission.
+
+        Args:
+            width: number of line items of the product
+        """
+
+        supplier = Company.objects.create(
+            name="Benchmark wide supplier",
+            vat_number="BENCHMARK-WIDE",
+            business_registration_number="BENCHMARK-WIDE",
+        )
+        root = Product.objects.create(name="Wide", description="Benchmark", supplier=supplier,
+                                      year_of_construction=2025)
+        ProductBoMLineItem.objects.bulk_create([
+            ProductBoMLineItem(parent_product=root, line_item_product=line_item_product, quantity=1)
+            for line_item_product in Product.objects.bulk_create([
+                Product(name=f"Part {index}", description="Benchmark", supplier=supplier, year_of_construction=2025)
+                for index in range(width)
+            ])
+        ])
+        reference = TransportEmissionReference.objects.create(common_name="Benchmark wide transport")
+        TransportEmissionReferenceFactor.objects.create(
+            emission_reference=reference,
+            lifecycle_stage=LifecycleStage.A4,
+            co_2_emission_factor_non_biogenic=0.1,
+        )
+        for index in range(width // 10):
+            TransportEmission.objects.create(parent_product=root, distance=index, weight=1, reference=reference)
+
+        trace = root.get_emission_trace()
+        self.stdout.write(f"Trace of a product with {width} line items and {width // 10} emissions")
+        data = self._measure("EmissionTraceSerializer (wide)", lambda: EmissionTraceSerializer(trace).data)
+        self._measure("JSONRenderer (wide)", lambda: JSONRenderer().render(data))
+
+    def _count_uses_by_path(self, company: Company):
+        """
+        Counts how many times every product of a company is used the way Company.total_emissions_across_products did
+         before, walking up every path from the product.
+
+        Args:
+            company: Company object
+        Returns:
+            dictionary of product id to cumulative quantity it is used in
+        """
+
+        adjacency = defaultdict(list)
+        for row in ProductBoMLineItem.objects.values("parent_product_id", "line_item_product_id", "quantity"):
+            adjacency[row["line_item_product_id"]].append((row["parent_product_id"], row["quantity"]))
+        supplied_ids = set(company.products.values_list("id", flat=True))
+        use_counts = {}
+        for product_id in supplied_ids:
+            use_counts[product_id] = 0.0
+            queue = deque([(product_id, 1.0)])
+            while queue:
+                node_id, multiplier = queue.popleft()
+                for parent_id, quantity in adjacency[node_id]:
+                    if parent_id in supplied_ids:
+                        continue
+                    use_counts[product_id] += multiplier * quantity
+                    queue.append((parent_id, multiplier * quantity))
+        return use_counts
+
+    def _evaluate_recursively(self, graph: BoMGraph, product_id: int):
+        """
+        Evaluates a product the way the trace engine did before, recursing into every line item product first.
+
+        Args:
+            graph: loaded BoMGraph
+            product_id: id of the product to evaluate
+        """
+
+        for line_item_product_id in graph._evaluated_line_item_product_ids(product_id):
+            self._evaluate_recursively(graph, line_item_product_id)
+        return graph.get_emission_totals(product_id)
+
+    def _measure(self, label: str, function):
+        """
+        Runs a function once and writes its duration, or the error it raised.
+
+        Args:
+            label: name of the measurement
+            function: function to measure
+        Returns:
+            result of the function or None if it failed
+        """
+
+        start = time.perf_counter()
+        try:
+            result = function()
+        except RecursionError:
+            self.stdout.write(f"{label:<32} RecursionError")
+            return None
+        self.stdout.write(f"{label:<32} {(time.perf_counter() - start) * 1000:10.1f} ms")
+        return result
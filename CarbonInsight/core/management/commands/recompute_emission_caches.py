@@ -0,0 +1,92 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import F
+
+from core.models import Product, ProductEmissionCache
+from core.services.bulk_recompute import calculate_subtotals, chunks, init_worker, topological_levels
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the materialized PCF of all products, level by level of the BoM graph.
+
+    The products of a level never depend on each other, so every level is split into chunks that are evaluated in
+     parallel by a pool of worker processes. Workers only read, using the already stored PCFs of the previous levels,
+     and the results are written back by this process with one bulk update per chunk. Products that a worker could
+     not evaluate, since the stored PCF of a line item product was invalidated meanwhile, are recomputed with their
+     BoMs by this process after the level. Entries that are still valid
+     are skipped, so an interrupted run continues where it stopped when the command is run again.
+    """
+
+    help = "Recomputes the materialized PCF of all products in parallel, skipping valid entries unless --force."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Number of worker processes, 1 to compute in this process")
+        parser.add_argument("--chunk-size", type=int, default=200, help="Number of products evaluated per task")
+        parser.add_argument("--force", action="store_true", help="Invalidate all entries before recomputing")
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        chunk_size = options["chunk_size"]
+        if workers < 1 or chunk_size < 1:
+            raise CommandError("--workers and --chunk-size must be at least 1.")
+
+        if options["force"]:
+            # The stored PCFs may be outdated by changes that bypassed the signals, so ETags must not match either
+            ProductEmissionCache.objects.update(
+                is_valid=False, version=F("version") + 1, content_version=F("content_version") + 1
+            )
+        existing = set(ProductEmissionCache.objects.values_list("product_id", flat=True))
+        ProductEmissionCache.objects.bulk_create(
+            [
+                ProductEmissionCache(product_id=product_id)
+                for product_id in Product.objects.values_list("id", flat=True)
+                if product_id not in existing
+            ],
+            ignore_conflicts=True,
+        )
+        invalid = set(ProductEmissionCache.objects.filter(is_valid=False).values_list("product_id", flat=True))
+        levels = topological_levels()
+        self.stdout.write(f"{len(invalid)} products to recompute in {len(levels)} levels with {workers} workers")
+
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker) if workers > 1 else None
+        done = 0
+        start = time.perf_counter()
+        try:
+            for index, level in enumerate(levels):
+                product_ids = [product_id for product_id in level if product_id in invalid]
+                if not product_ids:
+                    continue
+                level_start = time.perf_counter()
+                if executor is None:
+                    results = map(calculate_subtotals, chunks(product_ids, chunk_size))
+                else:
+                    # Workers are forked on demand, so they must not inherit an open connection of this process
+                    connections.close_all()
+                    results = executor.map(calculate_subtotals, chunks(product_ids, chunk_size))
+                skipped = []
+                for subtotals, versions, unavailable in results:
+                    ProductEmissionCache.store_many(subtotals, versions)
+                    done += len(subtotals)
+                    skipped.extend(unavailable)
+                if skipped:
+                    ProductEmissionCache.validate_all(Product.objects.filter(pk__in=skipped))
+                    done += len(skipped)
+                elapsed = time.perf_counter() - level_start
+                self.stdout.write(
+                    f"Level {index + 1}/{len(levels)}: {len(product_ids)} products in {elapsed:.2f} s "
+                    f"({len(product_ids) / elapsed:.0f} products/s), {done}/{len(invalid)} done"
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed {done} products in {elapsed:.2f} s ({done / elapsed if elapsed else 0:.0f} products/s)"
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_alter_emission_pcf_calculation_method_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductEmissionCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('emissions_subtotal', models.JSONField(default=dict)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('is_valid', models.BooleanField(default=False)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='emission_cache', to='core.product')),
+            ],
+            options={
+                'verbose_name': 'Product emission cache',
+                'verbose_name_plural': 'Product emission caches',
+            },
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:57
+
+from collections import defaultdict, deque
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def closure_rows(line_items):
+    """
+    Calculates the transitive closure of the BoM graph as of this migration, with one row per ancestor, descendant and
+     depth, in topological order starting with the products that have no line items.
+    """
+
+    line_items_of = defaultdict(list)
+    parents = defaultdict(list)
+    for parent_id, child_id, quantity in line_items:
+        line_items_of[parent_id].append((child_id, quantity))
+        parents[child_id].append(parent_id)
+
+    pending = {product_id: len(line_items_of[product_id]) for product_id in set(line_items_of) | set(parents)}
+    queue = deque(product_id for product_id, count in pending.items() if count == 0)
+    descendants = {}
+    rows = {}
+    while queue:
+        product_id = queue.popleft()
+        product_descendants = defaultdict(lambda: [0, 0.0])
+        for child_id, quantity in line_items_of[product_id]:
+            row = product_descendants[(child_id, 1)]
+            row[0] += 1
+            row[1] += quantity
+            for (descendant_id, depth), (path_count, cumulative_quantity) in descendants[child_id].items():
+                row = product_descendants[(descendant_id, depth + 1)]
+                row[0] += path_count
+                row[1] += quantity * cumulative_quantity
+        descendants[product_id] = product_descendants
+        for (descendant_id, depth), row in product_descendants.items():
+            rows[(product_id, descendant_id, depth)] = row
+        for parent_id in parents[product_id]:
+            pending[parent_id] -= 1
+            if pending[parent_id] == 0:
+                queue.append(parent_id)
+    return rows
+
+
+def build_closure(apps, schema_editor):
+    ProductBoMLineItem = apps.get_model("core", "ProductBoMLineItem")
+    ProductBoMClosure = apps.get_model("core", "ProductBoMClosure")
+    rows = closure_rows(ProductBoMLineItem.objects.values_list("parent_product_id", "line_item_product_id", "quantity"))
+    ProductBoMClosure.objects.bulk_create([
+        ProductBoMClosure(
+            ancestor_id=ancestor_id,
+            descendant_id=descendant_id,
+            depth=depth,
+            path_count=path_count,
+            cumulative_quantity=cumulative_quantity,
+        )
+        for (ancestor_id, descendant_id, depth), (path_count, cumulative_quantity) in rows.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_referencedataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductBoMClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('path_count', models.PositiveBigIntegerField()),
+                ('cumulative_quantity', models.FloatField()),
+                ('ancestor', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='bom_descendant_closures', to='core.product')),
+                ('descendant', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='bom_ancestor_closures', to='core.product')),
+            ],
+            options={
+                'verbose_name': 'Product BoM closure',
+                'verbose_name_plural': 'Product BoM closures',
+                'unique_together': {('ancestor', 'descendant', 'depth')},
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:42
+
+import sys
+from array import array
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Lifecycle stages as of this migration, in the order of the LifecycleStage enum
+LIFECYCLE_STAGES = [
+    "A1", "A2", "A3", "A4", "A5", "A1-A3", "A4-A5", "B1", "B2", "B3", "B4", "B5", "B6", "B7", "B1-B7", "C1", "C2", "C3",
+    "C4", "C1-C4", "C2-C4", "D", "Other",
+]
+
+
+def pack_emissions(emissions_subtotal):
+    """
+    Packs emissions into a bitmask of the present lifecycle stages and the little-endian doubles of their biogenic and
+     non-biogenic emissions, like core.models.product_emission_snapshot.pack_emissions as of this migration.
+    """
+
+    mask = 0
+    values = array("d")
+    for index, stage in enumerate(LIFECYCLE_STAGES):
+        if stage in emissions_subtotal:
+            mask |= 1 << index
+            values.extend(emissions_subtotal[stage])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return mask, values.tobytes()
+
+
+def record_current_values(apps, schema_editor):
+    ProductEmissionCache = apps.get_model("core", "ProductEmissionCache")
+    ProductEmissionSnapshot = apps.get_model("core", "ProductEmissionSnapshot")
+    snapshots = []
+    for entry in ProductEmissionCache.objects.filter(computed_at__isnull=False).iterator():
+        stage_mask, emissions = pack_emissions(entry.emissions_subtotal)
+        snapshots.append(ProductEmissionSnapshot(
+            product_id=entry.product_id,
+            recorded_at=entry.computed_at,
+            stage_mask=stage_mask,
+            emissions=emissions,
+        ))
+    ProductEmissionSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_productbomclosure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductEmissionSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField()),
+                ('stage_mask', models.PositiveIntegerField()),
+                ('emissions', models.BinaryField()),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='emission_snapshots', to='core.product')),
+            ],
+            options={
+                'verbose_name': 'Product emission snapshot',
+                'verbose_name_plural': 'Product emission snapshots',
+                'indexes': [models.Index(fields=['product', 'recorded_at'], name='core_produc_product_ff506e_idx')],
+            },
+        ),
+        migrations.RunPython(record_current_values, migrations.RunPython.noop),
+    ]
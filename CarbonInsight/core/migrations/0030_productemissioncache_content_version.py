@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_productemissionsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productemissioncache',
+            name='content_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:28
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_summaries(apps, schema_editor):
+    Product = apps.get_model("core", "Product")
+    ProductEmissionCache = apps.get_model("core", "ProductEmissionCache")
+    existing = set(ProductEmissionCache.objects.values_list("product_id", flat=True))
+    ProductEmissionCache.objects.bulk_create(
+        [ProductEmissionCache(product_id=product_id)
+         for product_id in Product.objects.values_list("id", flat=True) if product_id not in existing],
+        batch_size=1000,
+    )
+    counts = {
+        product_id: (line_item_count, emission_count)
+        for product_id, line_item_count, emission_count in Product.objects.annotate(
+            line_item_count=Count("line_items", distinct=True),
+            emission_count=Count("emissions", distinct=True),
+        ).values_list("id", "line_item_count", "emission_count")
+    }
+    entries = list(ProductEmissionCache.objects.all())
+    for entry in entries:
+        biogenic = sum(biogenic for biogenic, _ in entry.emissions_subtotal.values())
+        non_biogenic = sum(non_biogenic for _, non_biogenic in entry.emissions_subtotal.values())
+        entry.emission_total = biogenic + non_biogenic
+        entry.emission_total_biogenic = biogenic
+        entry.emission_total_non_biogenic = non_biogenic
+        entry.line_item_count, entry.emission_count = counts[entry.product_id]
+    ProductEmissionCache.objects.bulk_update(
+        entries,
+        ["emission_total", "emission_total_biogenic", "emission_total_non_biogenic", "line_item_count",
+         "emission_count"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_productemissioncache_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productemissioncache',
+            name='emission_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='productemissioncache',
+            name='emission_total',
+            field=models.FloatField(db_index=True, default=0.0),
+        ),
+        migrations.AddField(
+            model_name='productemissioncache',
+            name='emission_total_biogenic',
+            field=models.FloatField(db_index=True, default=0.0),
+        ),
+        migrations.AddField(
+            model_name='productemissioncache',
+            name='emission_total_non_biogenic',
+            field=models.FloatField(db_index=True, default=0.0),
+        ),
+        migrations.AddField(
+            model_name='productemissioncache',
+            name='line_item_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
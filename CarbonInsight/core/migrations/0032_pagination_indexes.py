@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_productemissioncache_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['supplier', 'name', 'id'], name='core_produc_supplie_e61afc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productbomlineitem',
+            index=models.Index(fields=['parent_product', 'id'], name='core_produc_parent__68bbcf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productsharingrequest',
+            index=models.Index(fields=['created_at', 'id'], name='core_produc_created_bc26e1_idx'),
+        ),
+    ]
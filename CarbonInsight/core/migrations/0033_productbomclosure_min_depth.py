@@ -0,0 +1,93 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:02
+
+from collections import defaultdict, deque
+
+from django.db import migrations, models
+
+MAX_PATH_COUNT = 2 ** 63 - 1
+
+
+def closure_rows(line_items):
+    """
+    Calculates the transitive closure of the BoM graph as of this migration, with one row per ancestor and descendant,
+     in topological order starting with the products that have no line items.
+    """
+
+    line_items_of = defaultdict(list)
+    parents = defaultdict(list)
+    for parent_id, child_id, quantity in line_items:
+        line_items_of[parent_id].append((child_id, quantity))
+        parents[child_id].append(parent_id)
+
+    pending = {product_id: len(line_items_of[product_id]) for product_id in set(line_items_of) | set(parents)}
+    queue = deque(product_id for product_id, count in pending.items() if count == 0)
+    descendants = {}
+    rows = {}
+    while queue:
+        product_id = queue.popleft()
+        product_descendants = {}
+        for child_id, quantity in line_items_of[product_id]:
+            paths = [(child_id, (1, 1.0, 0))] + list(descendants[child_id].items())
+            for descendant_id, (path_count, cumulative_quantity, min_depth) in paths:
+                row = product_descendants.setdefault(descendant_id, [0, 0.0, min_depth + 1])
+                row[0] = min(row[0] + path_count, MAX_PATH_COUNT)
+                row[1] += quantity * cumulative_quantity
+                row[2] = min(row[2], min_depth + 1)
+        descendants[product_id] = product_descendants
+        for descendant_id, row in product_descendants.items():
+            rows[(product_id, descendant_id)] = row
+        for parent_id in parents[product_id]:
+            pending[parent_id] -= 1
+            if pending[parent_id] == 0:
+                queue.append(parent_id)
+    return rows
+
+
+def clear_closure(apps, schema_editor):
+    apps.get_model("core", "ProductBoMClosure").objects.all().delete()
+
+
+def build_closure(apps, schema_editor):
+    ProductBoMLineItem = apps.get_model("core", "ProductBoMLineItem")
+    ProductBoMClosure = apps.get_model("core", "ProductBoMClosure")
+    rows = closure_rows(ProductBoMLineItem.objects.values_list("parent_product_id", "line_item_product_id", "quantity"))
+    ProductBoMClosure.objects.bulk_create([
+        ProductBoMClosure(
+            ancestor_id=ancestor_id,
+            descendant_id=descendant_id,
+            path_count=path_count,
+            cumulative_quantity=cumulative_quantity,
+            min_depth=min_depth,
+        )
+        for (ancestor_id, descendant_id), (path_count, cumulative_quantity, min_depth) in rows.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_closure, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='productbomclosure',
+            unique_together=set(),
+        ),
+        migrations.RemoveField(
+            model_name='productbomclosure',
+            name='depth',
+        ),
+        migrations.AddField(
+            model_name='productbomclosure',
+            name='min_depth',
+            field=models.PositiveIntegerField(default=1),
+            preserve_default=False,
+        ),
+        migrations.AlterUniqueTogether(
+            name='productbomclosure',
+            unique_together={('ancestor', 'descendant')},
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
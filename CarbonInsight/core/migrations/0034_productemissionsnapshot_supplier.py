@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_suppliers(apps, schema_editor):
+    Product = apps.get_model("core", "Product")
+    ProductEmissionSnapshot = apps.get_model("core", "ProductEmissionSnapshot")
+    ProductEmissionSnapshot.objects.update(
+        supplier_id=Subquery(Product.objects.filter(pk=OuterRef("product_id")).values("supplier_id")[:1])
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_productbomclosure_min_depth'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='productemissionsnapshot',
+            name='core_produc_product_ff506e_idx',
+        ),
+        migrations.AddField(
+            model_name='productemissionsnapshot',
+            name='supplier',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='emission_snapshots', to='core.company'),
+        ),
+        migrations.RunPython(fill_suppliers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='productemissionsnapshot',
+            name='supplier',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='emission_snapshots', to='core.company'),
+        ),
+        migrations.AddIndex(
+            model_name='productemissionsnapshot',
+            index=models.Index(fields=['product', 'recorded_at', 'id'], name='core_produc_product_ac76e5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productemissionsnapshot',
+            index=models.Index(fields=['supplier', 'recorded_at', 'id'], name='core_produc_supplie_c0eacb_idx'),
+        ),
+    ]
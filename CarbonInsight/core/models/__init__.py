@@ -5,9 +5,13 @@ from .emission_bom_link import EmissionBoMLink
 from .company import Company
 from .company_membership import CompanyMembership
 from .product import Product
+from .product_bom_closure import ProductBoMClosure
 from .product_bom_line_item import ProductBoMLineItem
+from .product_emission_cache import ProductEmissionCache
+from .product_emission_snapshot import ProductEmissionSnapshot
 from .product_sharing_request import ProductSharingRequest, ProductSharingRequestStatus
 from .production_energy_emission import ProductionEnergyEmission, ProductionEnergyEmissionReference, ProductionEnergyEmissionReferenceFactor
+from .reference_data_version import ReferenceDataVersion
 from .transport_emission import TransportEmission, TransportEmissionReference, TransportEmissionReferenceFactor
 from .user import User
 from .user_energy_emission import UserEnergyEmission, UserEnergyEmissionReference, UserEnergyEmissionReferenceFactor
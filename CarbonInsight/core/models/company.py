@@ -1,7 +1,5 @@
-from collections import defaultdict, deque
-
 from django.db import models
-from django.db.models import Q, Sum, F
+from django.db.models import Q, Sum
 from django.db.models.functions import Coalesce
 
 
@@ -84,41 +82,13 @@ class Company(models.Model):
 
         Avoids double-counting products supplied by this company in case Company A->B->A supply chains exist.
         """
-        from .product import Product
-        from .product_bom_line_item import ProductBoMLineItem
-        # 1) Build child→[(parent, qty), …] adjacency in one DB hit
-        rows = ProductBoMLineItem.objects.values(
-            'quantity',
-            child_id=F('line_item_product'),
-            parent_id=F('parent_product'),
-        )
-        adj = defaultdict(list)
-        for r in rows:
-            adj[r['child_id']].append((r['parent_id'], r['quantity']))
-
-        # 2) Build a map & set of the products this company supplies
-        supplied_qs = self.products.all()
-        supplied = {p.id: p for p in supplied_qs}
-        supplied_ids = set(supplied)
-
-        total_emissions = 0.0
-
-        # 3) For each supplied product, BFS up—but skip parents you supply yourself
-        for prod_id, prod in supplied.items():
-            use_count = 0.0
-            queue = deque([(prod_id, 1.0)])  # (node, cumulative_multiplier)
-
-            while queue:
-                node_id, mult = queue.popleft()
-                for parent_id, qty in adj.get(node_id, []):
-                    # ignore any parent that's also supplied by self
-                    if parent_id in supplied_ids:
-                        continue
-                    contrib = mult * qty
-                    use_count += contrib
-                    queue.append((parent_id, contrib))
-
-            # 4) Multiply by this product's emission total
-            total_emissions += use_count * prod.get_emission_trace().total
-
-        return total_emissions
\ No newline at end of file
+        # Import here to avoid circular import
+        from ..services.bom_graph import cumulative_use_counts
+        from .product_emission_cache import ProductEmissionCache
+        supplied = {product.id: product for product in self.products.all()}
+        use_counts = cumulative_use_counts(supplied)
+
+        # Only products that are used anywhere contribute, so the others don't need an up-to-date PCF
+        used = [supplied[product_id] for product_id, use_count in use_counts.items() if use_count]
+        entries = ProductEmissionCache.get_for_products(used)
+        return sum(use_counts[product_id] * entry.total for product_id, entry in entries.items())
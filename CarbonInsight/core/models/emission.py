@@ -1,7 +1,8 @@
 from django.db import models
 from polymorphic.models import PolymorphicModel
 
-from .emission_trace import EmissionTrace, EmissionTraceMentionClass, EmissionTraceMention, EmissionSplit
+from .emission_trace import EmissionTrace, EmissionTraceMentionClass, EmissionTraceMention, EmissionSplit, \
+    EmissionVector
 from .lifecycle_stage import LifecycleStage
 from .pcf_calculation_method import PcfCalculationMethod
 from .reference_impact_unit import ReferenceImpactUnit
@@ -86,6 +87,33 @@ class Emission(PolymorphicModel):
         # This is a placeholder for the actual implementation
         raise NotImplementedError("Subclasses must implement this method")
 
+    def get_emission_totals(self) -> EmissionVector:
+        """
+        Calculates only the emissions per lifecycle stage, without building an EmissionTrace.
+
+        Returns:
+            EmissionVector with the same values as the emissions_subtotal of get_emission_trace()
+        """
+
+        # Overridden values replace the calculated ones
+        if self.override_factors.exists():
+            totals = EmissionVector()
+            for factor in self.override_factors.all():
+                totals[LifecycleStage(factor.lifecycle_stage)] = EmissionSplit(
+                    biogenic=factor.co_2_emission_factor_biogenic,
+                    non_biogenic=factor.co_2_emission_factor_non_biogenic
+                )
+            return totals
+        return self.get_real_instance()._get_emission_totals()
+
+    def _get_emission_totals(self) -> EmissionVector:
+        """
+        Abstract function that gets override by the children that inherits the class Emission.
+        """
+
+        # This is a placeholder for the actual implementation
+        raise NotImplementedError("Subclasses must implement this method")
+
     def __str__(self) -> str:
         """
         __str__ override that returns the name of the product that this Class attached to and the total emission.
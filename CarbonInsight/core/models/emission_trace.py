@@ -1,7 +1,11 @@
-from copy import deepcopy, copy
+from array import array
+from collections import defaultdict
+from collections.abc import MutableMapping
 from dataclasses import field, dataclass
 from enum import Enum
+from itertools import repeat
 from numbers import Number
+from operator import mul
 from typing import Optional, List, Dict, Tuple, Set, Literal, Union, TYPE_CHECKING, Any
 
 from core.models.lifecycle_stage import LifecycleStage
@@ -138,6 +142,173 @@ class EmissionSplit:
 
         return self.biogenic + self.non_biogenic
 
+# Fixed position of every lifecycle stage in an EmissionVector
+LIFECYCLE_STAGES: Tuple[LifecycleStage, ...] = tuple(LifecycleStage)
+_LIFECYCLE_STAGE_INDEX: Dict[LifecycleStage, int] = {stage: index for index, stage in enumerate(LIFECYCLE_STAGES)}
+
+
+class EmissionVector(MutableMapping):
+    """
+    Dictionary of LifecycleStage to EmissionSplit stored as a fixed-width array.
+
+    The biogenic and non-biogenic emissions of every lifecycle stage are kept in one flat array of
+     2 * len(LifecycleStage) floats, together with a bitmask of the stages that are present. This allows scaling and
+     summing up traces without allocating an EmissionSplit per stage. Like a dictionary, stages are iterated in the
+     order they were added, so serialized subtotals keep the key order of the dictionaries they replace.
+    """
+
+    __slots__ = ("_values", "_mask", "_order")
+
+    def __init__(self, splits: Optional[Dict[LifecycleStage, EmissionSplit]] = None):
+        self._values = array("d", bytes(16 * len(LIFECYCLE_STAGES)))
+        self._mask = 0
+        # Indices of the present lifecycle stages, in the order they were added
+        self._order = []
+        if splits:
+            self.update(splits)
+
+    @classmethod
+    def _from_array(cls, values: array, mask: int, order: Optional[List[int]] = None) -> "EmissionVector":
+        """
+        Creates an EmissionVector from its internal representation without copying it.
+
+        Args:
+            values: flat array of biogenic and non-biogenic emissions
+            mask: bitmask of the present lifecycle stages
+            order: indices of the present lifecycle stages in iteration order, LifecycleStage order if None
+        Returns:
+            EmissionVector object
+        """
+
+        vector = cls.__new__(cls)
+        vector._values = values
+        vector._mask = mask
+        vector._order = order if order is not None else [
+            index for index in range(len(LIFECYCLE_STAGES)) if mask >> index & 1
+        ]
+        return vector
+
+    def _indices(self):
+        return iter(self._order)
+
+    def __getitem__(self, stage: LifecycleStage) -> EmissionSplit:
+        index = _LIFECYCLE_STAGE_INDEX[stage]
+        if not self._mask >> index & 1:
+            raise KeyError(stage)
+        return EmissionSplit(biogenic=self._values[2 * index], non_biogenic=self._values[2 * index + 1])
+
+    def __setitem__(self, stage: LifecycleStage, split: EmissionSplit):
+        index = _LIFECYCLE_STAGE_INDEX[stage]
+        self._values[2 * index] = split.biogenic
+        self._values[2 * index + 1] = split.non_biogenic
+        if not self._mask >> index & 1:
+            self._mask |= 1 << index
+            self._order.append(index)
+
+    def __delitem__(self, stage: LifecycleStage):
+        index = _LIFECYCLE_STAGE_INDEX[stage]
+        if not self._mask >> index & 1:
+            raise KeyError(stage)
+        self._values[2 * index] = self._values[2 * index + 1] = 0.0
+        self._mask &= ~(1 << index)
+        self._order.remove(index)
+
+    def __iter__(self):
+        return (LIFECYCLE_STAGES[index] for index in self._indices())
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, stage) -> bool:
+        index = _LIFECYCLE_STAGE_INDEX.get(stage)
+        return index is not None and bool(self._mask >> index & 1)
+
+    def clear(self):
+        """
+        Removes all lifecycle stages.
+        """
+
+        self._values = array("d", bytes(16 * len(LIFECYCLE_STAGES)))
+        self._mask = 0
+        self._order = []
+
+    def __mul__(self, factor: float) -> "EmissionVector":
+        """
+        __mul__ override that multiplies the emissions of every lifecycle stage.
+
+        Args:
+            factor: float
+        Returns:
+            EmissionVector object
+        """
+
+        return EmissionVector._from_array(
+            array("d", map(mul, self._values, repeat(factor))), self._mask, list(self._order)
+        )
+
+    def add_weighted(self, vectors: List[Tuple["EmissionVector", float]]):
+        """
+        Adds the weighted sum of the given vectors to this vector, i.e. the matrix of the vectors times the vector of
+         the weights. The vectors are added in the given order, so the result is the same as adding up their
+         EmissionSplits one by one. Only the stages present in a vector are touched, in place.
+
+        Args:
+            vectors: list of (EmissionVector, weight) tuples
+        """
+
+        values = self._values
+        for vector, weight in vectors:
+            other = vector._values
+            for index in vector._order:
+                if not self._mask >> index & 1:
+                    self._mask |= 1 << index
+                    self._order.append(index)
+                values[2 * index] += other[2 * index] * weight
+                values[2 * index + 1] += other[2 * index + 1] * weight
+
+    @property
+    def biogenic(self) -> float:
+        """
+        Returns the sum of the biogenic emissions of all lifecycle stages.
+
+        Returns:
+            sum of the biogenic emissions
+        """
+
+        return sum(self._values[2 * index] for index in self._indices())
+
+    @property
+    def non_biogenic(self) -> float:
+        """
+        Returns the sum of the non-biogenic emissions of all lifecycle stages.
+
+        Returns:
+            sum of the non-biogenic emissions
+        """
+
+        return sum(self._values[2 * index + 1] for index in self._indices())
+
+    @property
+    def total(self) -> float:
+        """
+        Returns the sum of the emissions of all lifecycle stages.
+
+        Returns:
+            sum of the biogenic and non-biogenic emissions
+        """
+
+        return sum(self._values[2 * index] + self._values[2 * index + 1] for index in self._indices())
+
+    def __deepcopy__(self, memo) -> "EmissionVector":
+        return EmissionVector._from_array(array("d", self._values), self._mask, list(self._order))
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+# key = class of the related object of an EmissionTrace; value = its source (see EmissionTrace.source)
+_SOURCE_BY_TYPE: Dict[type, Optional[str]] = {}
+
+
 @dataclass
 class EmissionTrace:
     """
@@ -150,43 +321,138 @@ class EmissionTrace:
     methodology: Optional[str] = None
     pcf_calculation_method: PcfCalculationMethod = PcfCalculationMethod.ISO_14040_ISO_14044
     # This contains the emissions up to this stage
-    emissions_subtotal: Dict[LifecycleStage, EmissionSplit] = field(default_factory=dict)
+    emissions_subtotal: Dict[LifecycleStage, EmissionSplit] = field(default_factory=EmissionVector)
     # key = LifecycleStage; value = quantity
     children: Set[EmissionTraceChild] = field(default_factory=set)
     mentions: List[EmissionTraceMention] = field(default_factory=list)
 
+    def __post_init__(self):
+        """
+        Stores the emissions subtotal as an EmissionVector if it was given as a dictionary.
+        """
+
+        if not isinstance(self.emissions_subtotal, EmissionVector):
+            self.emissions_subtotal = EmissionVector(self.emissions_subtotal)
+
     @property
     def source(self) -> Optional[str]:
         """
-        Returns the type of object that the EmissionTrace is linked to.
+        Returns the type of object that the EmissionTrace is linked to. The type is only looked up once per class of
+         related object, since it is needed for every node when serializing a trace.
 
         Returns:
             Emission type as string
         """
 
+        related_type = type(self.related_object)
+        if related_type not in _SOURCE_BY_TYPE:
+            _SOURCE_BY_TYPE[related_type] = self._source_of_type(related_type)
+        return _SOURCE_BY_TYPE[related_type]
+
+    @staticmethod
+    def _source_of_type(related_type: type) -> Optional[str]:
+        """
+        Returns the type of object that an EmissionTrace linked to an object of the given class is linked to.
+
+        Args:
+            related_type: class of the related object
+        Returns:
+            Emission type as string
+        """
+
         from core.models import (Product, Emission,
                                  UserEnergyEmission, UserEnergyEmissionReference,
                                  TransportEmission, TransportEmissionReference,
                                  ProductionEnergyEmission, ProductionEnergyEmissionReference)  # Import here to avoid circular import
-        if isinstance(self.related_object, Product):
+        if issubclass(related_type, Product):
             return "Product"
-        elif isinstance(self.related_object, TransportEmissionReference):
+        elif issubclass(related_type, TransportEmissionReference):
             return "TransportEmissionReference"
-        elif isinstance(self.related_object, UserEnergyEmissionReference):
+        elif issubclass(related_type, UserEnergyEmissionReference):
             return "UserEnergyEmissionReference"
-        elif isinstance(self.related_object, ProductionEnergyEmissionReference):
+        elif issubclass(related_type, ProductionEnergyEmissionReference):
             return "ProductionEnergyEmissionReference"
-        elif isinstance(self.related_object, TransportEmission):
+        elif issubclass(related_type, TransportEmission):
             return "TransportEmission"
-        elif isinstance(self.related_object, UserEnergyEmission):
+        elif issubclass(related_type, UserEnergyEmission):
             return "UserEnergyEmission"
-        elif isinstance(self.related_object, ProductionEnergyEmission):
+        elif issubclass(related_type, ProductionEnergyEmission):
             return "ProductionEnergyEmission"
-        elif isinstance(self.related_object, Emission):
+        elif issubclass(related_type, Emission):
             return "Emission"
         else:
             return None
 
+    @property
+    def node_id(self) -> str:
+        """
+        Returns an identifier of this node that is stable between calculations, based on its related object.
+
+        Returns:
+            source and primary key of the related object as string
+        """
+
+        source = self.source or "EmissionTrace"
+        pk = getattr(self.related_object, "pk", None)
+        return source if pk is None else f"{source}:{pk}"
+
+    def get_child_nodes_by_id(self) -> Dict[str, EmissionTraceChild]:
+        """
+        Returns the children of this node by their node ids. Children with the same node id are told apart by a
+         numbered suffix in the order of their quantity and label. This is the only place node ids of children are
+         assigned, so paths match between the traces and their diffs.
+
+        Returns:
+            dictionary of node id to EmissionTraceChild, children with the same node id in suffix order
+        """
+
+        groups = defaultdict(list)
+        for child in self.children:
+            groups[child.emission_trace.node_id].append(child)
+        child_nodes = {}
+        for node_id, children in groups.items():
+            # Only children that share a node id need to be sorted
+            if len(children) > 1:
+                children.sort(key=lambda child: (child.quantity, child.emission_trace.label))
+            for index, child in enumerate(children, start=1):
+                child_nodes[node_id if index == 1 else f"{node_id}~{index}"] = child
+        return child_nodes
+
+    def get_child_nodes(self) -> List[Tuple[str, EmissionTraceChild]]:
+        """
+        Returns the children of this node in a stable order, together with their node ids (see
+         get_child_nodes_by_id).
+
+        Returns:
+            list of (node id, EmissionTraceChild) tuples
+        """
+
+        return sorted(
+            self.get_child_nodes_by_id().items(),
+            key=lambda item: (item[1].emission_trace.node_id, item[1].quantity, item[1].emission_trace.label)
+        )
+
+    def find_node(self, path: str) -> Optional["EmissionTrace"]:
+        """
+        Finds a node of this tree by its path, the node ids from this node down to the node joined by "/".
+
+        Args:
+            path: path of the node, starting with the node id of this node
+        Returns:
+            EmissionTrace of the node or None if there is no such node
+        """
+
+        node_ids = path.split("/")
+        if node_ids[0] != self.node_id:
+            return None
+        node = self
+        for node_id in node_ids[1:]:
+            child = node.get_child_nodes_by_id().get(node_id)
+            if child is None:
+                return None
+            node = child.emission_trace
+        return node
+
     def __str__(self) -> str:
         """
         __str__ override that returns an emission trace object information as a string.
@@ -219,35 +485,33 @@ class EmissionTrace:
 
         if not isinstance(quantity, float):
             raise TypeError(f"Cannot multiply EmissionTrace by {type(quantity)}")
-        et = deepcopy(self)
-        et.label = f"{self.label} * {quantity}"
-        et.methodology = f"({self.methodology}) * {quantity}" if self.methodology else None
-        et.emissions_subtotal = {
-            stage: split * quantity
-            for stage, split in self.emissions_subtotal.items()
-        }
-        et.children.clear()
-        et.children.add(
-            EmissionTraceChild(
-                emission_trace=self,
-                quantity=quantity
-            )
+        # The result only references this trace as its single child instead of copying it
+        return EmissionTrace(
+            label=f"{self.label} * {quantity}",
+            reference_impact_unit=self.reference_impact_unit,
+            related_object=self.related_object,
+            methodology=f"({self.methodology}) * {quantity}" if self.methodology else None,
+            pcf_calculation_method=self.pcf_calculation_method,
+            emissions_subtotal=self.emissions_subtotal * quantity,
+            children={
+                EmissionTraceChild(
+                    emission_trace=self,
+                    quantity=quantity
+                )
+            },
         )
-        et.mentions.clear()
-        return et
 
     def sum_up(self):
         """
         This method iterates through all children of the EmissionTrace object and sums up their emissions.
-        It updates the emissions_subtotal dictionary with the total emissions for each lifecycle stage.
+        It updates the emissions_subtotal vector with the weighted sum of the children's vectors, weighted by their
+         quantities.
         """
 
-        for child in self.children:
-            for lifecycle_stage, value in child.emission_trace.emissions_subtotal.items():
-                if lifecycle_stage in self.emissions_subtotal:
-                    self.emissions_subtotal[lifecycle_stage] += value * child.quantity
-                else:
-                    self.emissions_subtotal[lifecycle_stage] = value * child.quantity
+        self.emissions_subtotal.add_weighted([
+            (child.emission_trace.emissions_subtotal, child.quantity)
+            for child in self.children
+        ])
 
     def __float__(self) -> float:
         """
@@ -268,7 +532,7 @@ class EmissionTrace:
             total biogenic emission of an EmissionTrace object as float
         """
 
-        return round(sum(split.biogenic for split in self.emissions_subtotal.values()), 2)
+        return round(self.emissions_subtotal.biogenic, 2)
 
     @property
     def total_non_biogenic(self) -> float:
@@ -279,7 +543,7 @@ class EmissionTrace:
             total non-biogenic emission of an EmissionTrace object as float
         """
 
-        return round(sum(split.non_biogenic for split in self.emissions_subtotal.values()), 2)
+        return round(self.emissions_subtotal.non_biogenic, 2)
 
     @property
     def total(self) -> float:
@@ -290,4 +554,4 @@ class EmissionTrace:
             total emission of an EmissionTrace object as float
         """
 
-        return round(sum(split.total for split in self.emissions_subtotal.values()), 2)
\ No newline at end of file
+        return round(self.emissions_subtotal.total, 2)
\ No newline at end of file
@@ -1,4 +1,5 @@
 import logging
+from dataclasses import replace
 from typing import Optional, TYPE_CHECKING
 
 from django.core.validators import MinValueValidator
@@ -7,7 +8,7 @@ from django.contrib.contenttypes.fields import GenericRelation
 from django_countries.fields import CountryField
 
 from .emission_trace import EmissionTrace, EmissionTraceMentionClass, EmissionTraceMention, EmissionTraceChild, \
-    EmissionSplit
+    EmissionSplit, EmissionVector
 from .lifecycle_stage import LifecycleStage
 from .pcf_calculation_method import PcfCalculationMethod
 from .product_sharing_request import ProductSharingRequest, ProductSharingRequestStatus
@@ -19,6 +20,7 @@ from ..exporters.zip import product_to_zip
 if TYPE_CHECKING:
     from .company import Company
     from .user import User
+    from ..services.bom_graph import BoMGraph
 
 logger = logging.getLogger(__name__)
 
@@ -87,6 +89,72 @@ class Product(models.Model):
             object of type EmissionTrace for this Product
         """
 
+        from ..services.bom_graph import BoMGraph  # Import here to avoid circular import
+        return BoMGraph.load([self.pk]).get_emission_trace(self.pk)
+    get_emission_trace.short_description = "Emissions trace"
+
+    def get_emission_totals(self) -> EmissionVector:
+        """
+        Calculates only the PCF per lifecycle stage, without building the EmissionTrace tree with its labels,
+         methodologies and mentions.
+
+        Returns:
+            EmissionVector with the same values as the emissions_subtotal of get_emission_trace()
+        """
+
+        from ..services.bom_graph import BoMGraph  # Import here to avoid circular import
+        return BoMGraph.load([self.pk]).get_emission_totals(self.pk)
+
+    def _build_emission_totals(self, graph: "BoMGraph") -> EmissionVector:
+        """
+        Calculates the PCF per lifecycle stage of this Product from the relations loaded by the given BoMGraph.
+
+        Args:
+            graph: BoMGraph that contains this Product
+        Returns:
+            EmissionVector for this Product
+        """
+
+        totals = EmissionVector()
+        override_factors = graph.get_override_factors(self.pk)
+        # Overridden values replace the emissions of the product and its line items
+        if override_factors:
+            for factor in override_factors:
+                totals[LifecycleStage(factor.lifecycle_stage)] = EmissionSplit(
+                    biogenic=factor.co_2_emission_factor_biogenic,
+                    non_biogenic=factor.co_2_emission_factor_non_biogenic
+                )
+            return totals
+
+        weighted = []
+        # Add own emissions
+        for emission_obj in self.emissions.all():
+            emission_obj_real: "Emission" = emission_obj.get_real_instance()
+            if emission_obj_real is None:
+                logger.warning(f"Emission {emission_obj} has no content object.")
+                continue
+            weighted.append((emission_obj_real.get_emission_totals(), emission_obj_real.quantity))
+
+        # Add emissions from line items, unless the sharing request is pending or rejected
+        for line_item in graph.get_line_items(self.pk):
+            if line_item.product_sharing_request_status in (ProductSharingRequestStatus.PENDING,
+                                                            ProductSharingRequestStatus.REJECTED):
+                continue
+            weighted.append((graph.get_emission_totals(line_item.line_item_product_id), line_item.quantity))
+
+        totals.add_weighted(weighted)
+        return totals
+
+    def _build_emission_trace(self, graph: "BoMGraph") -> EmissionTrace:
+        """
+        Builds the emission trace of this Product from the relations loaded by the given BoMGraph.
+
+        Args:
+            graph: BoMGraph that contains this Product
+        Returns:
+            object of type EmissionTrace for this Product
+        """
+
         root = EmissionTrace(
             label=f"Product: {self.name}",
             methodology=f"Sum up all the product-level emissions and its line items' emissions.",
@@ -107,7 +175,7 @@ class Product(models.Model):
             ))
 
         # Add emissions from line items
-        for line_item in self.line_items.all():
+        for line_item in graph.get_line_items(self.pk):
             # Check if the line item is shared and if the request is accepted
             if line_item.product_sharing_request_status is None:
                 emission_trace = EmissionTrace(
@@ -147,10 +215,10 @@ class Product(models.Model):
                 ))
 
             else:
-                # Get the line item's emissions
-                emission_trace = line_item.line_item_product.get_emission_trace()
-                # Hide the children
-                emission_trace.children.clear()
+                # Get the line item's emissions and hide the children
+                # The trace is shared with other usages of the line item product, so it is copied instead of modified
+                line_item_trace = graph.get_emission_trace(line_item.line_item_product_id)
+                emission_trace = replace(line_item_trace, children=set(), mentions=list(line_item_trace.mentions))
                 if not line_item.line_item_product.supplier.is_reference:
                     emission_trace.mentions.append(
                         EmissionTraceMention(
@@ -170,7 +238,8 @@ class Product(models.Model):
 
         # Check if there are any EmissionOverrideFactors
         # If so, replace the emission trace with the overridden values
-        if self.override_factors.exists():
+        override_factors = graph.get_override_factors(self.pk)
+        if override_factors:
             root.emissions_subtotal.clear()
             if self.supplier.is_reference:
                 root.methodology = "Database lookup"
@@ -184,14 +253,13 @@ class Product(models.Model):
                     mention_class=EmissionTraceMentionClass.WARNING,
                     message="Emission factors are overridden by user-provided values"
                 ))
-            for factor in self.override_factors.all():
+            for factor in override_factors:
                 root.emissions_subtotal[LifecycleStage(factor.lifecycle_stage)] = EmissionSplit(
                     biogenic=factor.co_2_emission_factor_biogenic,
                     non_biogenic=factor.co_2_emission_factor_non_biogenic
                 )
 
         return root
-    get_emission_trace.short_description = "Emissions trace"
 
 
     class Meta:
@@ -199,6 +267,9 @@ class Product(models.Model):
         verbose_name_plural = "Products"
         ordering = ["name"]
         unique_together = ["supplier", "name", "manufacturer_name", "sku"]
+        indexes = [
+            models.Index(fields=["supplier", "name", "id"]),
+        ]
 
     export_to_aas_aasx = product_to_aas_aasx
     export_to_aas_xml = product_to_aas_xml
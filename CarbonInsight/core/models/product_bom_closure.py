@@ -0,0 +1,44 @@
+from django.db import models
+
+
+class ProductBoMClosure(models.Model):
+    """
+    Transitive closure of the BoM graph, holding for every product the products it uses at any depth.
+
+    There is one row per ancestor and descendant, with the number of paths from the ancestor to the descendant, the
+     sum over those paths of the product of the line item quantities along them and the length of the shortest one.
+     Rows are maintained incrementally whenever a BoM line item is saved or deleted (see core.services.bom_closure).
+    """
+
+    # Rows are removed by the line item signals instead of a cascade, since removing a line item of a product that is
+    # being deleted still needs the rows of that product to know which paths went through it
+    ancestor = models.ForeignKey(
+        "Product",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="bom_descendant_closures",
+    )
+    descendant = models.ForeignKey(
+        "Product",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="bom_ancestor_closures",
+    )
+    path_count = models.PositiveBigIntegerField()
+    cumulative_quantity = models.FloatField()
+    min_depth = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = "Product BoM closure"
+        verbose_name_plural = "Product BoM closures"
+        unique_together = ("ancestor", "descendant")
+
+    def __str__(self) -> str:
+        """
+        __str__ override that returns the ids of the ancestor and descendant products as string.
+
+        Returns:
+            Ids of the ancestor and descendant products
+        """
+
+        return f"{self.ancestor_id}>{self.descendant_id}"
@@ -52,33 +52,31 @@ class ProductBoMLineItem(models.Model):
             True if the ProductBoMLineItem creates a cyclical dependency in the database.
         """
 
-        start = self.parent_product
-        target = self.line_item_product
-        visited = set()
-
-        def dfs(prod):
-            if prod.id == start.id:
-                return True
-            for li in prod.line_items.all():
-                child = li.line_item_product
-                if child.id in visited:
-                    continue
-                visited.add(child.id)
-                if dfs(child):
-                    return True
-            return False
+        from ..services.bom_closure import is_used_in  # Import here to avoid circular import
 
-        return dfs(target)
+        if self.parent_product_id is None or self.line_item_product_id is None:
+            return False
+        # The line item closes a loop if the parent product is already used in the BoM of the line item product
+        return self.parent_product_id == self.line_item_product_id \
+            or is_used_in(self.parent_product_id, self.line_item_product_id)
 
     def save(self, *args, **kwargs):
         # enforce clean() on save
         self.full_clean()
         super().save(*args, **kwargs)
 
+    def refresh_from_db(self, *args, **kwargs):
+        # The sharing requests of a SharingAccessMatrix may have changed since it was loaded
+        self._sharing_access_matrix = None
+        super().refresh_from_db(*args, **kwargs)
+
     class Meta:
         verbose_name = "Product BoM line item"
         verbose_name_plural = "Product BoM line items"
         unique_together = ("parent_product", "line_item_product")
+        indexes = [
+            models.Index(fields=["parent_product", "id"]),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=~Q(parent_product=F("line_item_product")),
@@ -105,6 +103,11 @@ class ProductBoMLineItem(models.Model):
             ProductSharingRequest object
         """
 
+        # Resolved without a query when the line item was loaded as part of a SharingAccessMatrix (e.g. by a
+        # BoMGraph), which holds the requests as of that load
+        matrix = getattr(self, "_sharing_access_matrix", None)
+        if matrix is not None:
+            return matrix.get_sharing_request(self.parent_product.supplier_id, self.line_item_product_id)
         return self.line_item_product.product_sharing_requests.filter(
             requester=self.parent_product.supplier
         ).first()
@@ -119,11 +122,9 @@ class ProductBoMLineItem(models.Model):
             ProductSharingRequestStatus
         """
 
-        if self.line_item_product.supplier.auto_approve_product_sharing_requests:
-            return ProductSharingRequestStatus.ACCEPTED
-        if self.line_item_product.supplier == self.parent_product.supplier:
-            return ProductSharingRequestStatus.ACCEPTED
-        psr = self.product_sharing_request
-        if psr is None:
-            return ProductSharingRequestStatus.NOT_REQUESTED
-        return psr.status
\ No newline at end of file
+        from ..services.sharing_access import SharingAccessMatrix  # Import here to avoid circular import
+        return SharingAccessMatrix.status_of(
+            self.line_item_product,
+            self.parent_product.supplier_id,
+            lambda: self.product_sharing_request,
+        )
@@ -0,0 +1,378 @@
+from typing import Dict, Iterable, Tuple, TYPE_CHECKING
+
+from django.db import connection, models, transaction
+from django.db.models import F, Q, QuerySet
+from django.utils import timezone
+
+from .emission_trace import EmissionSplit, EmissionVector
+from .lifecycle_stage import LifecycleStage
+from .product_emission_snapshot import ProductEmissionSnapshot
+
+if TYPE_CHECKING:
+    from .product import Product
+
+
+class ProductEmissionCache(models.Model):
+    """
+    Materialized PCF of a product, holding the emissions per lifecycle stage split into biogenic and non-biogenic.
+
+    Entries are invalidated whenever data the PCF of the product depends on changes, and are lazily recomputed on the
+     next read. The version is bumped on every invalidation, so a recompute that raced with an invalidation is never
+     marked as valid. Every stored value that differs from the previous one is recorded as a ProductEmissionSnapshot.
+
+    The content version counts changes to any data the representations of the product depend on, including data
+     that does not affect its PCF (like names), and is the validator of HTTP caching (see ProductETagMixin).
+
+    Entries also summarize the product in indexed columns, so products can be ordered and filtered by their PCF and
+     the size of their BoM in SQL: the totals are written together with emissions_subtotal, the counts are kept up to
+     date by signals. Every product gets an entry when it is created.
+    """
+
+    product = models.OneToOneField(
+        "Product",
+        on_delete=models.CASCADE,
+        related_name="emission_cache",
+    )
+    # key = LifecycleStage value; value = [biogenic, non_biogenic]
+    emissions_subtotal = models.JSONField(default=dict)
+    version = models.PositiveBigIntegerField(default=0)
+    content_version = models.PositiveBigIntegerField(default=0)
+    is_valid = models.BooleanField(default=False)
+    computed_at = models.DateTimeField(null=True, blank=True)
+    # Totals of emissions_subtotal, as of the last computation
+    emission_total = models.FloatField(default=0.0, db_index=True)
+    emission_total_biogenic = models.FloatField(default=0.0, db_index=True)
+    emission_total_non_biogenic = models.FloatField(default=0.0, db_index=True)
+    # Number of BoM line items and emissions of the product itself
+    line_item_count = models.PositiveIntegerField(default=0, db_index=True)
+    emission_count = models.PositiveIntegerField(default=0, db_index=True)
+
+    class Meta:
+        verbose_name = "Product emission cache"
+        verbose_name_plural = "Product emission caches"
+
+    @classmethod
+    def get_for_product(cls, product: "Product") -> "ProductEmissionCache":
+        """
+        Returns the up-to-date cache entry of a product, recomputing it first if it has been invalidated.
+
+        Args:
+            product: Product object
+        Returns:
+            valid ProductEmissionCache object for the Product
+        """
+
+        entry, _ = cls.objects.get_or_create(product_id=product.pk)
+        if not entry.is_valid:
+            entry.recompute(product)
+        return entry
+
+    @classmethod
+    def get_for_products(cls, products: Iterable["Product"]) -> Dict[int, "ProductEmissionCache"]:
+        """
+        Returns the up-to-date cache entries of many products, fetching them in a single query and only recomputing
+         the ones that have been invalidated.
+
+        Args:
+            products: Product objects
+        Returns:
+            dictionary of product id to valid ProductEmissionCache object
+        """
+
+        products = {product.pk: product for product in products}
+        entries = {entry.product_id: entry for entry in cls.objects.filter(product_id__in=products)}
+        missing = [cls(product_id=product_id) for product_id in products if product_id not in entries]
+        if missing:
+            cls.objects.bulk_create(missing, ignore_conflicts=True)
+            entries.update(
+                (entry.product_id, entry)
+                for entry in cls.objects.filter(product_id__in=[entry.product_id for entry in missing])
+            )
+        for product_id, entry in entries.items():
+            if not entry.is_valid:
+                entry.recompute(products[product_id])
+        return entries
+
+    @classmethod
+    def validate_all(cls, products: QuerySet):
+        """
+        Recomputes the entries of the given products that are missing or have been invalidated, so their summary
+         columns can be used for ordering and filtering. Checking that all entries are valid takes a single query, and
+         the stale products are calculated in a single pass over one BoMGraph and stored with a single statement (see
+         store_many), instead of loading the BoM of every product separately.
+
+        Args:
+            products: queryset of Product objects
+        """
+
+        # Import here to avoid circular import
+        from ..services.bom_graph import BoMGraph
+        stale_ids = list(products.filter(Q(emission_cache__isnull=True) | Q(emission_cache__is_valid=False))
+                         .order_by().values_list("pk", flat=True))
+        if not stale_ids:
+            return
+        cls.objects.bulk_create([cls(product_id=product_id) for product_id in stale_ids], ignore_conflicts=True)
+        versions = dict(cls.objects.filter(product_id__in=stale_ids).values_list("product_id", "version"))
+        subtotals = {}
+        for product_id, totals in BoMGraph.load(stale_ids).get_all_emission_totals(stale_ids).items():
+            entry = cls(product_id=product_id)
+            entry._set_emissions_subtotal(totals)
+            subtotals[product_id] = entry.emissions_subtotal
+        cls.store_many(subtotals, versions)
+
+    @classmethod
+    def adjust_counts(cls, product_id: int, line_items: int = 0, emissions: int = 0):
+        """
+        Adds to the number of BoM line items and emissions of a product.
+
+        Args:
+            product_id: id of the product
+            line_items: change of the number of BoM line items
+            emissions: change of the number of emissions
+        """
+
+        cls.objects.filter(product_id=product_id).update(
+            line_item_count=F("line_item_count") + line_items,
+            emission_count=F("emission_count") + emissions,
+        )
+
+    @classmethod
+    def invalidate(cls, product_ids: Iterable[int]):
+        """
+        Invalidates the cache entries of the given products and of every product that uses them in its BoM, and the
+         in-process reference cache if any of them belongs to the reference company.
+
+        Args:
+            product_ids: ids of the products whose PCF may have changed
+        """
+
+        # Import here to avoid circular import
+        from ..services.bom_graph import ancestor_product_ids
+        from ..services.reference_cache import reference_cache
+        from .product import Product
+        product_ids = ancestor_product_ids(product_ids)
+        if product_ids:
+            cls.objects.filter(product_id__in=product_ids).update(
+                is_valid=False, version=F("version") + 1, content_version=F("content_version") + 1
+            )
+            # The totals of reference company products are also cached in memory
+            if Product.objects.filter(pk__in=product_ids, supplier__is_reference=True).exists():
+                reference_cache.invalidate()
+
+    @classmethod
+    def touch(cls, product_ids: Iterable[int]):
+        """
+        Marks the representations of the given products and of every product that uses them in its BoM as changed,
+         without invalidating their PCF.
+
+        Args:
+            product_ids: ids of the products whose data changed
+        """
+
+        # Import here to avoid circular import
+        from ..services.bom_graph import ancestor_product_ids
+        product_ids = ancestor_product_ids(product_ids)
+        if product_ids:
+            cls.objects.filter(product_id__in=product_ids).update(content_version=F("content_version") + 1)
+
+    def recompute(self, product: "Product"):
+        """
+        Recomputes the cache entry from the emission totals of the product.
+
+        Args:
+            product: Product object this entry belongs to
+        """
+
+        previous = self.emissions_subtotal if self.computed_at else None
+        self._set_emissions_subtotal(product.get_emission_totals())
+        self.computed_at = timezone.now()
+        # A changed PCF changes the representations of the product, even if no signal has touched it (e.g. data fixes)
+        content_version_increment = int(previous != self.emissions_subtotal)
+        # Only mark the entry as valid if it has not been invalidated while computing
+        self.is_valid = ProductEmissionCache.objects.filter(pk=self.pk, version=self.version).update(
+            emissions_subtotal=self.emissions_subtotal,
+            content_version=F("content_version") + content_version_increment,
+            emission_total=self.emission_total,
+            emission_total_biogenic=self.emission_total_biogenic,
+            emission_total_non_biogenic=self.emission_total_non_biogenic,
+            computed_at=self.computed_at,
+            is_valid=True,
+        ) == 1
+        if self.is_valid:
+            self.content_version += content_version_increment
+            ProductEmissionSnapshot.record(
+                {self.product_id: previous}, {self.product_id: self.emissions_subtotal}, self.computed_at
+            )
+
+    @classmethod
+    def apply_deltas(cls, deltas: Dict[int, EmissionVector]):
+        """
+        Adds changes of the PCF to the valid cache entries of the given products. Entries that are invalid are left
+         to be recomputed.
+
+        Args:
+            deltas: dictionary of product id to the change of its PCF
+        """
+
+        computed_at = timezone.now()
+        qn = connection.ops.quote_name
+        # Bump the version, so a recompute that started before the change is never marked as valid
+        sql = (
+            f"UPDATE {qn(cls._meta.db_table)}"
+            f" SET {qn('emissions_subtotal')} = %s, {qn('emission_total')} = %s, {qn('emission_total_biogenic')} = %s,"
+            f" {qn('emission_total_non_biogenic')} = %s, {qn('computed_at')} = %s,"
+            f" {qn('version')} = {qn('version')} + 1"
+            f" WHERE {qn('id')} = %s"
+        )
+        with transaction.atomic():
+            # Lock the entries, so no invalidation can slip in between reading and writing them
+            rows = []
+            previous = {}
+            current = {}
+            for entry in cls.objects.select_for_update().filter(product_id__in=deltas.keys(), is_valid=True):
+                previous[entry.product_id] = entry.emissions_subtotal if entry.computed_at else None
+                totals = EmissionVector(entry.get_emissions_subtotal())
+                totals.add_weighted([(deltas[entry.product_id], 1.0)])
+                entry._set_emissions_subtotal(totals)
+                current[entry.product_id] = entry.emissions_subtotal
+                rows.append((
+                    cls._meta.get_field("emissions_subtotal").get_db_prep_save(entry.emissions_subtotal, connection),
+                    entry.emission_total,
+                    entry.emission_total_biogenic,
+                    entry.emission_total_non_biogenic,
+                    cls._meta.get_field("computed_at").get_db_prep_save(computed_at, connection),
+                    entry.pk,
+                ))
+            # A single statement for all entries, which is much cheaper than building an UPDATE per entry
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+            ProductEmissionSnapshot.record(previous, current, computed_at)
+
+    @classmethod
+    def store_many(cls, subtotals: Dict[int, dict], versions: Dict[int, int]):
+        """
+        Stores recomputed emissions of many products with a single statement. Like recompute, an entry is only marked
+         as valid if it has not been invalidated since its version was read, and its content version is bumped if the
+         stored emissions change.
+
+        Args:
+            subtotals: dictionary of product id to the JSON representation of its emissions (see emissions_subtotal)
+            versions: dictionary of product id to the version of its entry read before recomputing
+        """
+
+        computed_at = timezone.now()
+        qn = connection.ops.quote_name
+        sql = (
+            f"UPDATE {qn(cls._meta.db_table)}"
+            f" SET {qn('emissions_subtotal')} = %s, {qn('emission_total')} = %s, {qn('emission_total_biogenic')} = %s,"
+            f" {qn('emission_total_non_biogenic')} = %s, {qn('computed_at')} = %s, {qn('is_valid')} = %s,"
+            f" {qn('content_version')} = {qn('content_version')} + %s"
+            f" WHERE {qn('product_id')} = %s AND {qn('version')} = %s"
+        )
+        subtotal_field = cls._meta.get_field("emissions_subtotal")
+        prepared_computed_at = cls._meta.get_field("computed_at").get_db_prep_save(computed_at, connection)
+        with transaction.atomic():
+            # Lock the entries and skip the ones invalidated since their version was read
+            previous = {
+                product_id: emissions_subtotal if stored_computed_at else None
+                for product_id, version, emissions_subtotal, stored_computed_at in cls.objects.select_for_update()
+                .filter(product_id__in=subtotals.keys())
+                .values_list("product_id", "version", "emissions_subtotal", "computed_at")
+                if version == versions[product_id]
+            }
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, [
+                    (subtotal_field.get_db_prep_save(subtotals[product_id], connection),
+                     *cls.summarize(subtotals[product_id]), prepared_computed_at, True,
+                     int(previous[product_id] != subtotals[product_id]), product_id, versions[product_id])
+                    for product_id in previous
+                ])
+            ProductEmissionSnapshot.record(
+                previous, {product_id: subtotals[product_id] for product_id in previous}, computed_at
+            )
+
+    def _set_emissions_subtotal(self, totals: EmissionVector):
+        """
+        Stores emission totals in the JSON representation of this entry.
+
+        Args:
+            totals: EmissionVector to store
+        """
+
+        self.emissions_subtotal = {
+            LifecycleStage(stage).value: [split.biogenic, split.non_biogenic]
+            for stage, split in totals.items()
+        }
+        self.emission_total, self.emission_total_biogenic, self.emission_total_non_biogenic = \
+            self.summarize(self.emissions_subtotal)
+
+    @staticmethod
+    def summarize(emissions_subtotal: dict) -> Tuple[float, float, float]:
+        """
+        Returns the totals of the JSON representation of emissions.
+
+        Args:
+            emissions_subtotal: JSON representation of emissions (see emissions_subtotal)
+        Returns:
+            tuple of the total, biogenic and non-biogenic emissions
+        """
+
+        biogenic = sum(biogenic for biogenic, _ in emissions_subtotal.values())
+        non_biogenic = sum(non_biogenic for _, non_biogenic in emissions_subtotal.values())
+        return biogenic + non_biogenic, biogenic, non_biogenic
+
+    def get_emissions_subtotal(self) -> Dict[LifecycleStage, EmissionSplit]:
+        """
+        Returns the stored emissions per lifecycle stage.
+
+        Returns:
+            dictionary of LifecycleStage to EmissionSplit, like EmissionTrace.emissions_subtotal
+        """
+
+        return {
+            LifecycleStage(stage): EmissionSplit(biogenic=biogenic, non_biogenic=non_biogenic)
+            for stage, (biogenic, non_biogenic) in self.emissions_subtotal.items()
+        }
+
+    @property
+    def total_biogenic(self) -> float:
+        """
+        Returns the total biogenic emission of the product.
+
+        Returns:
+            total biogenic emission as float
+        """
+
+        return round(sum(biogenic for biogenic, _ in self.emissions_subtotal.values()), 2)
+
+    @property
+    def total_non_biogenic(self) -> float:
+        """
+        Returns the total non-biogenic emission of the product.
+
+        Returns:
+            total non-biogenic emission as float
+        """
+
+        return round(sum(non_biogenic for _, non_biogenic in self.emissions_subtotal.values()), 2)
+
+    @property
+    def total(self) -> float:
+        """
+        Returns the total emission of the product.
+
+        Returns:
+            total emission as float
+        """
+
+        return round(sum(biogenic + non_biogenic for biogenic, non_biogenic in self.emissions_subtotal.values()), 2)
+
+    def __str__(self) -> str:
+        """
+        __str__ override that returns the product and the version of the cache entry.
+
+        Returns:
+            product and version as string
+        """
+
+        return f"Emission cache of {self.product} (v{self.version})"
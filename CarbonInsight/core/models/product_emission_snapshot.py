@@ -0,0 +1,163 @@
+import sys
+from array import array
+from datetime import datetime
+from functools import cached_property
+from typing import Dict, Optional, Tuple
+
+from django.db import models
+
+from .emission_trace import EmissionVector, LIFECYCLE_STAGES
+
+_LIFECYCLE_STAGE_INDEX = {stage.value: index for index, stage in enumerate(LIFECYCLE_STAGES)}
+
+
+def pack_emissions(emissions_subtotal: dict) -> Tuple[int, bytes]:
+    """
+    Packs the JSON representation of emissions (see ProductEmissionCache.emissions_subtotal) into a bitmask of the
+     present lifecycle stages and the little-endian doubles of their biogenic and non-biogenic emissions, in the order
+     of the LifecycleStage enum.
+
+    Args:
+        emissions_subtotal: dictionary of LifecycleStage value to [biogenic, non_biogenic]
+    Returns:
+        tuple of the stage mask and the packed emissions
+    """
+
+    mask = 0
+    for stage in emissions_subtotal:
+        mask |= 1 << _LIFECYCLE_STAGE_INDEX[stage]
+    values = array("d")
+    for index, stage in enumerate(LIFECYCLE_STAGES):
+        if mask >> index & 1:
+            values.extend(emissions_subtotal[stage.value])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return mask, values.tobytes()
+
+
+class ProductEmissionSnapshotQuerySet(models.QuerySet):
+    def between(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> models.QuerySet:
+        """
+        Filters snapshots recorded in a time range and orders them chronologically.
+
+        Args:
+            since: earliest recording time, unbounded if None
+            until: latest recording time, unbounded if None
+        Returns:
+            QuerySet of ProductEmissionSnapshot objects
+        """
+
+        queryset = self
+        if since is not None:
+            queryset = queryset.filter(recorded_at__gte=since)
+        if until is not None:
+            queryset = queryset.filter(recorded_at__lte=until)
+        return queryset.order_by("recorded_at", "id")
+
+
+class ProductEmissionSnapshot(models.Model):
+    """
+    Append-only history of the PCF of a product.
+
+    A snapshot is recorded whenever the materialized PCF of a product is stored with a value that differs from the
+     previous one, so unchanged recomputations do not grow the history. Only the present lifecycle stages are stored,
+     packed as doubles (see pack_emissions). The supplier of the product is stored as well, so the history of all
+     products of a company is a single range scan of an index, without joining the products.
+    """
+
+    # Covered by the index on product and recording time
+    product = models.ForeignKey(
+        "Product",
+        on_delete=models.CASCADE,
+        related_name="emission_snapshots",
+        db_index=False,
+    )
+    # Covered by the index on supplier and recording time
+    supplier = models.ForeignKey(
+        "Company",
+        on_delete=models.CASCADE,
+        related_name="emission_snapshots",
+        db_index=False,
+    )
+    recorded_at = models.DateTimeField()
+    stage_mask = models.PositiveIntegerField()
+    emissions = models.BinaryField()
+
+    objects = ProductEmissionSnapshotQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Product emission snapshot"
+        verbose_name_plural = "Product emission snapshots"
+        # Both match the chronological order of ProductEmissionSnapshotQuerySet.between
+        indexes = [
+            models.Index(fields=["product", "recorded_at", "id"]),
+            models.Index(fields=["supplier", "recorded_at", "id"]),
+        ]
+
+    @classmethod
+    def record(cls, previous: Dict[int, Optional[dict]], current: Dict[int, dict], recorded_at: datetime):
+        """
+        Records the PCF of every product whose stored value has changed, with one query for the suppliers of the
+         products and one to insert the snapshots.
+
+        Args:
+            previous: dictionary of product id to the JSON representation of its previously stored emissions, or None
+             if it has never been computed
+            current: dictionary of product id to the JSON representation of its newly stored emissions
+            recorded_at: time the new values have been stored
+        """
+
+        # Import here to avoid circular import
+        from .product import Product
+
+        changed = {}
+        for product_id, emissions_subtotal in current.items():
+            stage_mask, emissions = pack_emissions(emissions_subtotal)
+            if previous.get(product_id) is not None and pack_emissions(previous[product_id]) == (stage_mask, emissions):
+                continue
+            changed[product_id] = (stage_mask, emissions)
+        if not changed:
+            return
+        supplier_ids = dict(Product.objects.filter(pk__in=changed).values_list("pk", "supplier_id"))
+        cls.objects.bulk_create([
+            cls(
+                product_id=product_id,
+                supplier_id=supplier_ids[product_id],
+                recorded_at=recorded_at,
+                stage_mask=stage_mask,
+                emissions=emissions,
+            )
+            for product_id, (stage_mask, emissions) in changed.items()
+            if product_id in supplier_ids
+        ])
+
+    @cached_property
+    def emissions_vector(self) -> EmissionVector:
+        """
+        Returns the recorded emissions.
+
+        Returns:
+            EmissionVector of the product at the time of recording
+        """
+
+        packed = array("d")
+        packed.frombytes(bytes(self.emissions))
+        if sys.byteorder == "big":
+            packed.byteswap()
+        values = array("d", bytes(16 * len(LIFECYCLE_STAGES)))
+        position = 0
+        for index in range(len(LIFECYCLE_STAGES)):
+            if self.stage_mask >> index & 1:
+                values[2 * index:2 * index + 2] = packed[position:position + 2]
+                position += 2
+        return EmissionVector._from_array(values, self.stage_mask)
+
+    def __str__(self) -> str:
+        """
+        __str__ override that returns the product and the recording time of the snapshot.
+
+        Returns:
+            product and recording time as string
+        """
+
+        return f"Emission snapshot of {self.product} at {self.recorded_at}"
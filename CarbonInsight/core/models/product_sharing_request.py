@@ -81,6 +81,9 @@ class ProductSharingRequest(models.Model):
         verbose_name_plural = "Product sharing requests"
         ordering = ["-created_at"]
         unique_together = ("product", "requester")
+        indexes = [
+            models.Index(fields=["created_at", "id"]),
+        ]
 
     def __str__(self) -> str:
         """
@@ -0,0 +1,52 @@
+from django.db import models
+from django.db.models import F
+
+
+class ReferenceDataVersion(models.Model):
+    """
+    Single-row counter of changes to reference data, i.e. emission references, their factors and the products of the
+     reference company.
+
+    Every process keeps reference data in memory (see core.services.reference_cache) and compares the version it was
+     loaded at against this counter, so a change made by one process makes the caches of all processes stale.
+    """
+
+    SINGLETON_PK = 1
+
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Reference data version"
+        verbose_name_plural = "Reference data versions"
+
+    @classmethod
+    def current(cls) -> int:
+        """
+        Returns the current version of the reference data.
+
+        Returns:
+            version as int, 0 if reference data has never changed
+        """
+
+        version = cls.objects.filter(pk=cls.SINGLETON_PK).values_list("version", flat=True).first()
+        return version or 0
+
+    @classmethod
+    def bump(cls):
+        """
+        Increments the version of the reference data.
+        """
+
+        if not cls.objects.filter(pk=cls.SINGLETON_PK).update(version=F("version") + 1):
+            cls.objects.get_or_create(pk=cls.SINGLETON_PK)
+            cls.objects.filter(pk=cls.SINGLETON_PK).update(version=F("version") + 1)
+
+    def __str__(self) -> str:
+        """
+        __str__ override that returns the version of the reference data.
+
+        Returns:
+            version as string
+        """
+
+        return f"Reference data v{self.version}"
@@ -3,7 +3,8 @@ from django.db import models
 from django.db.models import Q
 
 from .emission import Emission
-from .emission_trace import EmissionTrace, EmissionTraceMentionClass, EmissionTraceMention, EmissionSplit
+from .emission_trace import EmissionTrace, EmissionTraceMentionClass, EmissionTraceMention, EmissionSplit, \
+    EmissionVector
 from .lifecycle_stage import LifecycleStage
 from .reference_impact_unit import ReferenceImpactUnit
 
@@ -47,6 +48,18 @@ class UserEnergyEmission(Emission):
 
         return reference_multiplied_factor
 
+    def _get_emission_totals(self) -> EmissionVector:
+        """
+        _get_emission_totals override from Emission class, calculates the emissions of the UserEnergyEmission.
+
+        Returns:
+            EmissionVector for this user energy emission
+        """
+
+        if self.reference is None:
+            return EmissionVector()
+        return self.reference.get_emission_totals() * self.energy_consumption
+
     class Meta:
         verbose_name = "User energy emission"
         verbose_name_plural = "User energy emissions"
@@ -108,12 +121,8 @@ class UserEnergyEmissionReference(models.Model):
             reference_impact_unit=ReferenceImpactUnit.KILOWATT_HOUR,
             related_object=self
         )
-        # Go through all factors and add them to the root
-        for factor in self.reference_factors.all():
-            root.emissions_subtotal[LifecycleStage(factor.lifecycle_stage)] = EmissionSplit(
-                biogenic=factor.co_2_emission_factor_biogenic,
-                non_biogenic=factor.co_2_emission_factor_non_biogenic
-            )
+        # Add all factors to the root
+        root.emissions_subtotal.update(self.get_emission_totals())
         root.mentions.append(EmissionTraceMention(
             mention_class=EmissionTraceMentionClass.INFORMATION,
             message="Estimated values"
@@ -121,6 +130,28 @@ class UserEnergyEmissionReference(models.Model):
         return root
     get_emission_trace.short_description = "Emissions trace"
 
+    def get_emission_totals(self) -> EmissionVector:
+        """
+        Returns the reference values per lifecycle stage, without building an EmissionTrace.
+
+        Returns:
+            EmissionVector with the same values as the emissions_subtotal of get_emission_trace(), which must not be
+             modified
+        """
+
+        # Factors primed from the in-process reference cache (see BoMGraph) spare the query
+        reference_vector = getattr(self, "_reference_vector", None)
+        if reference_vector is not None:
+            return reference_vector
+
+        totals = EmissionVector()
+        for factor in self.reference_factors.all():
+            totals[LifecycleStage(factor.lifecycle_stage)] = EmissionSplit(
+                biogenic=factor.co_2_emission_factor_biogenic,
+                non_biogenic=factor.co_2_emission_factor_non_biogenic
+            )
+        return totals
+
     def __str__(self) -> str:
         """
         __str__ override that returns the name of the UserEnergyEmissionReference
@@ -0,0 +1,272 @@
+import base64
+import datetime
+import json
+from typing import Any, List, Optional, Sequence
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, QuerySet
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Query parameters of the actions that paginate with KeysetPagination themselves, for their schemas
+KEYSET_PAGINATION_PARAMETERS = [
+    OpenApiParameter(
+        name="page_size",
+        type=int,
+        location="query",
+        required=False,
+        description="Number of results to return per page, all results are returned if neither `page_size` nor "
+                    "`cursor` is given",
+    ),
+    OpenApiParameter(
+        name="cursor",
+        type=str,
+        location="query",
+        required=False,
+        description="Cursor of the page to return, taken from the `next` link of the previous page",
+    ),
+]
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over a stable ordering that ends with a unique field, e.g. `("supplier_id", "name",
+     "id")`.
+
+    The cursor of the next page holds the ordering keys of the last row of the current page, and the next page is
+     fetched with a range condition on those keys instead of an OFFSET. With an index on the ordering fields every page
+     costs the same, however deep it is, and rows added or deleted meanwhile do not shift the pages. Only the next page
+     can be linked to.
+
+    Pagination is opt-in, as results are only paginated if the request has a `page_size` or `cursor` parameter. The
+     ordering is passed to the constructor, or else taken from the `get_keyset_ordering()` method or the
+     `keyset_ordering` attribute of the view.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    default_page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering: Optional[Sequence[str]] = None):
+        self.ordering = tuple(ordering) if ordering is not None else None
+        self.request = None
+        self.page_size = None
+        self.next_keys = None
+
+    def get_ordering(self, view) -> tuple:
+        """
+        Returns the ordering to paginate by.
+
+        Args:
+            view: view that is paginated
+        Returns:
+            tuple of field names, descending ones prefixed with "-"
+        """
+
+        if self.ordering is not None:
+            return self.ordering
+        if hasattr(view, "get_keyset_ordering"):
+            return tuple(view.get_keyset_ordering())
+        return tuple(view.keyset_ordering)
+
+    def get_page_size(self, request) -> int:
+        """
+        Returns the page size requested, limited to max_page_size.
+
+        Args:
+            request: DRF Request object
+        Returns:
+            number of results per page
+        """
+
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.default_page_size
+        if page_size < 1:
+            return self.default_page_size
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, keys: List[Any]) -> str:
+        """
+        Encodes the ordering keys of a row as a cursor.
+
+        Args:
+            keys: values of the ordering fields of the row
+        Returns:
+            URL-safe cursor
+        """
+
+        # DjangoJSONEncoder would truncate datetimes to milliseconds
+        keys = [key.isoformat() if isinstance(key, datetime.datetime) else key for key in keys]
+        return base64.urlsafe_b64encode(json.dumps(keys, cls=DjangoJSONEncoder).encode()).decode()
+
+    def decode_cursor(self, cursor: str, ordering: tuple) -> List[Any]:
+        """
+        Decodes the ordering keys of a row from a cursor.
+
+        Args:
+            cursor: cursor from the request
+            ordering: ordering the cursor must match
+        Returns:
+            values of the ordering fields of the row
+        Raises:
+            NotFound: If the cursor is invalid
+        """
+
+        try:
+            keys = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(keys, list) or len(keys) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return keys
+
+    @staticmethod
+    def get_keys(row, ordering: tuple) -> List[Any]:
+        """
+        Returns the ordering keys of a row, following related objects for fields like "emission_cache__total".
+
+        Args:
+            row: model instance
+            ordering: ordering to read the keys of
+        Returns:
+            values of the ordering fields of the row
+        """
+
+        keys = []
+        for term in ordering:
+            value = row
+            for attribute in term.lstrip("-").split("__"):
+                value = getattr(value, attribute)
+            keys.append(value)
+        return keys
+
+    @staticmethod
+    def get_after_condition(ordering: tuple, keys: List[Any]) -> Q:
+        """
+        Builds the condition matching the rows after a row in an ordering, i.e. the rows whose first differing
+         ordering field comes after the one of the row.
+
+        Args:
+            ordering: ordering of the rows
+            keys: values of the ordering fields of the row
+        Returns:
+            Q object matching the rows after the row
+        """
+
+        condition = Q()
+        for index, term in enumerate(ordering):
+            field = term.lstrip("-")
+            lookup = "lt" if term.startswith("-") else "gt"
+            equal = {previous.lstrip("-"): key for previous, key in zip(ordering[:index], keys)}
+            branch = Q(**equal, **{f"{field}__{lookup}": keys[index]})
+            condition = branch if index == 0 else condition | branch
+        return condition
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None) -> Optional[list]:
+        """
+        Returns the page of a queryset requested, or None if the request does not ask for pagination.
+
+        Args:
+            queryset: queryset to paginate
+            request: DRF Request object
+            view: view that is paginated
+        Returns:
+            list of the rows of the page, or None
+        Raises:
+            NotFound: If the cursor is invalid
+        """
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor is None and self.page_size_query_param not in request.query_params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(view)
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_after_condition(ordering, self.decode_cursor(cursor, ordering)))
+
+        # Fetch one more row to know whether there is a next page
+        rows = list(queryset[:self.page_size + 1])
+        page = rows[:self.page_size]
+        self.next_keys = self.get_keys(page[-1], ordering) if len(rows) > self.page_size else None
+        return page
+
+    def get_next_link(self) -> Optional[str]:
+        """
+        Returns the URL of the next page.
+
+        Returns:
+            absolute URL, or None on the last page
+        """
+
+        if self.next_keys is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, self.encode_cursor(self.next_keys)
+        )
+
+    def get_paginated_response(self, data) -> Response:
+        """
+        Wraps the serialized rows of a page with the link to the next page.
+
+        Args:
+            data: serialized rows of the page
+        Returns:
+            Response with `next` and `results`
+        """
+
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        """
+        Returns the schema of the responses of paginated views, which are plain lists unless a page is requested.
+
+        Args:
+            schema: schema of the list of results
+        Returns:
+            OpenAPI schema of the response
+        """
+
+        return {
+            "oneOf": [
+                schema,
+                {
+                    "type": "object",
+                    "required": ["next", "results"],
+                    "properties": {
+                        "next": {"type": "string", "nullable": True, "format": "uri"},
+                        "results": schema,
+                    },
+                },
+            ],
+        }
+
+    def get_schema_operation_parameters(self, view) -> list:
+        """
+        Returns the query parameters of paginated views.
+
+        Args:
+            view: view that is paginated
+        Returns:
+            list of OpenAPI parameters
+        """
+
+        return [
+            {
+                "name": parameter.name,
+                "required": False,
+                "in": "query",
+                "description": parameter.description,
+                "schema": {"type": "integer" if parameter.type is int else "string"},
+            }
+            for parameter in KEYSET_PAGINATION_PARAMETERS
+        ]
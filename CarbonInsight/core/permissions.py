@@ -2,7 +2,7 @@ from rest_framework import permissions
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
 from core.models import Company
-from core.views.mixins.company_mixin import resolve_company_pk
+from core.services.request_context import RequestContext
 
 
 class IsCompanyMember(BasePermission):
@@ -22,18 +22,19 @@ class IsCompanyMember(BasePermission):
         if not company_pk:
             return False
 
+        context = RequestContext.for_request(request)
         try:
-            company = Company.objects.get(pk=resolve_company_pk(company_pk))
+            company = context.get_company(company_pk)
         except Company.DoesNotExist:
             return False
 
-        return company.user_is_member(request.user)
+        return company is not None and context.is_member(company)
 
     def has_object_permission(self, request, view, obj):
         # obj is a Company for generic views or a Model instance for nested ones
         # if obj is CompanyMembership through obj.company:
         company = getattr(obj, 'company', obj)
-        return company.user_is_member(request.user)
+        return RequestContext.for_request(request).is_member(company)
 
 
 class CanEditCompany(BasePermission):
@@ -52,7 +53,7 @@ class CanEditCompany(BasePermission):
         # only allow unsafe methods if member
         if request.method in SAFE_METHODS:
             return True
-        return obj.user_is_member(request.user)
+        return RequestContext.for_request(request).is_member(obj)
 
 
 class ProductPermission(BasePermission):
@@ -67,7 +68,7 @@ class ProductPermission(BasePermission):
         Shorthand to check if the user is a member of the parent company.
         """
         company = view.get_parent_company()
-        return company.user_is_member(request.user)
+        return RequestContext.for_request(request).is_member(company)
 
     def has_permission(self, request, view):
         # Must be authenticated for everything
@@ -97,7 +98,7 @@ class ProductSubAPIPermission(BasePermission):
     def has_permission(self, request, view):
         if not (request.user and request.user.is_authenticated):
             return False
-        return view.get_parent_company().user_is_member(request.user)
+        return RequestContext.for_request(request).is_member(view.get_parent_company())
 
     def has_object_permission(self, request, view, obj):
-        return view.get_parent_company().user_is_member(request.user)
\ No newline at end of file
+        return RequestContext.for_request(request).is_member(view.get_parent_company())
\ No newline at end of file
@@ -1,14 +1,30 @@
-from typing import Optional
+from enum import Enum
+from typing import Any, List, Optional, Tuple
 
 from rest_framework import serializers
 from rest_framework_dataclasses.serializers import DataclassSerializer
 
 from core.models.emission_trace import EmissionTrace, EmissionTraceChild
 
-from rest_framework import serializers
-from rest_framework_dataclasses.serializers import DataclassSerializer
 
-from core.models.emission_trace import EmissionTrace, EmissionTraceChild
+def _str_or_none(value: Any) -> Optional[str]:
+    """
+    Returns a value the way a CharField serializes it.
+
+    Returns:
+        value as string, None if it is None
+    """
+    return None if value is None else str(value)
+
+
+def _enum_value(value: Any) -> Any:
+    """
+    Returns a value the way an EnumField of a DataclassSerializer serializes it.
+
+    Returns:
+        value of the enum member, the value itself if it is not an enum member
+    """
+    return value.value if isinstance(value, Enum) else value
 
 
 class EmissionTraceChildSerializer(DataclassSerializer):
@@ -60,6 +76,82 @@ class EmissionTraceSerializer(DataclassSerializer):
             "source",
         )
 
+    # Fields that are filled in while walking the tree instead of by the fields themselves
+    tree_fields = ("children",)
+
+    def _get_root_node(self) -> Any:
+        """
+        Returns the state that is passed along with the serialized root node.
+
+        Returns:
+            state of the root node
+        """
+        return None
+
+    def _get_child_nodes(self, obj: EmissionTrace, node: Any) -> Optional[List[Tuple[EmissionTraceChild, Any]]]:
+        """
+        Returns the children of a node that are serialized, together with their state.
+
+        Returns:
+            list of (EmissionTraceChild, state) tuples, or None if the children are left out
+        """
+        return [(child, None) for child in obj.children]
+
+    def _fields_to_representation(self, obj: EmissionTrace, node: Any) -> dict:
+        """
+        Serializes the fields of a single node, leaving the tree fields to to_representation. The node is converted
+         directly instead of through the declared fields, which gives the same result without running the field
+         machinery for every node.
+
+        Returns:
+            fields of the node as simple datatypes of Python
+        """
+        ret = {
+            "label": _str_or_none(obj.label),
+            "reference_impact_unit": _enum_value(obj.reference_impact_unit),
+            "methodology": _str_or_none(obj.methodology),
+            "emissions_subtotal": {
+                str(stage): {"biogenic": float(split.biogenic), "non_biogenic": float(split.non_biogenic)}
+                for stage, split in obj.emissions_subtotal.items()
+            },
+            "children": None,
+            "mentions": [
+                {"mention_class": _enum_value(mention.mention_class), "message": _str_or_none(mention.message)}
+                for mention in obj.mentions
+            ],
+            "total": obj.total,
+            "pcf_calculation_method": _enum_value(obj.pcf_calculation_method),
+            "source": obj.source,
+        }
+        for field_name in self.tree_fields:
+            ret[field_name] = None
+        return ret
+
+    def to_representation(self, instance: EmissionTrace) -> dict:
+        """
+        Serializes the emission trace tree with an explicit stack instead of recursion, so that the depth of the tree
+         is not limited by the recursion limit.
+
+        Args:
+            instance: EmissionTrace object
+        Returns:
+            emission trace tree as simple datatypes of Python
+        """
+        root_node = self._get_root_node()
+        ret = self._fields_to_representation(instance, root_node)
+        stack = [(instance, root_node, ret)]
+        while stack:
+            obj, node, data = stack.pop()
+            child_nodes = self._get_child_nodes(obj, node)
+            if child_nodes is None:
+                continue
+            data["children"] = []
+            for child, child_node in child_nodes:
+                child_data = self._fields_to_representation(child.emission_trace, child_node)
+                data["children"].append({"quantity": float(child.quantity), "emission_trace": child_data})
+                stack.append((child.emission_trace, child_node, child_data))
+        return ret
+
     def get_total(self, obj: EmissionTrace) -> float:
         """
         Returns the total emission of emission trace.
@@ -77,3 +169,56 @@ class EmissionTraceSerializer(DataclassSerializer):
             source of the emission trace
         """
         return obj.source
+
+
+class EmissionTraceNodeSerializer(EmissionTraceSerializer):
+    """
+    Serializer for an EmissionTrace node and its descendants up to a limited depth.
+
+    Expects the path of the serialized node as `node_id` and the number of levels of children to include as `depth`
+     in the context. Children below that depth are left out (`children` is null) and can be requested separately by
+     their id.
+    """
+
+    id = serializers.CharField(read_only=True)
+    children_count = serializers.IntegerField(read_only=True)
+    children = EmissionTraceChildSerializer(many=True, read_only=True, allow_null=True)
+
+    tree_fields = ("children", "id", "children_count")
+
+    class Meta(EmissionTraceSerializer.Meta):
+        fields = EmissionTraceSerializer.Meta.fields + ("id", "children_count")
+
+    def _get_root_node(self) -> Tuple[str, int]:
+        """
+        Returns the path and the remaining depth of the serialized root node.
+
+        Returns:
+            (path, depth) tuple of the root node
+        """
+        return self.context["node_id"], self.context["depth"]
+
+    def _get_child_nodes(self, obj: EmissionTrace, node: Tuple[str, int]) \
+            -> Optional[List[Tuple[EmissionTraceChild, Tuple[str, int]]]]:
+        """
+        Returns the children of a node with their paths, or None below the requested depth.
+
+        Returns:
+            list of (EmissionTraceChild, (path, depth)) tuples, or None if the children are left out
+        """
+        node_id, depth = node
+        if depth <= 0:
+            return None
+        return [(child, (f"{node_id}/{child_id}", depth - 1)) for child_id, child in obj.get_child_nodes()]
+
+    def _fields_to_representation(self, obj: EmissionTrace, node: Tuple[str, int]) -> dict:
+        """
+        Serializes the fields of a single node, including its path and its number of children.
+
+        Returns:
+            fields of the node as simple datatypes of Python
+        """
+        ret = super()._fields_to_representation(obj, node)
+        ret["id"] = node[0]
+        ret["children_count"] = len(obj.children)
+        return ret
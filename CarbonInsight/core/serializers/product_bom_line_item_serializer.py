@@ -6,6 +6,8 @@ from rest_framework import serializers
 from core.models import ProductBoMLineItem, ProductSharingRequestStatus, Product, Emission, TransportEmission, \
     UserEnergyEmission, ProductionEnergyEmission
 from core.serializers.product_serializer import ProductSerializer
+from core.serializers.sparse_fieldset_mixin import SparseFieldsetMixin
+from core.services.sharing_access import SharingAccessMatrix
 
 class EmissionBoMSerializer(serializers.ModelSerializer):
     """
@@ -59,9 +61,32 @@ class EmissionBoMSerializer(serializers.ModelSerializer):
         return None
 
 
-class ProductBoMLineItemSerializer(serializers.ModelSerializer):
+class ProductBoMLineItemListSerializer(serializers.ListSerializer):
     """
-    Serializer for ProductBoMLineItem.
+    List serializer for ProductBoMLineItem that resolves the sharing status of all line items at once, if it is
+     needed.
+    """
+
+    def to_representation(self, data) -> list:
+        """
+        Loads the product sharing requests of all line items with a single query before serializing them.
+
+        Args:
+            data: ProductBoMLineItem objects, as iterable or related manager
+        Returns:
+            list of serialized line items
+        """
+
+        line_items = list(data.all() if hasattr(data, "all") else data)
+        if self.child.needs_sharing_status():
+            SharingAccessMatrix.for_line_items(line_items)
+        return super().to_representation(line_items)
+
+
+class ProductBoMLineItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Serializer for ProductBoMLineItem. The sharing status, the line item product and the emissions are only
+     resolved if they are among the requested fields (see SparseFieldsetMixin).
 
     Read-only fields:
         parent_product
@@ -84,6 +109,7 @@ class ProductBoMLineItemSerializer(serializers.ModelSerializer):
         model = ProductBoMLineItem
         fields = ("id", "quantity", "line_item_product", "line_item_product_id", "parent_product", "product_sharing_request_status", "emissions")
         read_only_fields = ("parent_product", "line_item_product", "line_item_product_id")
+        list_serializer_class = ProductBoMLineItemListSerializer
         validators = [
             serializers.UniqueTogetherValidator(
                 queryset=ProductBoMLineItem.objects.all(),
@@ -92,6 +118,16 @@ class ProductBoMLineItemSerializer(serializers.ModelSerializer):
             )
         ]
 
+    def needs_sharing_status(self) -> bool:
+        """
+        Checks if serializing a line item needs its sharing status, which is shown itself and decides whether the
+         emissions of the line item product are shown.
+
+        Returns:
+            True if the sharing status or the line item product is among the requested fields
+        """
+        return "product_sharing_request_status" in self.fields or "line_item_product" in self.fields
+
     def get_product_sharing_request_status(self, obj:ProductBoMLineItem) -> ProductSharingRequestStatus:
         """
         returns the product sharing request status.
@@ -159,11 +195,12 @@ class ProductBoMLineItemSerializer(serializers.ModelSerializer):
         Returns:
             Serialized representation of the instance
         """
-        accepted = (
-            instance.product_sharing_request_status
-            == ProductSharingRequestStatus.ACCEPTED
-        )
-        # flip its bypass_emission_permission_checks attribute
-        self.context['bypass_emission_permission_checks'] = accepted
+        if "line_item_product" in self.fields:
+            accepted = (
+                instance.product_sharing_request_status
+                == ProductSharingRequestStatus.ACCEPTED
+            )
+            # flip its bypass_emission_permission_checks attribute
+            self.context['bypass_emission_permission_checks'] = accepted
         # and let DRF do the rest
         return super().to_representation(instance)
\ No newline at end of file
@@ -0,0 +1,103 @@
+from typing import Dict
+
+from rest_framework import serializers
+
+from core.models import ProductEmissionSnapshot
+
+
+class EmissionHistoryQuerySerializer(serializers.Serializer):
+    """
+    Serializer for the time range of an emission history request.
+    """
+
+    since = serializers.DateTimeField(required=False, help_text="Earliest recording time to return.")
+    until = serializers.DateTimeField(required=False, help_text="Latest recording time to return.")
+
+    def validate(self, attrs):
+        """
+        Validates that the time range is not empty.
+
+        Args:
+            attrs: validated time range
+        Returns:
+            validated time range
+        Raises:
+            ValidationError
+        """
+
+        if "since" in attrs and "until" in attrs and attrs["since"] > attrs["until"]:
+            raise serializers.ValidationError("since must not be after until.")
+        return attrs
+
+
+class ProductEmissionSnapshotSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the PCF of a product at a point in time.
+    """
+
+    emissions_subtotal = serializers.SerializerMethodField()
+    emission_total = serializers.SerializerMethodField()
+    emission_total_non_biogenic = serializers.SerializerMethodField()
+    emission_total_biogenic = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductEmissionSnapshot
+        fields = (
+            "product_id",
+            "recorded_at",
+            "emissions_subtotal",
+            "emission_total",
+            "emission_total_non_biogenic",
+            "emission_total_biogenic",
+        )
+
+    def get_emissions_subtotal(self, obj: ProductEmissionSnapshot) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the recorded emissions per lifecycle stage.
+
+        Args:
+            obj: ProductEmissionSnapshot object
+        Returns:
+            dictionary of LifecycleStage value to biogenic and non-biogenic emissions
+        """
+
+        return {
+            stage.value: {"biogenic": split.biogenic, "non_biogenic": split.non_biogenic}
+            for stage, split in obj.emissions_vector.items()
+        }
+
+    def get_emission_total(self, obj: ProductEmissionSnapshot) -> float:
+        """
+        Returns the recorded emission total.
+
+        Args:
+            obj: ProductEmissionSnapshot object
+        Returns:
+            total emission of the Product
+        """
+
+        return round(obj.emissions_vector.total, 2)
+
+    def get_emission_total_non_biogenic(self, obj: ProductEmissionSnapshot) -> float:
+        """
+        Returns the recorded non-biogenic emission total.
+
+        Args:
+            obj: ProductEmissionSnapshot object
+        Returns:
+            total non-biogenic emission of the Product
+        """
+
+        return round(obj.emissions_vector.non_biogenic, 2)
+
+    def get_emission_total_biogenic(self, obj: ProductEmissionSnapshot) -> float:
+        """
+        Returns the recorded biogenic emission total.
+
+        Args:
+            obj: ProductEmissionSnapshot object
+        Returns:
+            total biogenic emission of the Product
+        """
+
+        return round(obj.emissions_vector.biogenic, 2)
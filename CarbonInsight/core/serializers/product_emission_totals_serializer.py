@@ -0,0 +1,91 @@
+from typing import Optional
+
+from rest_framework import serializers
+
+from core.models import Product
+from core.serializers.product_serializer import EmissionVisibilityMixin
+
+
+class ProductEmissionTotalsRequestSerializer(serializers.Serializer):
+    """
+    Serializer for requesting the emission totals of many products.
+    """
+
+    ids = serializers.JSONField(
+        help_text='List of product IDs, or "all" for all products of the company.'
+    )
+
+    def validate_ids(self, value):
+        """
+        Validates that ids is either "all" or a non-empty list of integers.
+
+        Args:
+            value: requested ids
+        Returns:
+            "all" or list of product ids
+        Raises:
+            ValidationError
+        """
+
+        if value == "all":
+            return value
+        if (not isinstance(value, list) or not value
+                or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in value)):
+            raise serializers.ValidationError('Must be "all" or a non-empty list of product IDs.')
+        return value
+
+
+class ProductEmissionTotalsSerializer(EmissionVisibilityMixin, serializers.ModelSerializer):
+    """
+    Serializer for the emission totals of a product, calculated in bulk and passed in the `emission_totals` context.
+    """
+
+    emission_total = serializers.SerializerMethodField()
+    emission_total_non_biogenic = serializers.SerializerMethodField()
+    emission_total_biogenic = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = ("id", "name", "emission_total", "emission_total_non_biogenic", "emission_total_biogenic")
+
+    def get_emission_total(self, obj: Product) -> Optional[float]:
+        """
+        Returns the emission total for this product.
+
+        Args:
+            obj: Product object.
+        Returns:
+            total emission of the Product
+        """
+
+        if not self._can_see_emissions(obj):
+            return None
+        return round(self.context["emission_totals"][obj.pk].total, 2)
+
+    def get_emission_total_non_biogenic(self, obj: Product) -> Optional[float]:
+        """
+        Returns the non-biogenic emission total for this product.
+
+        Args:
+            obj: Product object.
+        Returns:
+            total non-biogenic emission of the Product
+        """
+
+        if not self._can_see_emissions(obj):
+            return None
+        return round(self.context["emission_totals"][obj.pk].non_biogenic, 2)
+
+    def get_emission_total_biogenic(self, obj: Product) -> Optional[float]:
+        """
+        Returns the biogenic emission total for this product.
+
+        Args:
+            obj: Product object.
+        Returns:
+            total biogenic emission of the Product
+        """
+
+        if not self._can_see_emissions(obj):
+            return None
+        return round(self.context["emission_totals"][obj.pk].biogenic, 2)
@@ -2,8 +2,10 @@ from typing import Optional
 
 from drf_writable_nested import WritableNestedModelSerializer
 from rest_framework import serializers
-from core.models import Product
+from core.models import Product, ProductEmissionCache
 from core.models.product import ProductEmissionOverrideFactor
+from core.serializers.sparse_fieldset_mixin import SparseFieldsetMixin
+from core.services.request_context import RequestContext
 from rest_framework.validators import UniqueTogetherValidator
 
 
@@ -18,9 +20,25 @@ class ProductEmissionOverrideFactorSerializer(serializers.ModelSerializer):
         model = ProductEmissionOverrideFactor
         fields = ("id", "lifecycle_stage", "co_2_emission_factor_biogenic", "co_2_emission_factor_non_biogenic")
 
-class ProductSerializer(WritableNestedModelSerializer):
+class EmissionVisibilityMixin:
     """
-    Serializer for Product.
+    Provides `_can_see_emissions()` for serializers that expose the emissions of products.
+    """
+
+    def _can_see_emissions(self, obj: Product) -> bool:
+        # The supplier and the memberships are resolved once per request, not per product
+        context = RequestContext.for_request(self.context['request'])
+        return (
+                self.context.get('bypass_emission_permission_checks', False)
+                or context.is_member(obj.supplier_id)
+                or context.get_company(obj.supplier_id).auto_approve_product_sharing_requests
+        )
+
+
+class ProductSerializer(SparseFieldsetMixin, EmissionVisibilityMixin, WritableNestedModelSerializer):
+    """
+    Serializer for Product. The emission totals are only computed if they are among the requested fields (see
+     SparseFieldsetMixin).
     """
     supplier = serializers.PrimaryKeyRelatedField(read_only=True)
     supplier_name = serializers.CharField(source='supplier.name', read_only=True)
@@ -40,14 +58,25 @@ class ProductSerializer(WritableNestedModelSerializer):
             )
         ]
 
-    def _can_see_emissions(self, obj: Product) -> bool:
-        u = self.context['request'].user
-        sup = obj.supplier
-        return (
-                self.context.get('bypass_emission_permission_checks', False)
-                or sup.user_is_member(u)
-                or sup.auto_approve_product_sharing_requests
-        )
+    def _get_emission_cache(self, obj: Product) -> ProductEmissionCache:
+        """
+        Returns the materialized PCF of the product, fetched once for all emission total fields.
+
+        Args:
+            obj: Product object.
+        Returns:
+            valid ProductEmissionCache object for the Product
+        """
+
+        if not hasattr(self, "_emission_caches"):
+            self._emission_caches = {}
+        if obj.pk not in self._emission_caches:
+            # Use the entry loaded with the product (see ProductViewSet.get_queryset) if it is up to date
+            entry = getattr(obj, "emission_cache", None) if Product.emission_cache.is_cached(obj) else None
+            if entry is None or not entry.is_valid:
+                entry = ProductEmissionCache.get_for_product(obj)
+            self._emission_caches[obj.pk] = entry
+        return self._emission_caches[obj.pk]
 
     def get_emission_total(self, obj: Product) -> Optional[float]:
         """
@@ -61,7 +90,7 @@ class ProductSerializer(WritableNestedModelSerializer):
 
         if not self._can_see_emissions(obj):
             return None
-        return obj.get_emission_trace().total
+        return self._get_emission_cache(obj).total
 
     def get_emission_total_non_biogenic(self, obj: Product) -> Optional[float]:
         """
@@ -75,7 +104,7 @@ class ProductSerializer(WritableNestedModelSerializer):
 
         if not self._can_see_emissions(obj):
             return None
-        return obj.get_emission_trace().total_non_biogenic
+        return self._get_emission_cache(obj).total_non_biogenic
 
     def get_emission_total_biogenic(self, obj: Product) -> Optional[float]:
         """
@@ -89,7 +118,7 @@ class ProductSerializer(WritableNestedModelSerializer):
 
         if not self._can_see_emissions(obj):
             return None
-        return obj.get_emission_trace().total_biogenic
+        return self._get_emission_cache(obj).total_biogenic
 
     def to_internal_value(self, data):
         """
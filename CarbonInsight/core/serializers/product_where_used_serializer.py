@@ -0,0 +1,24 @@
+from rest_framework import serializers
+
+
+class ProductWhereUsedSerializer(serializers.Serializer):
+    """
+    Serializer for a product that uses another product in its BoM, directly or indirectly.
+    """
+
+    id = serializers.IntegerField(source="ancestor_id")
+    name = serializers.CharField(source="ancestor__name")
+    sku = serializers.CharField(source="ancestor__sku")
+    supplier_id = serializers.IntegerField(source="ancestor__supplier_id")
+    supplier_name = serializers.CharField(source="ancestor__supplier__name")
+    depth = serializers.IntegerField(
+        source="min_depth",
+        help_text="Number of BoM levels between the product and the using product along the shortest path.",
+    )
+    path_count = serializers.IntegerField(
+        help_text="Number of distinct BoM paths from the using product to the product, capped at the largest "
+                  "64-bit integer.",
+    )
+    cumulative_quantity = serializers.FloatField(
+        help_text="Quantity of the product in one using product, summed over all paths.",
+    )
@@ -0,0 +1,217 @@
+from typing import List, Tuple
+
+from rest_framework import serializers
+
+from core.models.emission_trace import EmissionSplit, EmissionVector
+from core.models.lifecycle_stage import LifecycleStage
+from core.services.scenarios import Scenario
+
+
+def _int_keys(value: dict) -> dict:
+    """
+    Converts the keys of a JSON object, which are always strings, to ids.
+
+    Args:
+        value: dictionary with string keys
+    Returns:
+        dictionary with integer keys
+    Raises:
+        ValidationError
+    """
+
+    try:
+        return {int(key): item for key, item in value.items()}
+    except ValueError:
+        raise serializers.ValidationError("Keys must be IDs.")
+
+
+class ScenarioOverrideFactorSerializer(serializers.Serializer):
+    """
+    Serializer for an override factor of a product in a scenario.
+    """
+
+    lifecycle_stage = serializers.ChoiceField(choices=LifecycleStage.choices)
+    co_2_emission_factor_biogenic = serializers.FloatField(default=0.0)
+    co_2_emission_factor_non_biogenic = serializers.FloatField(default=0.0)
+
+
+class ScenarioSerializer(serializers.Serializer):
+    """
+    Serializer for a set of hypothetical changes to the BoM of a product.
+    """
+
+    name = serializers.CharField(max_length=255, required=False, default="")
+    line_item_quantities = serializers.DictField(
+        child=serializers.FloatField(min_value=0.0),
+        required=False,
+        default=dict,
+        help_text="Quantity to use per BoM line item ID.",
+    )
+    removed_line_items = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        default=list,
+        help_text="IDs of BoM line items to leave out.",
+    )
+    emission_references = serializers.DictField(
+        child=serializers.IntegerField(),
+        required=False,
+        default=dict,
+        help_text="ID of the reference to use per emission ID.",
+    )
+    override_factors = serializers.DictField(
+        child=ScenarioOverrideFactorSerializer(many=True),
+        required=False,
+        default=dict,
+        help_text="Override factors to use per product ID, replacing the calculated emissions of the product.",
+    )
+
+    def validate_line_item_quantities(self, value):
+        """
+        Converts the line item IDs to integers.
+
+        Args:
+            value: requested quantities per line item ID
+        Returns:
+            dictionary of line item id to quantity
+        """
+
+        return _int_keys(value)
+
+    def validate_emission_references(self, value):
+        """
+        Converts the emission IDs to integers.
+
+        Args:
+            value: requested reference IDs per emission ID
+        Returns:
+            dictionary of emission id to reference id
+        """
+
+        return _int_keys(value)
+
+    def validate_override_factors(self, value):
+        """
+        Converts the product IDs to integers.
+
+        Args:
+            value: requested override factors per product ID
+        Returns:
+            dictionary of product id to override factors
+        """
+
+        return _int_keys(value)
+
+    @staticmethod
+    def to_scenario(data: dict) -> Scenario:
+        """
+        Creates the Scenario described by validated data.
+
+        Args:
+            data: validated data of a ScenarioSerializer
+        Returns:
+            Scenario object
+        """
+
+        override_factors = {}
+        for product_id, factors in data["override_factors"].items():
+            vector = EmissionVector()
+            for factor in factors:
+                vector[LifecycleStage(factor["lifecycle_stage"])] = EmissionSplit(
+                    biogenic=factor["co_2_emission_factor_biogenic"],
+                    non_biogenic=factor["co_2_emission_factor_non_biogenic"],
+                )
+            override_factors[product_id] = vector
+        return Scenario(
+            name=data["name"],
+            line_item_quantities=data["line_item_quantities"],
+            removed_line_items=set(data["removed_line_items"]),
+            emission_references=data["emission_references"],
+            product_override_factors=override_factors,
+        )
+
+
+class ScenarioRequestSerializer(serializers.Serializer):
+    """
+    Serializer for requesting the evaluation of scenarios for a product.
+    """
+
+    scenarios = ScenarioSerializer(many=True, allow_empty=False)
+
+    def to_scenarios(self) -> List[Scenario]:
+        """
+        Creates the Scenarios described by the validated data.
+
+        Returns:
+            list of Scenario objects
+        """
+
+        return [ScenarioSerializer.to_scenario(scenario) for scenario in self.validated_data["scenarios"]]
+
+
+class ScenarioResultSerializer(serializers.Serializer):
+    """
+    Serializer for the emission totals of a product in a scenario, passed as (name, EmissionVector) tuples.
+    """
+
+    name = serializers.SerializerMethodField()
+    emission_total = serializers.SerializerMethodField()
+    emission_total_non_biogenic = serializers.SerializerMethodField()
+    emission_total_biogenic = serializers.SerializerMethodField()
+
+    def get_name(self, obj: Tuple[str, EmissionVector]) -> str:
+        """
+        Returns the name of the scenario.
+
+        Args:
+            obj: (name, EmissionVector) tuple
+        Returns:
+            name of the scenario
+        """
+
+        return obj[0]
+
+    def get_emission_total(self, obj: Tuple[str, EmissionVector]) -> float:
+        """
+        Returns the emission total of the product in the scenario.
+
+        Args:
+            obj: (name, EmissionVector) tuple
+        Returns:
+            total emission of the Product
+        """
+
+        return round(obj[1].total, 2)
+
+    def get_emission_total_non_biogenic(self, obj: Tuple[str, EmissionVector]) -> float:
+        """
+        Returns the non-biogenic emission total of the product in the scenario.
+
+        Args:
+            obj: (name, EmissionVector) tuple
+        Returns:
+            total non-biogenic emission of the Product
+        """
+
+        return round(obj[1].non_biogenic, 2)
+
+    def get_emission_total_biogenic(self, obj: Tuple[str, EmissionVector]) -> float:
+        """
+        Returns the biogenic emission total of the product in the scenario.
+
+        Args:
+            obj: (name, EmissionVector) tuple
+        Returns:
+            total biogenic emission of the Product
+        """
+
+        return round(obj[1].biogenic, 2)
+
+
+class ScenarioResponseSerializer(serializers.Serializer):
+    """
+    Serializer for the emission totals of a product without changes and in every requested scenario.
+    """
+
+    baseline = ScenarioResultSerializer()
+    scenarios = ScenarioResultSerializer(many=True)
@@ -0,0 +1,94 @@
+from typing import Dict, Optional, Set, Tuple
+
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.permissions import SAFE_METHODS
+
+# Query parameters of the endpoints whose serializers use SparseFieldsetMixin, for their schemas
+SPARSE_FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        name="fields",
+        type=str,
+        location="query",
+        required=False,
+        description="Comma-separated fields to return, all if omitted. Nested fields are selected with dots, "
+                    "e.g. `id,line_item_product.name`.",
+    ),
+    OpenApiParameter(
+        name="omit",
+        type=str,
+        location="query",
+        required=False,
+        description="Comma-separated fields not to return. Nested fields are omitted with dots, "
+                    "e.g. `line_item_product.emission_total`.",
+    ),
+]
+
+
+def _parse_field_paths(value: Optional[str]) -> Optional[Set[Tuple[str, ...]]]:
+    """
+    Parses a comma-separated list of dotted field paths.
+
+    Args:
+        value: value of a query parameter, None if it is missing
+    Returns:
+        set of field paths as tuples of field names, None if the parameter is missing
+    """
+
+    if value is None:
+        return None
+    return {tuple(path.strip().split(".")) for path in value.split(",") if path.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Lets clients choose the fields of a representation with the `fields` and `omit` query parameters.
+
+    Fields that are not selected are removed from the serializer before anything is serialized, so computed fields
+     and nested serializers that are left out are never evaluated. Nested serializers using the mixin are addressed
+     by their dotted path from the root serializer. Only the representations of safe requests are affected, so the
+     fields that can be written never change.
+    """
+
+    def _get_field_path(self) -> Tuple[str, ...]:
+        """
+        Returns the path of this serializer from the root serializer, skipping list serializers.
+
+        Returns:
+            tuple of field names, empty for the root serializer
+        """
+
+        path = []
+        serializer = self
+        while serializer.parent is not None:
+            if serializer.field_name:
+                path.append(serializer.field_name)
+            serializer = serializer.parent
+        return tuple(reversed(path))
+
+    def get_fields(self) -> Dict:
+        """
+        Returns the fields of the serializer, without the ones left out by the `fields` and `omit` query parameters.
+
+        Returns:
+            dictionary of field name to field
+        """
+
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+        selected = _parse_field_paths(request.query_params.get("fields"))
+        omitted = _parse_field_paths(request.query_params.get("omit"))
+        if selected is None and omitted is None:
+            return fields
+
+        path = self._get_field_path()
+        if selected is not None:
+            inner = [selection[len(path):] for selection in selected if selection[:len(path)] == path]
+            # A nested serializer selected as a whole keeps all its fields
+            if not (path and () in inner):
+                names = {selection[0] for selection in inner}
+                fields = {name: field for name, field in fields.items() if name in names}
+        if omitted is not None:
+            fields = {name: field for name, field in fields.items() if path + (name,) not in omitted}
+        return fields
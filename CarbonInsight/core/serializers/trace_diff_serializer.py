@@ -0,0 +1,129 @@
+from typing import Dict, List, Optional
+
+from rest_framework import serializers
+
+from core.models.emission_trace import EmissionSplit
+from core.serializers.scenario_serializer import ScenarioSerializer
+from core.services.trace_diff import TraceNodeDiff
+
+
+class TraceDiffRequestSerializer(serializers.Serializer):
+    """
+    Serializer for requesting the differences between the current emission trace of a product and another version.
+    """
+
+    snapshot = serializers.IntegerField(
+        required=False,
+        help_text="ID of a recorded PCF snapshot of the product to compare the current trace against. Snapshots only "
+                  "hold the emissions of the product itself, so only the root node is compared.",
+    )
+    scenario = ScenarioSerializer(
+        required=False,
+        help_text="Scenario whose trace is compared against the current trace.",
+    )
+    max_depth = serializers.IntegerField(
+        required=False,
+        min_value=0,
+        help_text="Number of levels of children to compare, all levels if omitted.",
+    )
+
+    def validate(self, attrs):
+        """
+        Validates that exactly one version to compare against is given.
+
+        Args:
+            attrs: validated request
+        Returns:
+            validated request
+        Raises:
+            ValidationError
+        """
+
+        if ("snapshot" in attrs) == ("scenario" in attrs):
+            raise serializers.ValidationError("Exactly one of snapshot and scenario must be given.")
+        return attrs
+
+
+class TraceNodeDiffSerializer(serializers.Serializer):
+    """
+    Serializer for the change of a single node between two emission traces.
+    """
+
+    id = serializers.CharField()
+    label = serializers.CharField()
+    status = serializers.SerializerMethodField()
+    old_quantity = serializers.FloatField(allow_null=True)
+    new_quantity = serializers.FloatField(allow_null=True)
+    old_total = serializers.FloatField(allow_null=True)
+    new_total = serializers.FloatField(allow_null=True)
+    stages = serializers.SerializerMethodField()
+    added_mentions = serializers.SerializerMethodField()
+    removed_mentions = serializers.SerializerMethodField()
+
+    def get_status(self, obj: TraceNodeDiff) -> str:
+        """
+        Returns whether the node has been added, removed or changed.
+
+        Args:
+            obj: TraceNodeDiff object
+        Returns:
+            status of the node
+        """
+
+        return obj.status.value
+
+    def get_stages(self, obj: TraceNodeDiff) -> Dict[str, Dict[str, Optional[Dict[str, float]]]]:
+        """
+        Returns the old and new emissions of the lifecycle stages that changed.
+
+        Args:
+            obj: TraceNodeDiff object
+        Returns:
+            dictionary of LifecycleStage value to the old and new biogenic and non-biogenic emissions
+        """
+
+        def split_to_representation(split: Optional[EmissionSplit]) -> Optional[Dict[str, float]]:
+            if split is None:
+                return None
+            return {"biogenic": split.biogenic, "non_biogenic": split.non_biogenic}
+
+        return {
+            str(stage): {"old": split_to_representation(old), "new": split_to_representation(new)}
+            for stage, (old, new) in obj.stages.items()
+        }
+
+    def get_added_mentions(self, obj: TraceNodeDiff) -> List[Dict[str, str]]:
+        """
+        Returns the mentions that are only in the new trace.
+
+        Args:
+            obj: TraceNodeDiff object
+        Returns:
+            list of mentions
+        """
+
+        return [{"mention_class": mention.mention_class.value, "message": mention.message}
+                for mention in obj.added_mentions]
+
+    def get_removed_mentions(self, obj: TraceNodeDiff) -> List[Dict[str, str]]:
+        """
+        Returns the mentions that are only in the old trace.
+
+        Args:
+            obj: TraceNodeDiff object
+        Returns:
+            list of mentions
+        """
+
+        return [{"mention_class": mention.mention_class.value, "message": mention.message}
+                for mention in obj.removed_mentions]
+
+
+class TraceDiffSerializer(serializers.Serializer):
+    """
+    Serializer for the differences between two emission traces of a product.
+    """
+
+    old_total = serializers.FloatField()
+    new_total = serializers.FloatField()
+    nodes = TraceNodeDiffSerializer(many=True)
@@ -0,0 +1,276 @@
+from collections import defaultdict, deque
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Q, QuerySet
+
+from core.models import ProductBoMClosure, ProductBoMLineItem
+
+# key = (ancestor id, descendant id); value = [path count, cumulative quantity, min depth]
+ClosureRows = Dict[Tuple[int, int], List]
+
+# The number of paths grows exponentially with the number of levels of a DAG, so it saturates at the column maximum
+MAX_PATH_COUNT = 2 ** 63 - 1
+
+
+def _add_line_item(descendants: Dict[int, List], child_id: int, quantity: float, child_descendants: Dict[int, List]):
+    """
+    Adds the paths through a line item to the descendants of its parent product, i.e. the line item product itself
+     and the paths from it to each of its descendants.
+
+    Args:
+        descendants: dictionary of descendant id to [path count, cumulative quantity, min depth] of the parent product
+        child_id: id of the line item product
+        quantity: quantity of the line item
+        child_descendants: dictionary of descendant id to [path count, cumulative quantity, min depth] of the line
+         item product
+    """
+
+    for descendant_id, (path_count, cumulative_quantity, min_depth) in chain(
+        [(child_id, (1, 1.0, 0))], child_descendants.items()
+    ):
+        row = descendants.get(descendant_id)
+        if row is None:
+            descendants[descendant_id] = [path_count, quantity * cumulative_quantity, min_depth + 1]
+            continue
+        row[0] = min(row[0] + path_count, MAX_PATH_COUNT)
+        row[1] += quantity * cumulative_quantity
+        row[2] = min(row[2], min_depth + 1)
+
+
+def _topological_order(product_ids: Iterable[int], line_items_of: Dict[int, List[Tuple[int, float]]]) -> List[int]:
+    """
+    Orders products so that every product comes after the line item products among them.
+
+    Args:
+        product_ids: ids of the products to order
+        line_items_of: dictionary of product id to tuples of (line item product id, quantity) of its line items
+    Returns:
+        list of the product ids, line item products first
+    """
+
+    product_ids = set(product_ids)
+    parents: Dict[int, List[int]] = defaultdict(list)
+    pending = {}
+    for product_id in product_ids:
+        children = {child_id for child_id, _ in line_items_of.get(product_id, ()) if child_id in product_ids}
+        pending[product_id] = len(children)
+        for child_id in children:
+            parents[child_id].append(product_id)
+
+    queue = deque(product_id for product_id, count in pending.items() if count == 0)
+    order = []
+    while queue:
+        product_id = queue.popleft()
+        order.append(product_id)
+        for parent_id in parents[product_id]:
+            pending[parent_id] -= 1
+            if pending[parent_id] == 0:
+                queue.append(parent_id)
+    return order
+
+
+def closure_rows(line_items: Iterable[Tuple[int, int, float]]) -> ClosureRows:
+    """
+    Calculates the transitive closure of a BoM graph in a single pass in topological order, starting with the products
+     that have no line items.
+
+    Args:
+        line_items: tuples of (parent product id, line item product id, quantity) of every line item of the graph
+    Returns:
+        dictionary of (ancestor id, descendant id) to [path count, cumulative quantity, min depth]
+    """
+
+    line_items_of: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+    product_ids = set()
+    for parent_id, child_id, quantity in line_items:
+        line_items_of[parent_id].append((child_id, quantity))
+        product_ids.update((parent_id, child_id))
+
+    # key = product id; value = dictionary of descendant id to [path count, cumulative quantity, min depth]
+    descendants: Dict[int, Dict[int, List]] = {}
+    rows: ClosureRows = {}
+    for product_id in _topological_order(product_ids, line_items_of):
+        product_descendants = {}
+        for child_id, quantity in line_items_of[product_id]:
+            _add_line_item(product_descendants, child_id, quantity, descendants[child_id])
+        descendants[product_id] = product_descendants
+        for descendant_id, row in product_descendants.items():
+            rows[(product_id, descendant_id)] = row
+    return rows
+
+
+def _insert_rows(rows: ClosureRows):
+    """
+    Inserts new rows into the closure table with a single statement, which is much cheaper than creating model
+     instances for the quadratic number of rows of deep BoMs.
+
+    Args:
+        rows: dictionary of (ancestor id, descendant id) to [path count, cumulative quantity, min depth]
+    """
+
+    qn = connection.ops.quote_name
+    opts = ProductBoMClosure._meta
+    columns = ", ".join(qn(opts.get_field(name).column) for name in (
+        "ancestor", "descendant", "path_count", "cumulative_quantity", "min_depth"
+    ))
+    sql = f"INSERT INTO {qn(opts.db_table)} ({columns}) VALUES (%s, %s, %s, %s, %s)"
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (ancestor_id, descendant_id, path_count, cumulative_quantity, min_depth)
+            for (ancestor_id, descendant_id), (path_count, cumulative_quantity, min_depth) in rows.items()
+        ])
+
+
+def rebuild():
+    """
+    Replaces the whole closure table with the closure calculated from all BoM line items. Needed after line items are
+     created or deleted in bulk, which bypasses the signals that maintain the table.
+    """
+
+    rows = closure_rows(ProductBoMLineItem.objects.values_list("parent_product_id", "line_item_product_id", "quantity"))
+    with transaction.atomic():
+        ProductBoMClosure.objects.all().delete()
+        _insert_rows(rows)
+
+
+def apply_line_item_change(parent_id: int, line_item_product_id: int):
+    """
+    Updates the closure for a line item that was added, removed or whose quantity changed.
+
+    Only the pairs of the parent product or one of its ancestors and the line item product or one of its descendants
+     can change. They are recalculated from the current line items of those ancestors, in topological order, and the
+     closure rows of their other line item products, which are not affected. Only the rows whose values changed are
+     written.
+
+    Args:
+        parent_id: id of the parent product of the line item
+        line_item_product_id: id of the line item product
+    """
+
+    with transaction.atomic():
+        ancestor_ids = {parent_id} | set(
+            ProductBoMClosure.objects.filter(descendant_id=parent_id).values_list("ancestor_id", flat=True)
+        )
+        descendant_ids = {line_item_product_id} | set(
+            ProductBoMClosure.objects.filter(ancestor_id=line_item_product_id).values_list("descendant_id", flat=True)
+        )
+        line_items_of: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+        for product_id, child_id, quantity in ProductBoMLineItem.objects.filter(
+            parent_product_id__in=ancestor_ids
+        ).values_list("parent_product_id", "line_item_product_id", "quantity"):
+            line_items_of[product_id].append((child_id, quantity))
+
+        # key = product id; value = dictionary of affected descendant id to [path count, cumulative quantity, min depth]
+        descendants: Dict[int, Dict[int, List]] = defaultdict(dict)
+        other_child_ids = {child_id for items in line_items_of.values() for child_id, _ in items} - ancestor_ids
+        for child_id, descendant_id, path_count, cumulative_quantity, min_depth in ProductBoMClosure.objects.filter(
+            ancestor_id__in=other_child_ids, descendant_id__in=descendant_ids
+        ).values_list("ancestor_id", "descendant_id", "path_count", "cumulative_quantity", "min_depth"):
+            descendants[child_id][descendant_id] = [path_count, cumulative_quantity, min_depth]
+
+        rows: ClosureRows = {}
+        for ancestor_id in _topological_order(ancestor_ids, line_items_of):
+            ancestor_descendants = {}
+            for child_id, quantity in line_items_of[ancestor_id]:
+                _add_line_item(ancestor_descendants, child_id, quantity, descendants[child_id])
+            descendants[ancestor_id] = {
+                descendant_id: row for descendant_id, row in ancestor_descendants.items()
+                if descendant_id in descendant_ids
+            }
+            for descendant_id, row in descendants[ancestor_id].items():
+                rows[(ancestor_id, descendant_id)] = row
+
+        updated, removed = [], []
+        for row in ProductBoMClosure.objects.select_for_update().filter(
+            ancestor_id__in=ancestor_ids, descendant_id__in=descendant_ids
+        ):
+            values = rows.pop((row.ancestor_id, row.descendant_id), None)
+            if values is None:
+                removed.append(row.pk)
+            elif values != [row.path_count, row.cumulative_quantity, row.min_depth]:
+                row.path_count, row.cumulative_quantity, row.min_depth = values
+                updated.append(row)
+        ProductBoMClosure.objects.filter(pk__in=removed).delete()
+        ProductBoMClosure.objects.bulk_update(updated, ["path_count", "cumulative_quantity", "min_depth"],
+                                              batch_size=1000)
+        _insert_rows(rows)
+
+
+def is_used_in(product_id: int, ancestor_id: int) -> bool:
+    """
+    Checks if a product is used, directly or indirectly, in the BoM of another product with a single indexed lookup.
+
+    Args:
+        product_id: id of the product that may be used
+        ancestor_id: id of the product that may use it
+    Returns:
+        True if the product is used in the BoM of the ancestor
+    """
+
+    return ProductBoMClosure.objects.filter(ancestor_id=ancestor_id, descendant_id=product_id).exists()
+
+
+def where_used(product_id: int, max_depth: Optional[int] = None) -> QuerySet:
+    """
+    Returns every product that uses a product in its BoM, directly or indirectly, aggregated over all paths to it.
+     The aggregates of the paths up to a maximum depth are calculated by depth_limited_totals().
+
+    Args:
+        product_id: id of the used product
+        max_depth: maximum number of BoM levels between the using product and the product along the shortest path,
+         unlimited if None
+    Returns:
+        QuerySet of dictionaries with the id, name, sku and supplier of every using product, the depth of its
+         shortest path to the product (min_depth), its number of paths to the product (path_count) and the
+         quantity of the product in it, summed over all paths (cumulative_quantity)
+    """
+
+    rows = ProductBoMClosure.objects.filter(descendant_id=product_id)
+    if max_depth is not None:
+        rows = rows.filter(min_depth__lte=max_depth)
+    return rows.values(
+        "ancestor_id", "ancestor__name", "ancestor__sku", "ancestor__supplier_id", "ancestor__supplier__name",
+        "min_depth", "path_count", "cumulative_quantity",
+    ).order_by("min_depth", "ancestor_id")
+
+
+def depth_limited_totals(product_id: int, max_depth: int) -> Dict[int, List]:
+    """
+    Calculates for every product using a product the path count and cumulative quantity over its paths of at most
+     max_depth BoM levels to the product, which the closure rows cannot tell apart from deeper paths. The line items
+     that can be on those paths are loaded with a single query and the paths are counted level by level.
+
+    Args:
+        product_id: id of the used product
+        max_depth: maximum number of BoM levels of the paths
+    Returns:
+        dictionary of using product id to [path count, cumulative quantity]
+    """
+
+    candidates = ProductBoMClosure.objects.filter(descendant_id=product_id, min_depth__lte=max_depth)
+    parents_of: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+    for parent_id, child_id, quantity in ProductBoMLineItem.objects.filter(
+        Q(line_item_product_id=product_id)
+        | Q(line_item_product_id__in=candidates.filter(min_depth__lt=max_depth).values("ancestor_id")),
+        parent_product_id__in=candidates.values("ancestor_id"),
+    ).values_list("parent_product_id", "line_item_product_id", "quantity"):
+        parents_of[child_id].append((parent_id, quantity))
+
+    totals: Dict[int, List] = {}
+    # key = product id; value = [path count, cumulative quantity] of the paths of the current length to the product
+    level = {product_id: [1, 1.0]}
+    for _ in range(max_depth):
+        next_level: Dict[int, List] = {}
+        for child_id, (path_count, cumulative_quantity) in level.items():
+            for parent_id, quantity in parents_of[child_id]:
+                row = next_level.setdefault(parent_id, [0, 0.0])
+                row[0] = min(row[0] + path_count, MAX_PATH_COUNT)
+                row[1] += quantity * cumulative_quantity
+        for parent_id, (path_count, cumulative_quantity) in next_level.items():
+            row = totals.setdefault(parent_id, [0, 0.0])
+            row[0] = min(row[0] + path_count, MAX_PATH_COUNT)
+            row[1] += cumulative_quantity
+        level = next_level
+    return totals
@@ -0,0 +1,496 @@
+import logging
+from collections import defaultdict, deque
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar
+
+from django.db import connection
+from django.db.models import Prefetch, prefetch_related_objects
+
+from core.models import Product, ProductBoMLineItem, Emission, TransportEmission, UserEnergyEmission, \
+    ProductionEnergyEmission, ProductSharingRequestStatus, ProductEmissionCache
+from core.models.emission_trace import EmissionTrace, EmissionVector
+from core.models.product import ProductEmissionOverrideFactor
+from core.services.reference_cache import reference_cache
+from core.services.sharing_access import SharingAccessMatrix
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _traverse_bom(product_ids: Iterable[int], upward: bool) -> Set[int]:
+    """
+    Walks the BoM graph from the given products with a single recursive query.
+
+    Args:
+        product_ids: ids of the products to start from
+        upward: whether to walk from line item products to their parents instead of from parents to line item products
+    Returns:
+        set of product ids including the given ones
+    """
+
+    product_ids = list({int(product_id) for product_id in product_ids})
+    if not product_ids:
+        return set()
+
+    qn = connection.ops.quote_name
+    product_table = qn(Product._meta.db_table)
+    line_item_table = qn(ProductBoMLineItem._meta.db_table)
+    parent_column = qn(ProductBoMLineItem._meta.get_field("parent_product").column)
+    child_column = qn(ProductBoMLineItem._meta.get_field("line_item_product").column)
+    from_column, to_column = (child_column, parent_column) if upward else (parent_column, child_column)
+    placeholders = ", ".join(["%s"] * len(product_ids))
+
+    # UNION (instead of UNION ALL) deduplicates rows, so shared sub-products are only visited once
+    sql = (
+        f"WITH RECURSIVE reachable(product_id) AS ("
+        f" SELECT id FROM {product_table} WHERE id IN ({placeholders})"
+        f" UNION"
+        f" SELECT li.{to_column} FROM {line_item_table} li"
+        f" INNER JOIN reachable r ON li.{from_column} = r.product_id"
+        f") SELECT product_id FROM reachable"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, product_ids)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def reachable_product_ids(product_ids: Iterable[int]) -> Set[int]:
+    """
+    Returns the ids of the given products and of every product reachable from them through BoM line items.
+
+    Args:
+        product_ids: ids of the products to start from
+    Returns:
+        set of product ids including the given ones
+    """
+
+    return _traverse_bom(product_ids, upward=False)
+
+
+def ancestor_product_ids(product_ids: Iterable[int]) -> Set[int]:
+    """
+    Returns the ids of the given products and of every product that uses them, directly or indirectly, in its BoM.
+
+    Args:
+        product_ids: ids of the products to start from
+    Returns:
+        set of product ids including the given ones
+    """
+
+    return _traverse_bom(product_ids, upward=True)
+
+
+def cumulative_use_counts(product_ids: Iterable[int]) -> Dict[int, float]:
+    """
+    Calculates how many times each of the given products is used across all BoMs, directly or indirectly, in a single
+     pass in topological order.
+
+    Products that are themselves among the given ones are not counted as users, so a product used by another given
+     product (e.g. in A->B->A supply chains) is not counted twice. The number of times a product is used is the sum
+     over all paths to its users of the product of the line item quantities, which is calculated from the roots down
+     as uses(user) = 1 + sum(quantity * uses(parent)) for every user, instead of enumerating every path.
+
+    Args:
+        product_ids: ids of the products to count the uses of
+    Returns:
+        dictionary of product id to cumulative quantity it is used in
+    """
+
+    product_ids = {int(product_id) for product_id in product_ids}
+    user_ids = ancestor_product_ids(product_ids) - product_ids
+    # key = product id; value = list of (parent product id, quantity) for every parent that counts as user
+    parents: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+    for parent_id, child_id, quantity in ProductBoMLineItem.objects.filter(parent_product_id__in=user_ids) \
+            .values_list("parent_product_id", "line_item_product_id", "quantity"):
+        if child_id in user_ids or child_id in product_ids:
+            parents[child_id].append((parent_id, quantity))
+
+    # Every user is handled after all its parents, starting with the users that are not used anywhere themselves
+    pending = {user_id: len(parents[user_id]) for user_id in user_ids}
+    children: Dict[int, List[int]] = defaultdict(list)
+    for child_id, child_parents in parents.items():
+        if child_id in user_ids:
+            for parent_id, _ in child_parents:
+                children[parent_id].append(child_id)
+    queue = deque(user_id for user_id, count in pending.items() if count == 0)
+    uses: Dict[int, float] = {}
+    while queue:
+        user_id = queue.popleft()
+        uses[user_id] = 1.0 + sum(quantity * uses[parent_id] for parent_id, quantity in parents[user_id])
+        for child_id in children[user_id]:
+            pending[child_id] -= 1
+            if pending[child_id] == 0:
+                queue.append(child_id)
+
+    return {
+        product_id: sum(quantity * uses.get(parent_id, 0.0) for parent_id, quantity in parents[product_id])
+        for product_id in product_ids
+    }
+
+
+class BoMGraph:
+    """
+    In-memory snapshot of the BoM subgraph reachable from a set of root products.
+
+    Every relation that is needed to calculate an emission trace (line items, polymorphic emissions, override factors,
+     references and product sharing requests) is fetched in a fixed number of queries, independent of the size
+     and depth of the BoM. Reference factors and the totals of reference company products come from the in-process
+     reference cache instead. The loaded instances are private to the graph, so the caches primed on them never leak
+     into instances held by the caller.
+    """
+
+    def __init__(self, products: Dict[int, Product], reference_version: Optional[int] = None):
+        self.products = products
+        # version of the reference cache the graph was loaded at
+        self.reference_version = reference_version
+        # key = (product id, viewer company id); value = emission trace built for that viewer
+        self._traces: Dict[Tuple[int, int], EmissionTrace] = {}
+        # key = (product id, viewer company id); value = emission totals calculated for that viewer
+        self._totals: Dict[Tuple[int, int], EmissionVector] = {}
+        # key = product id; value = line items or override factors evaluated instead of the loaded ones
+        self._line_item_replacements: Dict[int, List[ProductBoMLineItem]] = {}
+        self._override_factor_replacements: Dict[int, List[ProductEmissionOverrideFactor]] = {}
+        # ids of the products that cannot be evaluated, since the PCF of a line item product is not stored (see
+        # load_level)
+        self.unavailable_product_ids: Set[int] = set()
+
+    @classmethod
+    def load(cls, product_ids: Iterable[int]) -> "BoMGraph":
+        """
+        Loads the BoM subgraph reachable from the given products.
+
+        Args:
+            product_ids: ids of the root products
+        Returns:
+            BoMGraph with all reachable products and their relations loaded
+        """
+
+        reference_cache.sync()
+        ids = reachable_product_ids(product_ids)
+        products = {
+            product.pk: product
+            for product in Product.objects.filter(pk__in=ids).select_related("supplier")
+        }
+        graph = cls(products, reference_cache.get_version())
+        graph._prefetch()
+        graph._prefetch_reference_product_totals()
+        return graph
+
+    @classmethod
+    def load_level(cls, product_ids: Iterable[int]) -> "BoMGraph":
+        """
+        Loads the given products, but of their BoMs only the direct line item products, whose emission totals are
+         taken from their materialized PCF instead of being calculated. Used to evaluate a BoM level by level,
+         starting with the products that have no line items.
+
+        Stored PCFs are only read, never recomputed, so loading a level does not write. The products with a line item
+         product whose PCF is missing or has been invalidated are listed in unavailable_product_ids instead, and must
+         not be evaluated with this graph.
+
+        Args:
+            product_ids: ids of the products to evaluate
+        Returns:
+            BoMGraph that can calculate the emission totals of the given products
+        """
+
+        reference_cache.sync()
+        product_ids = {int(product_id) for product_id in product_ids}
+        line_item_product_ids = set(
+            ProductBoMLineItem.objects.filter(parent_product_id__in=product_ids)
+            .values_list("line_item_product_id", flat=True)
+        ) - product_ids
+        products = {
+            product.pk: product
+            for product in Product.objects.filter(pk__in=product_ids | line_item_product_ids).select_related("supplier")
+        }
+        graph = cls(products, reference_cache.get_version())
+        level_products = [products[product_id] for product_id in product_ids if product_id in products]
+        graph._prefetch(level_products)
+        stored_ids = set()
+        for entry in ProductEmissionCache.objects.filter(
+            product_id__in=line_item_product_ids, is_valid=True
+        ).only("product_id", "emissions_subtotal"):
+            graph._totals[graph._key(entry.product_id)] = EmissionVector(entry.get_emissions_subtotal())
+            stored_ids.add(entry.product_id)
+        graph.unavailable_product_ids = {
+            product.pk
+            for product in level_products
+            if any(
+                line_item.line_item_product_id in line_item_product_ids
+                and line_item.line_item_product_id not in stored_ids
+                for line_item in product.line_items.all()
+            )
+        }
+        return graph
+
+    def _prefetch(self, products: Optional[List[Product]] = None):
+        """
+        Primes the relation caches of the loaded products so that building the trace runs without further queries.
+
+        Args:
+            products: products whose relations are needed, all products of this graph if None
+        """
+
+        if products is None:
+            products = list(self.products.values())
+        prefetch_related_objects(
+            products,
+            Prefetch("line_items", queryset=ProductBoMLineItem.objects.order_by("pk")),
+            Prefetch("emissions", queryset=Emission.objects.order_by("pk")),
+            "override_factors",
+        )
+
+        # Point every line item to the shared product instances of this graph
+        line_items: List[ProductBoMLineItem] = []
+        for product in products:
+            for line_item in product.line_items.all():
+                line_item.parent_product = product
+                line_item.line_item_product = self.products[line_item.line_item_product_id]
+                line_items.append(line_item)
+
+        self._prefetch_emissions([
+            emission for product in products for emission in product.emissions.all()
+        ])
+        SharingAccessMatrix.for_line_items(line_items)
+
+    def _prefetch_emissions(self, emissions: List[Emission]):
+        """
+        Primes the override factors, linked line items and references of the emissions, and the factors of the
+         references from the reference cache.
+
+        Args:
+            emissions: real (polymorphic) instances of the emissions in this graph
+        """
+
+        if not emissions:
+            return
+        prefetch_related_objects(
+            emissions,
+            "override_factors",
+            Prefetch("line_items", queryset=ProductBoMLineItem.objects.order_by("pk")),
+        )
+        for emission in emissions:
+            emission.parent_product = self.products[emission.parent_product_id]
+            for line_item in emission.line_items.all():
+                line_item.line_item_product = self.products[line_item.line_item_product_id]
+
+        # Prefetching a forward relation requires instances of the same model
+        by_model = defaultdict(list)
+        for emission in emissions:
+            by_model[type(emission)].append(emission)
+        for model in (TransportEmission, UserEnergyEmission, ProductionEnergyEmission):
+            if by_model[model]:
+                prefetch_related_objects(by_model[model], "reference")
+                references = [emission.reference for emission in by_model[model] if emission.reference is not None]
+                vectors = reference_cache.get_reference_vectors(
+                    model._meta.get_field("reference").related_model,
+                    [reference.pk for reference in references],
+                )
+                for reference in references:
+                    reference._reference_vector = vectors[reference.pk]
+
+    def _prefetch_reference_product_totals(self):
+        """
+        Seeds the totals memo with the cached totals of the products of the reference company, so neither they nor
+         their BoMs are calculated again.
+        """
+
+        for product_id, product in self.products.items():
+            if product.supplier.is_reference:
+                totals = reference_cache.get_product_totals(product_id)
+                if totals is not None:
+                    self._totals[self._key(product_id)] = totals
+
+    def replace_relations(self, product_id: int, line_items: Optional[List[ProductBoMLineItem]] = None,
+                          override_factors: Optional[List[ProductEmissionOverrideFactor]] = None):
+        """
+        Makes this graph evaluate a product with other line items or override factors than the loaded ones, e.g. to
+         build the trace of a what-if scenario. Must be called before anything is evaluated, since the results of
+         other products are memoized.
+
+        Args:
+            product_id: id of a product of this graph
+            line_items: line items to evaluate instead of the loaded ones, unchanged if None
+            override_factors: override factors to evaluate instead of the loaded ones, unchanged if None
+        """
+
+        if line_items is not None:
+            self._line_item_replacements[product_id] = line_items
+        if override_factors is not None:
+            self._override_factor_replacements[product_id] = override_factors
+
+    def get_line_items(self, product_id: int) -> Iterable[ProductBoMLineItem]:
+        """
+        Returns the line items a product of this graph is evaluated with.
+
+        Args:
+            product_id: id of a product of this graph
+        Returns:
+            the loaded line items of the product, or their replacement (see replace_relations)
+        """
+
+        if product_id in self._line_item_replacements:
+            return self._line_item_replacements[product_id]
+        return self.products[product_id].line_items.all()
+
+    def get_override_factors(self, product_id: int) -> Iterable[ProductEmissionOverrideFactor]:
+        """
+        Returns the override factors a product of this graph is evaluated with.
+
+        Args:
+            product_id: id of a product of this graph
+        Returns:
+            the loaded override factors of the product, or their replacement (see replace_relations)
+        """
+
+        if product_id in self._override_factor_replacements:
+            return self._override_factor_replacements[product_id]
+        return self.products[product_id].override_factors.all()
+
+    def _key(self, product_id: int) -> Tuple[int, int]:
+        """
+        Returns the memo key of a product: its id and the viewer company, i.e. the supplier of the product whose
+         sharing requests decide which line items are accessible.
+
+        Args:
+            product_id: id of a product of this graph
+        Returns:
+            (product id, viewer company id) tuple
+        """
+
+        return product_id, self.products[product_id].supplier_id
+
+    def _evaluated_line_item_product_ids(self, product_id: int) -> List[int]:
+        """
+        Returns the ids of the line item products whose results are needed to evaluate a product, i.e. those that are
+         not hidden by a pending or rejected sharing request.
+
+        Args:
+            product_id: id of a product of this graph
+        Returns:
+            list of product ids
+        """
+
+        return [
+            line_item.line_item_product_id
+            for line_item in self.get_line_items(product_id)
+            if line_item.product_sharing_request_status not in (ProductSharingRequestStatus.PENDING,
+                                                                ProductSharingRequestStatus.REJECTED)
+        ]
+
+    def _evaluate(self, product_id: int, memo: Dict[Tuple[int, int], T], build: Callable[[Product], T]) -> T:
+        """
+        Evaluates a product after all products of its BoM that it needs, in depth-first post-order with an explicit
+         stack. Every build therefore only finds already evaluated line item products in the memo, and the depth of
+         the BoM is not limited by the recursion limit.
+
+        Args:
+            product_id: id of a product of this graph
+            memo: results per memo key, updated in place
+            build: function evaluating a single product
+        Returns:
+            result of the product
+        """
+
+        stack: List[Tuple[int, bool]] = [(product_id, False)]
+        while stack:
+            current_id, line_items_done = stack.pop()
+            key = self._key(current_id)
+            if key in memo:
+                continue
+            if line_items_done:
+                memo[key] = build(self.products[current_id])
+                continue
+            stack.append((current_id, True))
+            for line_item_product_id in self._evaluated_line_item_product_ids(current_id):
+                if self._key(line_item_product_id) not in memo:
+                    stack.append((line_item_product_id, False))
+        return memo[self._key(product_id)]
+
+    def get_emission_trace(self, product_id: int) -> EmissionTrace:
+        """
+        Builds the emission trace of a product of this graph from the loaded data.
+
+        Every product is built once per viewer and reused wherever it appears in the BoM, so the work is proportional
+         to the number of distinct products rather than to the number of paths through the BoM. The viewer is the
+         supplier of the product, whose sharing requests decide which line items are accessible. The returned trace
+         is shared between all its usages and must not be modified.
+
+        Args:
+            product_id: id of a product of this graph
+        Returns:
+            EmissionTrace of the product
+        """
+
+        return self._evaluate(product_id, self._traces, lambda product: product._build_emission_trace(self))
+
+    def get_emission_totals(self, product_id: int) -> EmissionVector:
+        """
+        Calculates only the emissions per lifecycle stage of a product of this graph, without building an
+         EmissionTrace. Like get_emission_trace, every product is calculated once per viewer and the returned vector
+         must not be modified.
+
+        Args:
+            product_id: id of a product of this graph
+        Returns:
+            EmissionVector of the product
+        """
+
+        return self._evaluate(product_id, self._totals, self._build_emission_totals)
+
+    def _build_emission_totals(self, product: Product) -> EmissionVector:
+        """
+        Calculates the emission totals of a single product and caches them if it belongs to the reference company.
+
+        Args:
+            product: product of this graph
+        Returns:
+            EmissionVector of the product
+        """
+
+        totals = product._build_emission_totals(self)
+        if product.supplier.is_reference:
+            reference_cache.set_product_totals(product.pk, totals, self.reference_version)
+        return totals
+
+    def topological_order(self) -> List[int]:
+        """
+        Orders the products of this graph so that every product comes after all products of its BoM.
+
+        Returns:
+            list of product ids, leaves first
+        """
+
+        parents: Dict[int, List[int]] = defaultdict(list)
+        pending: Dict[int, int] = {}
+        for product_id in self.products:
+            line_items = self.get_line_items(product_id)
+            pending[product_id] = len(line_items)
+            for line_item in line_items:
+                parents[line_item.line_item_product_id].append(product_id)
+
+        queue = deque(product_id for product_id, count in pending.items() if count == 0)
+        order = []
+        while queue:
+            product_id = queue.popleft()
+            order.append(product_id)
+            for parent_id in parents[product_id]:
+                pending[parent_id] -= 1
+                if pending[parent_id] == 0:
+                    queue.append(parent_id)
+        return order
+
+    def get_all_emission_totals(self, product_ids: Iterable[int]) -> Dict[int, EmissionVector]:
+        """
+        Calculates the emission totals of many products of this graph in a single pass in topological order, so every
+         product shared between their BoMs is only calculated once.
+
+        Args:
+            product_ids: ids of products of this graph
+        Returns:
+            dictionary of product id to EmissionVector
+        """
+
+        for product_id in self.topological_order():
+            self.get_emission_totals(product_id)
+        return {product_id: self.get_emission_totals(product_id) for product_id in product_ids}
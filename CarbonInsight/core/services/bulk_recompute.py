@@ -0,0 +1,89 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+import django
+
+from core.models import Product, ProductBoMLineItem, ProductEmissionCache
+from core.services.bom_graph import BoMGraph
+
+
+def topological_levels() -> List[List[int]]:
+    """
+    Partitions all products into levels, so that every product is in a higher level than all products of its BoM.
+     Level 0 holds the products without line items, and products in the same level never depend on each other.
+
+    Returns:
+        list of levels, each a list of product ids
+    """
+
+    line_items: Dict[int, List[int]] = defaultdict(list)
+    parents: Dict[int, List[int]] = defaultdict(list)
+    for parent_id, child_id in ProductBoMLineItem.objects.values_list("parent_product_id", "line_item_product_id"):
+        line_items[parent_id].append(child_id)
+        parents[child_id].append(parent_id)
+
+    pending = {product_id: len(line_items[product_id]) for product_id in Product.objects.values_list("id", flat=True)}
+    level = [product_id for product_id, count in pending.items() if count == 0]
+    levels = []
+    while level:
+        levels.append(level)
+        next_level = []
+        for product_id in level:
+            for parent_id in parents[product_id]:
+                pending[parent_id] -= 1
+                if pending[parent_id] == 0:
+                    next_level.append(parent_id)
+        level = next_level
+    return levels
+
+
+def chunks(product_ids: List[int], size: int) -> Iterable[List[int]]:
+    """
+    Splits a level into chunks that are evaluated independently.
+
+    Args:
+        product_ids: ids of the products of a level
+        size: maximum number of products per chunk
+    Returns:
+        iterable of lists of product ids
+    """
+
+    for start in range(0, len(product_ids), size):
+        yield product_ids[start:start + size]
+
+
+def init_worker():
+    """
+    Initializes a worker process, setting up Django again if the process has been spawned instead of forked. Every
+     worker opens its own database connection on its first query.
+    """
+
+    django.setup()
+
+
+def calculate_subtotals(product_ids: List[int]) -> Tuple[Dict[int, dict], Dict[int, int], List[int]]:
+    """
+    Calculates the emissions of products whose line item products already have a valid materialized PCF. Runs in a
+     worker process and only reads from the database.
+
+    Args:
+        product_ids: ids of products of the same level
+    Returns:
+        tuple of the JSON representation of the emissions per product id (see ProductEmissionCache.emissions_subtotal),
+         the version of the cache entry per product id, read before calculating, and the ids of the products that
+         were skipped since the PCF of a line item product is missing or has been invalidated
+    """
+
+    versions = dict(
+        ProductEmissionCache.objects.filter(product_id__in=product_ids).values_list("product_id", "version")
+    )
+    graph = BoMGraph.load_level(product_ids)
+    subtotals = {}
+    for product_id in product_ids:
+        if product_id not in versions or product_id not in graph.products \
+                or product_id in graph.unavailable_product_ids:
+            continue
+        entry = ProductEmissionCache(product_id=product_id)
+        entry._set_emissions_subtotal(graph.get_emission_totals(product_id))
+        subtotals[product_id] = entry.emissions_subtotal
+    return subtotals, versions, sorted(graph.unavailable_product_ids)
@@ -0,0 +1,211 @@
+from collections import defaultdict, deque
+from typing import Dict, Iterable, List, Optional, Type
+
+from core.models import Emission, Product, ProductBoMLineItem, ProductEmissionCache, ProductSharingRequestStatus
+from core.models.emission_trace import EmissionSplit, EmissionVector
+from core.models.lifecycle_stage import LifecycleStage
+from core.models.product import ProductEmissionOverrideFactor
+from core.services.bom_graph import ancestor_product_ids
+from core.services.reference_cache import reference_cache
+from core.services.sharing_access import SharingAccessMatrix
+
+
+def emission_contribution(emission: Emission) -> Optional[EmissionVector]:
+    """
+    Returns the emissions an emission adds to its parent product, i.e. its totals times its quantity.
+
+    Args:
+        emission: Emission object
+    Returns:
+        EmissionVector, or None if the emission cannot be calculated (e.g. its reference has an unknown lifecycle stage)
+    """
+
+    try:
+        return emission.get_emission_totals() * emission.quantity
+    except ValueError:
+        return None
+
+
+def vector_difference(new: Optional[EmissionVector], old: Optional[EmissionVector]) -> Optional[EmissionVector]:
+    """
+    Returns the change from one contribution to another, if it can be propagated as a delta.
+
+    A delta can only add lifecycle stages to the totals it is added to. If a stage of the old contribution is missing
+     from the new one, the stage may disappear from the totals of the affected products, which requires a full
+     recomputation.
+
+    Args:
+        new: contribution after the change, None if it could not be calculated
+        old: contribution before the change, None if it could not be calculated
+    Returns:
+        EmissionVector with the change per lifecycle stage, or None if it cannot be propagated
+    """
+
+    if new is None or old is None or any(stage not in new for stage in old):
+        return None
+    delta = EmissionVector()
+    delta.add_weighted([(new, 1.0), (old, -1.0)])
+    return delta
+
+
+def reference_factor_deltas(emission_model: Type[Emission], reference_id: int,
+                            factor_delta: EmissionVector) -> Dict[int, EmissionVector]:
+    """
+    Returns the change of the contribution of every emission based on a reference whose factors changed.
+
+    Emissions are linear in the factors of their reference, so the change of their contribution is their regular
+     calculation applied to the change of the factors. Emissions with override factors do not depend on their
+     reference and are skipped.
+
+    Args:
+        emission_model: TransportEmission, UserEnergyEmission or ProductionEnergyEmission
+        reference_id: id of the changed reference
+        factor_delta: change of the factors of the reference
+    Returns:
+        dictionary of parent product id to EmissionVector
+    """
+
+    deltas: Dict[int, EmissionVector] = defaultdict(EmissionVector)
+    emissions = emission_model.objects.filter(reference_id=reference_id).select_related("reference") \
+        .prefetch_related("override_factors")
+    for emission in emissions:
+        if emission.override_factors.exists():
+            continue
+        # Calculate with the change of the factors instead of the factors themselves
+        emission.reference._reference_vector = factor_delta
+        deltas[emission.parent_product_id].add_weighted([(emission._get_emission_totals(), emission.quantity)])
+    return deltas
+
+
+def factor_difference(lifecycle_stage: str, new: EmissionSplit, old: Optional[EmissionSplit]) -> EmissionVector:
+    """
+    Returns the change of the factors of a reference when a single factor is created or updated.
+
+    Args:
+        lifecycle_stage: lifecycle stage of the factor
+        new: values of the factor after the change
+        old: values of the factor before the change, None if it was created
+    Returns:
+        EmissionVector with the change of the factor
+    """
+
+    if old is None:
+        old = EmissionSplit(biogenic=0.0, non_biogenic=0.0)
+    delta = EmissionVector()
+    delta[LifecycleStage(lifecycle_stage)] = EmissionSplit(
+        biogenic=new.biogenic - old.biogenic,
+        non_biogenic=new.non_biogenic - old.non_biogenic,
+    )
+    return delta
+
+
+def line_item_delta(line_item: ProductBoMLineItem, old_quantity: float) -> EmissionVector:
+    """
+    Returns the change of the emissions of the parent product of a BoM line item whose quantity changed.
+
+    Args:
+        line_item: ProductBoMLineItem object after the change
+        old_quantity: quantity before the change, 0 if the line item was created
+    Returns:
+        EmissionVector with the change, empty if the line item product is hidden by its sharing request
+    """
+
+    if line_item.product_sharing_request_status in (ProductSharingRequestStatus.PENDING,
+                                                    ProductSharingRequestStatus.REJECTED):
+        return EmissionVector()
+    line_item_totals = EmissionVector(
+        ProductEmissionCache.get_for_product(line_item.line_item_product).get_emissions_subtotal()
+    )
+    return line_item_totals * (line_item.quantity - old_quantity)
+
+
+def _ancestors_in_topological_order(line_items: List[ProductBoMLineItem], product_ids: Iterable[int]) -> List[int]:
+    """
+    Orders products so that every product comes after all products of its BoM.
+
+    Args:
+        line_items: line items between the given products
+        product_ids: ids of the products to order
+    Returns:
+        list of product ids, leaves first
+    """
+
+    parents: Dict[int, List[int]] = defaultdict(list)
+    pending: Dict[int, int] = {product_id: 0 for product_id in product_ids}
+    for line_item in line_items:
+        parents[line_item.line_item_product_id].append(line_item.parent_product_id)
+        pending[line_item.parent_product_id] += 1
+
+    queue = deque(product_id for product_id, count in pending.items() if count == 0)
+    order = []
+    while queue:
+        product_id = queue.popleft()
+        order.append(product_id)
+        for parent_id in parents[product_id]:
+            pending[parent_id] -= 1
+            if pending[parent_id] == 0:
+                queue.append(parent_id)
+    return order
+
+
+def propagate_emission_deltas(deltas: Dict[int, EmissionVector]):
+    """
+    Adds changes of the emissions of products to the materialized PCF of those products and all their ancestors.
+
+    The change of every ancestor is the sum of the changes of its line item products, each multiplied by the quantity
+     of the line item, which is calculated in a single pass over the ancestors in topological order. Line items that
+     are hidden by a pending or rejected sharing request pass on no change, and neither do products with override
+     factors, whose PCF does not depend on their BoM.
+
+    Args:
+        deltas: dictionary of product id to the change of its own emissions
+    """
+
+    deltas = {product_id: delta for product_id, delta in deltas.items() if len(delta)}
+    if not deltas:
+        return
+
+    product_ids = ancestor_product_ids(deltas.keys())
+    products = {
+        product.pk: product
+        for product in Product.objects.filter(pk__in=product_ids).select_related("supplier").only(
+            "supplier", "supplier__is_reference", "supplier__auto_approve_product_sharing_requests"
+        )
+    }
+    overridden = set(ProductEmissionOverrideFactor.objects.filter(product_id__in=product_ids)
+                     .values_list("product_id", flat=True))
+    # Filtering on both ends of the line items in SQL is much slower on large sets of ancestors
+    line_items = [
+        line_item
+        for line_item in ProductBoMLineItem.objects.filter(parent_product_id__in=product_ids)
+        if line_item.line_item_product_id in product_ids
+    ]
+    line_items_by_parent: Dict[int, List[ProductBoMLineItem]] = defaultdict(list)
+    for line_item in line_items:
+        line_item.parent_product = products[line_item.parent_product_id]
+        line_item.line_item_product = products[line_item.line_item_product_id]
+        line_items_by_parent[line_item.parent_product_id].append(line_item)
+    SharingAccessMatrix.for_line_items(line_items)
+
+    product_deltas: Dict[int, EmissionVector] = {}
+    for product_id in _ancestors_in_topological_order(line_items, product_ids):
+        if product_id in overridden:
+            continue
+        weighted = []
+        if product_id in deltas:
+            weighted.append((deltas[product_id], 1.0))
+        for line_item in line_items_by_parent[product_id]:
+            if line_item.line_item_product_id not in product_deltas:
+                continue
+            if line_item.product_sharing_request_status in (ProductSharingRequestStatus.PENDING,
+                                                            ProductSharingRequestStatus.REJECTED):
+                continue
+            weighted.append((product_deltas[line_item.line_item_product_id], line_item.quantity))
+        if weighted:
+            product_deltas[product_id] = EmissionVector()
+            product_deltas[product_id].add_weighted(weighted)
+
+    ProductEmissionCache.apply_deltas(product_deltas)
+    # The totals of reference company products are also cached in memory
+    if any(products[product_id].supplier.is_reference for product_id in product_deltas):
+        reference_cache.invalidate()
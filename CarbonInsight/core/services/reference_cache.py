@@ -0,0 +1,128 @@
+from typing import Dict, Iterable, Optional, Tuple, Type
+
+from django.db import models
+
+from core.models import ReferenceDataVersion
+from core.models.emission_trace import EmissionSplit, EmissionVector
+from core.models.lifecycle_stage import LifecycleStage
+
+
+class ReferenceCache:
+    """
+    In-process cache of reference data: the factor vectors of emission references and the emission totals of the
+     products of the reference company.
+
+    Reference data changes rarely but is used by almost every product, so it is kept in memory and shared between all
+     requests of a process. Every change bumps ReferenceDataVersion; sync() compares that version against the one
+     the cache was filled at and drops all entries when they differ. Cached vectors are shared and must not be
+     modified.
+    """
+
+    def __init__(self):
+        self._version: Optional[int] = None
+        # key = (reference model, reference id); value = factors of the reference
+        self._reference_vectors: Dict[Tuple[Type[models.Model], int], EmissionVector] = {}
+        # key = product id; value = emission totals of a product of the reference company
+        self._product_totals: Dict[int, EmissionVector] = {}
+
+    def sync(self):
+        """
+        Drops all entries if reference data has changed since the cache was filled. Costs a single query.
+        """
+
+        version = ReferenceDataVersion.current()
+        if version != self._version:
+            self.clear()
+            self._version = version
+
+    def clear(self):
+        """
+        Drops all entries. The dictionaries are replaced rather than cleared, so concurrent readers never see a
+         partially cleared cache.
+        """
+
+        self._reference_vectors = {}
+        self._product_totals = {}
+
+    def invalidate(self):
+        """
+        Marks reference data as changed, in this process and (through ReferenceDataVersion) in every other one.
+        Nothing is cached again until the next sync().
+        """
+
+        ReferenceDataVersion.bump()
+        self._version = None
+        self.clear()
+
+    def get_reference_vectors(self, reference_model: Type[models.Model],
+                              reference_ids: Iterable[int]) -> Dict[int, EmissionVector]:
+        """
+        Returns the factors of the given references, loading those not cached yet with a single query.
+
+        Args:
+            reference_model: TransportEmissionReference, UserEnergyEmissionReference or
+             ProductionEnergyEmissionReference
+            reference_ids: ids of references of that model
+        Returns:
+            dictionary of reference id to EmissionVector
+        """
+
+        reference_ids = set(reference_ids)
+        vectors = self._reference_vectors
+        result = {
+            reference_id: vectors[(reference_model, reference_id)]
+            for reference_id in reference_ids
+            if (reference_model, reference_id) in vectors
+        }
+        missing = reference_ids - result.keys()
+        if missing:
+            loaded = {reference_id: EmissionVector() for reference_id in missing}
+            factor_model = reference_model._meta.get_field("reference_factors").related_model
+            for factor in factor_model.objects.filter(emission_reference_id__in=missing):
+                loaded[factor.emission_reference_id][LifecycleStage(factor.lifecycle_stage)] = EmissionSplit(
+                    biogenic=factor.co_2_emission_factor_biogenic,
+                    non_biogenic=factor.co_2_emission_factor_non_biogenic
+                )
+            # Only keep what was loaded if the cache has not been invalidated or synced in the meantime
+            if self._version is not None and vectors is self._reference_vectors:
+                vectors.update(((reference_model, reference_id), vector) for reference_id, vector in loaded.items())
+            result.update(loaded)
+        return result
+
+    def get_product_totals(self, product_id: int) -> Optional[EmissionVector]:
+        """
+        Returns the cached emission totals of a product of the reference company.
+
+        Args:
+            product_id: id of a product of the reference company
+        Returns:
+            EmissionVector, or None if not cached
+        """
+
+        return self._product_totals.get(product_id)
+
+    def set_product_totals(self, product_id: int, totals: EmissionVector, version: Optional[int]):
+        """
+        Caches the emission totals of a product of the reference company.
+
+        Args:
+            product_id: id of a product of the reference company
+            totals: emission totals of the product
+            version: version of the cache the totals were calculated from, see get_version()
+        """
+
+        if version is not None and version == self._version:
+            self._product_totals[product_id] = totals
+
+    def get_version(self) -> Optional[int]:
+        """
+        Returns the version of reference data the cache currently holds.
+
+        Returns:
+            version as int, or None if the cache has been invalidated since the last sync()
+        """
+
+        return self._version
+
+
+reference_cache = ReferenceCache()
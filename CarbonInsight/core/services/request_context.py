@@ -0,0 +1,111 @@
+from functools import cached_property
+from typing import Dict, Optional, Set, Union
+
+from core.models import Company, CompanyMembership
+
+
+class RequestContext:
+    """
+    Request-scoped cache of the companies a request refers to and of the company memberships of its user.
+
+    Every company is resolved at most once per request and all memberships of the user are loaded with a single
+     query, so the permission checks of a request run a fixed number of queries, however many objects it returns.
+     Permissions, view mixins and serializers share the context of a request through for_request().
+    """
+
+    # Name of the attribute of the request the context is stored in
+    REQUEST_ATTRIBUTE = "_request_context"
+
+    def __init__(self, user):
+        self.user = user
+        # key = company id; value = Company object, None if there is no such company
+        self._companies: Dict[int, Optional[Company]] = {}
+
+    @classmethod
+    def for_request(cls, request) -> "RequestContext":
+        """
+        Returns the context of a request, creating it on first use.
+
+        Args:
+            request: DRF Request object
+        Returns:
+            RequestContext of the request
+        """
+
+        context = getattr(request, cls.REQUEST_ATTRIBUTE, None)
+        # A request may be re-authenticated, e.g. by force_authenticate in tests
+        if context is None or context.user is not request.user:
+            context = cls(request.user)
+            setattr(request, cls.REQUEST_ATTRIBUTE, context)
+        return context
+
+    @cached_property
+    def reference_company_id(self) -> int:
+        """
+        Returns the id of the reference company.
+
+        Returns:
+            id of the reference company
+        Raises:
+            Company.DoesNotExist: If there is no reference company
+            Company.MultipleObjectsReturned: If more than one company is marked as the reference company
+        """
+
+        return Company.objects.values_list("pk", flat=True).get(is_reference=True)
+
+    def resolve_company_pk(self, company_pk: Union[int, str]) -> int:
+        """
+        Resolves a company primary key from a URL, handling the special case "reference" for the reference company.
+
+        Args:
+            company_pk: primary key of a company or "reference"
+        Returns:
+            id of the company
+        """
+
+        if company_pk == "reference":
+            return self.reference_company_id
+        return int(company_pk)
+
+    def get_company(self, company_pk: Union[int, str]) -> Optional[Company]:
+        """
+        Returns a company by its primary key, querying it only the first time it is requested.
+
+        Args:
+            company_pk: primary key of a company or "reference"
+        Returns:
+            Company object, or None if there is no such company
+        """
+
+        company_id = self.resolve_company_pk(company_pk)
+        if company_id not in self._companies:
+            self._companies[company_id] = Company.objects.filter(pk=company_id).first()
+        return self._companies[company_id]
+
+    @cached_property
+    def member_company_ids(self) -> Set[int]:
+        """
+        Returns the ids of the companies the user of the request is a member of.
+
+        Returns:
+            set of company ids, empty for anonymous users
+        """
+
+        if not self.user or not self.user.is_authenticated:
+            return set()
+        return set(CompanyMembership.objects.filter(user_id=self.user.pk).order_by().values_list(
+            "company_id", flat=True
+        ))
+
+    def is_member(self, company: Union[Company, int]) -> bool:
+        """
+        Checks if the user of the request is a member of a company, without querying the database again.
+
+        Args:
+            company: Company object or id
+        Returns:
+            True if the user is a member of the company
+        """
+
+        company_id = company.pk if isinstance(company, Company) else company
+        return company_id in self.member_company_ids
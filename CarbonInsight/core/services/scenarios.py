@@ -0,0 +1,275 @@
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Set, Tuple, Type
+
+from rest_framework.exceptions import ValidationError
+
+from core.models import Emission, ProductBoMLineItem, ProductSharingRequestStatus
+from core.models.emission_trace import EmissionTrace, EmissionVector
+from core.models.product import ProductEmissionOverrideFactor
+from core.services.bom_graph import BoMGraph
+from core.services.reference_cache import reference_cache
+
+
+@dataclass
+class Scenario:
+    """
+    Set of hypothetical changes to the BoM of a product that are evaluated in memory, without touching the database.
+    """
+
+    name: str = ""
+    # key = line item id; value = quantity used instead of the stored one
+    line_item_quantities: Dict[int, float] = field(default_factory=dict)
+    # ids of line items that are left out
+    removed_line_items: Set[int] = field(default_factory=set)
+    # key = emission id; value = id of the reference used instead of the stored one
+    emission_references: Dict[int, int] = field(default_factory=dict)
+    # key = product id; value = override factors used instead of the stored ones (or the calculated emissions)
+    product_override_factors: Dict[int, EmissionVector] = field(default_factory=dict)
+
+
+class ScenarioEngine:
+    """
+    Evaluates many scenarios against a single in-memory snapshot of the BoM of a product.
+
+    The snapshot is loaded and its baseline totals are calculated once. A scenario then only recalculates the products
+     it changes and the products using them, in topological order, and takes the baseline totals for everything else.
+     The instances of the snapshot are private to its BoMGraph, so temporarily swapping a reference on them never
+     leaks to the caller.
+
+    Scenarios may only change the part of the BoM owned by the supplier of the product, i.e. the products of the
+     supplier that are reachable without passing through a product of another company, and their line items and
+     emissions. Changing the BoMs of other companies would reveal the emissions they keep confidential.
+    """
+
+    def __init__(self, graph: BoMGraph, product_id: int):
+        self.graph = graph
+        self.product_id = product_id
+        self.baseline = graph.get_all_emission_totals(graph.products)
+        self._order = graph.topological_order()
+        # key = product id; value = ids of the products of the graph that use it
+        self._parents: Dict[int, List[int]] = defaultdict(list)
+        self._line_items: Dict[int, ProductBoMLineItem] = {}
+        self._emissions: Dict[int, Emission] = {}
+        for product in graph.products.values():
+            for line_item in product.line_items.all():
+                self._line_items[line_item.pk] = line_item
+                self._parents[line_item.line_item_product_id].append(product.pk)
+            for emission in product.emissions.all():
+                self._emissions[emission.pk] = emission
+        self._owned_products = self._get_owned_products()
+        # key = (emission model, reference id); value = reference with its factors primed from the reference cache
+        self._references: Dict[Tuple[Type[Emission], int], object] = {}
+
+    def _get_owned_products(self) -> Set[int]:
+        """
+        Finds the products of the snapshot whose BoM the supplier of the product may change in scenarios.
+
+        Returns:
+            ids of the products of the supplier reachable from the product through products of the supplier only
+        """
+
+        supplier_id = self.graph.products[self.product_id].supplier_id
+        owned = {self.product_id}
+        queue = deque([self.product_id])
+        while queue:
+            for line_item in self.graph.products[queue.popleft()].line_items.all():
+                child_id = line_item.line_item_product_id
+                if child_id not in owned and self.graph.products[child_id].supplier_id == supplier_id:
+                    owned.add(child_id)
+                    queue.append(child_id)
+        return owned
+
+    @classmethod
+    def load(cls, product_id: int) -> "ScenarioEngine":
+        """
+        Loads the BoM of a product into a new snapshot.
+
+        Args:
+            product_id: id of the product the scenarios are evaluated for
+        Returns:
+            ScenarioEngine for the product
+        """
+
+        return cls(BoMGraph.load([product_id]), product_id)
+
+    def prepare(self, scenarios: Iterable[Scenario]):
+        """
+        Validates that the scenarios only refer to line items, emissions and products owned by the supplier of the
+         product, and loads the references they swap in with a single query per emission model. Anything else is
+         rejected alike, whether it exists in the BoM of another company or not at all.
+
+        Args:
+            scenarios: scenarios that are going to be evaluated
+        Raises:
+            ValidationError
+        """
+
+        owned_line_items = {
+            line_item_id for line_item_id, line_item in self._line_items.items()
+            if line_item.parent_product_id in self._owned_products
+        }
+        # Only emissions that are calculated from a reference can swap it
+        owned_emissions = {
+            emission_id for emission_id, emission in self._emissions.items()
+            if emission.parent_product_id in self._owned_products and hasattr(emission, "reference")
+        }
+
+        errors = {}
+        reference_ids = defaultdict(set)
+        for index, scenario in enumerate(scenarios):
+            unknown_line_items = (set(scenario.line_item_quantities) | scenario.removed_line_items) - owned_line_items
+            unknown_emissions = set(scenario.emission_references) - owned_emissions
+            unknown_products = set(scenario.product_override_factors) - self._owned_products
+            if unknown_line_items or unknown_emissions or unknown_products:
+                errors[index] = (
+                    f"Not in the part of the BoM owned by the supplier of the product: "
+                    f"line items {sorted(unknown_line_items)}, emissions {sorted(unknown_emissions)}, "
+                    f"products {sorted(unknown_products)}"
+                )
+                continue
+            for emission_id, reference_id in scenario.emission_references.items():
+                reference_ids[type(self._emissions[emission_id])].add(reference_id)
+
+        for emission_model, ids in reference_ids.items():
+            reference_model = emission_model._meta.get_field("reference").related_model
+            references = {reference.pk: reference for reference in reference_model.objects.filter(pk__in=ids)}
+            vectors = reference_cache.get_reference_vectors(reference_model, list(references))
+            for reference_id, reference in references.items():
+                reference._reference_vector = vectors[reference_id]
+                self._references[(emission_model, reference_id)] = reference
+            if ids - set(references):
+                errors[emission_model.__name__] = f"References not found: {sorted(ids - set(references))}"
+
+        if errors:
+            raise ValidationError({"scenarios": errors})
+
+    def evaluate(self, scenario: Scenario) -> EmissionVector:
+        """
+        Calculates the emission totals of the product with the changes of a prepared scenario applied.
+
+        Args:
+            scenario: Scenario that has been passed to prepare()
+        Returns:
+            EmissionVector of the product, which must not be modified
+        """
+
+        changed = set(scenario.product_override_factors)
+        changed.update(self._line_items[line_item_id].parent_product_id
+                       for line_item_id in set(scenario.line_item_quantities) | scenario.removed_line_items)
+        changed.update(self._emissions[emission_id].parent_product_id for emission_id in scenario.emission_references)
+
+        # Every product using a changed product is affected as well
+        affected = set(changed)
+        queue = deque(changed)
+        while queue:
+            for parent_id in self._parents[queue.popleft()]:
+                if parent_id not in affected:
+                    affected.add(parent_id)
+                    queue.append(parent_id)
+
+        totals: Dict[int, EmissionVector] = {}
+        for product_id in self._order:
+            if product_id in affected:
+                totals[product_id] = self._product_totals(product_id, scenario, totals)
+        return totals.get(self.product_id, self.baseline[self.product_id])
+
+    def trace(self, scenario: Scenario) -> EmissionTrace:
+        """
+        Builds the emission trace of the product with the changes of a prepared scenario applied. The changes are
+         applied to a separate snapshot, whose BoMGraph evaluates the changed products with replaced line items and
+         override factors, so the snapshot of this engine is left as it is.
+
+        Args:
+            scenario: Scenario that has been passed to prepare()
+        Returns:
+            EmissionTrace of the product in the scenario
+        """
+
+        graph = BoMGraph.load([self.product_id])
+        changed_line_items = set(scenario.line_item_quantities) | scenario.removed_line_items
+        for product in graph.products.values():
+            line_items = product.line_items.all()
+            if any(line_item.pk in changed_line_items for line_item in line_items):
+                line_items = [
+                    line_item for line_item in line_items if line_item.pk not in scenario.removed_line_items
+                ]
+                for line_item in line_items:
+                    line_item.quantity = scenario.line_item_quantities.get(line_item.pk, line_item.quantity)
+                graph.replace_relations(product.pk, line_items=line_items)
+            for emission in product.emissions.all():
+                reference_id = scenario.emission_references.get(emission.pk)
+                if reference_id is not None:
+                    emission.reference = self._references[(type(emission), reference_id)]
+            if product.pk in scenario.product_override_factors:
+                graph.replace_relations(product.pk, override_factors=[
+                    ProductEmissionOverrideFactor(
+                        product=product,
+                        lifecycle_stage=stage,
+                        co_2_emission_factor_biogenic=split.biogenic,
+                        co_2_emission_factor_non_biogenic=split.non_biogenic,
+                    )
+                    for stage, split in scenario.product_override_factors[product.pk].items()
+                ])
+        return graph.get_emission_trace(self.product_id)
+
+    def _product_totals(self, product_id: int, scenario: Scenario,
+                        totals: Dict[int, EmissionVector]) -> EmissionVector:
+        """
+        Calculates the emission totals of a single product like Product._build_emission_totals, with the changes of
+         a scenario applied.
+
+        Args:
+            product_id: id of a product of the snapshot
+            scenario: Scenario to apply
+            totals: totals of the products already recalculated for the scenario
+        Returns:
+            EmissionVector of the product
+        """
+
+        if product_id in scenario.product_override_factors:
+            return scenario.product_override_factors[product_id]
+        product = self.graph.products[product_id]
+        # Overridden values replace the emissions of the product and its line items
+        if product.override_factors.exists():
+            return self.baseline[product_id]
+
+        weighted = [
+            (self._emission_totals(emission, scenario), emission.quantity)
+            for emission in product.emissions.all()
+        ]
+        for line_item in product.line_items.all():
+            if line_item.pk in scenario.removed_line_items or line_item.product_sharing_request_status in (
+                    ProductSharingRequestStatus.PENDING, ProductSharingRequestStatus.REJECTED):
+                continue
+            child_id = line_item.line_item_product_id
+            weighted.append((
+                totals.get(child_id, self.baseline[child_id]),
+                scenario.line_item_quantities.get(line_item.pk, line_item.quantity),
+            ))
+
+        product_totals = EmissionVector()
+        product_totals.add_weighted(weighted)
+        return product_totals
+
+    def _emission_totals(self, emission: Emission, scenario: Scenario) -> EmissionVector:
+        """
+        Calculates the emission totals of an emission, with the reference of the scenario swapped in if it has one.
+
+        Args:
+            emission: emission of the snapshot
+            scenario: Scenario to apply
+        Returns:
+            EmissionVector of the emission
+        """
+
+        reference_id = scenario.emission_references.get(emission.pk)
+        # Overridden values do not depend on the reference
+        if reference_id is None or emission.override_factors.exists():
+            return emission.get_emission_totals()
+        stored_reference = emission.reference
+        emission.reference = self._references[(type(emission), reference_id)]
+        try:
+            return emission._get_emission_totals()
+        finally:
+            emission.reference = stored_reference
@@ -0,0 +1,119 @@
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from core.models import Product, ProductBoMLineItem, ProductSharingRequest, ProductSharingRequestStatus
+
+
+class SharingAccessMatrix:
+    """
+    In-memory matrix of the product sharing status of (requester company, product) pairs.
+
+    All product sharing requests of the pairs are loaded with a single query, after which the status of every pair
+     is resolved without touching the database. The status semantics are the same as those of
+     ProductBoMLineItem.product_sharing_request_status, which delegates to status_of().
+    """
+
+    def __init__(self, sharing_requests: Dict[Tuple[int, int], ProductSharingRequest]):
+        # key = (requester company id, product id)
+        self._sharing_requests = sharing_requests
+
+    @staticmethod
+    def status_of(product: Product, requester_id: int,
+                  get_sharing_request: Callable[[], Optional[ProductSharingRequest]]) -> ProductSharingRequestStatus:
+        """
+        Returns the status of the access of a company to the emissions of a product. Access is always accepted if the
+         supplier of the product approves requests automatically or is the requester itself, otherwise it is the
+         status of the product sharing request of the requester, if any.
+
+        Args:
+            product: Product object, with its supplier
+            requester_id: id of the company requesting access
+            get_sharing_request: function returning the product sharing request of the requester for the product,
+             only called if needed
+        Returns:
+            ProductSharingRequestStatus
+        """
+
+        if product.supplier.auto_approve_product_sharing_requests:
+            return ProductSharingRequestStatus.ACCEPTED
+        if product.supplier_id == requester_id:
+            return ProductSharingRequestStatus.ACCEPTED
+        psr = get_sharing_request()
+        if psr is None:
+            return ProductSharingRequestStatus.NOT_REQUESTED
+        return psr.status
+
+    @classmethod
+    def load(cls, pairs: Iterable[Tuple[int, Product]]) -> "SharingAccessMatrix":
+        """
+        Loads the product sharing requests of the given pairs with a single query.
+
+        Args:
+            pairs: (requester company id, Product object) tuples
+        Returns:
+            SharingAccessMatrix for the pairs
+        """
+
+        products: Dict[int, Product] = {}
+        requester_ids = set()
+        for requester_id, product in pairs:
+            products[product.pk] = product
+            requester_ids.add(requester_id)
+        if not products:
+            return cls({})
+
+        sharing_requests: Dict[Tuple[int, int], ProductSharingRequest] = {}
+        for sharing_request in ProductSharingRequest.objects.filter(
+                product_id__in=products.keys(),
+                requester_id__in=requester_ids,
+        ):
+            # Share the given product instances, so the supplier of a request does not need another query
+            sharing_request.product = products[sharing_request.product_id]
+            sharing_requests[(sharing_request.requester_id, sharing_request.product_id)] = sharing_request
+        return cls(sharing_requests)
+
+    @classmethod
+    def for_line_items(cls, line_items: Iterable[ProductBoMLineItem]) -> "SharingAccessMatrix":
+        """
+        Loads the product sharing requests of the suppliers of the parent products for the line item products, and
+         attaches the matrix to every line item so that its sharing properties run without queries. The line items
+         report the requests as of this load until they are refreshed from the database.
+
+        Args:
+            line_items: ProductBoMLineItem objects
+        Returns:
+            SharingAccessMatrix for the line items
+        """
+
+        line_items = list(line_items)
+        matrix = cls.load(
+            (line_item.parent_product.supplier_id, line_item.line_item_product) for line_item in line_items
+        )
+        for line_item in line_items:
+            line_item._sharing_access_matrix = matrix
+        return matrix
+
+    def get_sharing_request(self, requester_id: int, product_id: int) -> Optional[ProductSharingRequest]:
+        """
+        Returns the product sharing request of a company for a product.
+
+        Args:
+            requester_id: id of the requesting company
+            product_id: id of the requested product
+        Returns:
+            ProductSharingRequest object, or None if the company has not requested access
+        """
+
+        return self._sharing_requests.get((requester_id, product_id))
+
+    def get_status(self, requester_id: int, product: Product) -> ProductSharingRequestStatus:
+        """
+        Returns the status of the access of a company to the emissions of a product.
+
+        Args:
+            requester_id: id of the requesting company
+            product: Product object, with its supplier
+        Returns:
+            ProductSharingRequestStatus
+        """
+
+        return self.status_of(product, requester_id, lambda: self.get_sharing_request(requester_id, product.pk))
@@ -0,0 +1,140 @@
+import math
+from collections import Counter
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+from core.models.emission_trace import EmissionSplit, EmissionTrace, EmissionTraceMention, LIFECYCLE_STAGES
+from core.models.lifecycle_stage import LifecycleStage
+
+
+class TraceNodeStatus(Enum):
+    """
+    Enum for the ways a node can differ between two emission traces.
+    """
+
+    ADDED = "added"
+    REMOVED = "removed"
+    CHANGED = "changed"
+
+
+@dataclass
+class TraceNodeDiff:
+    """
+    Change of a single node between two emission traces.
+    """
+
+    # Path of the node, the node ids from the root down to the node joined by "/" (see EmissionTrace.find_node)
+    id: str
+    label: str
+    status: TraceNodeStatus
+    old_quantity: Optional[float] = None
+    new_quantity: Optional[float] = None
+    old_total: Optional[float] = None
+    new_total: Optional[float] = None
+    # key = LifecycleStage; value = (old, new) emissions of the stages that changed, None where the stage is missing
+    stages: Dict[LifecycleStage, Tuple[Optional[EmissionSplit], Optional[EmissionSplit]]] = field(default_factory=dict)
+    added_mentions: List[EmissionTraceMention] = field(default_factory=list)
+    removed_mentions: List[EmissionTraceMention] = field(default_factory=list)
+
+
+def _is_close(old: float, new: float) -> bool:
+    return math.isclose(old, new, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def _diff_node(path: str, old: EmissionTrace, new: EmissionTrace, old_quantity: Optional[float],
+               new_quantity: Optional[float]) -> Optional[TraceNodeDiff]:
+    """
+    Compares the quantities, emissions per lifecycle stage and mentions of a node that is in both traces.
+
+    Args:
+        path: path of the node
+        old: node in the old trace
+        new: node in the new trace
+        old_quantity: quantity of the node in the old trace, None for the root
+        new_quantity: quantity of the node in the new trace, None for the root
+    Returns:
+        TraceNodeDiff of the node, None if nothing changed
+    """
+
+    stages = {}
+    for stage in LIFECYCLE_STAGES:
+        if stage not in old.emissions_subtotal and stage not in new.emissions_subtotal:
+            continue
+        old_split = old.emissions_subtotal.get(stage)
+        new_split = new.emissions_subtotal.get(stage)
+        if old_split is None or new_split is None or not (
+                _is_close(old_split.biogenic, new_split.biogenic)
+                and _is_close(old_split.non_biogenic, new_split.non_biogenic)):
+            stages[stage] = (old_split, new_split)
+    old_mentions = Counter(old.mentions)
+    new_mentions = Counter(new.mentions)
+    quantity_changed = (old_quantity is None) != (new_quantity is None) or (
+        old_quantity is not None and not _is_close(old_quantity, new_quantity))
+    if not stages and old_mentions == new_mentions and not quantity_changed:
+        return None
+    return TraceNodeDiff(
+        id=path,
+        label=new.label,
+        status=TraceNodeStatus.CHANGED,
+        old_quantity=old_quantity,
+        new_quantity=new_quantity,
+        old_total=old.total,
+        new_total=new.total,
+        stages=stages,
+        added_mentions=list((new_mentions - old_mentions).elements()),
+        removed_mentions=list((old_mentions - new_mentions).elements()),
+    )
+
+
+def diff_traces(old: EmissionTrace, new: EmissionTrace, max_depth: Optional[int] = None) -> List[TraceNodeDiff]:
+    """
+    Compares two emission traces of the same product and returns the nodes that changed, ordered by their paths.
+
+    Nodes are matched by their stable node ids, so both trees are walked once. A node that is only in one of the
+     traces is reported once, without its descendants.
+
+    Args:
+        old: EmissionTrace to compare against
+        new: changed EmissionTrace
+        max_depth: number of levels of children to compare, all levels if None
+    Returns:
+        list of TraceNodeDiff objects, empty if the traces are the same
+    """
+
+    diffs = []
+    stack = [(old.node_id, old, new, None, None, 0)]
+    while stack:
+        path, old_node, new_node, old_quantity, new_quantity, depth = stack.pop()
+        if old_node is new_node and old_quantity == new_quantity:
+            continue
+        if old_node is None:
+            diffs.append(TraceNodeDiff(id=path, label=new_node.label, status=TraceNodeStatus.ADDED,
+                                       new_quantity=new_quantity, new_total=new_node.total))
+            continue
+        if new_node is None:
+            diffs.append(TraceNodeDiff(id=path, label=old_node.label, status=TraceNodeStatus.REMOVED,
+                                       old_quantity=old_quantity, old_total=old_node.total))
+            continue
+        diff = _diff_node(path, old_node, new_node, old_quantity, new_quantity)
+        if diff is not None:
+            diffs.append(diff)
+        if max_depth is not None and depth >= max_depth:
+            continue
+
+        old_children = old_node.get_child_nodes_by_id()
+        new_children = new_node.get_child_nodes_by_id()
+        for node_id in old_children.keys() | new_children.keys():
+            old_child = old_children.get(node_id)
+            new_child = new_children.get(node_id)
+            stack.append((
+                f"{path}/{node_id}",
+                old_child.emission_trace if old_child else None,
+                new_child.emission_trace if new_child else None,
+                old_child.quantity if old_child else None,
+                new_child.quantity if new_child else None,
+                depth + 1,
+            ))
+    # Only the changed nodes are sorted, which are usually few
+    diffs.sort(key=lambda diff: diff.id)
+    return diffs
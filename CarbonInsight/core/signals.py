@@ -1,8 +1,22 @@
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 
 from axes.signals import user_locked_out
 from rest_framework.exceptions import PermissionDenied
 
+from core.models import Emission, EmissionOverrideFactor, Company, Product, ProductBoMLineItem, \
+    ProductSharingRequest, ProductEmissionCache, ProductEmissionSnapshot, TransportEmission, \
+    TransportEmissionReference, TransportEmissionReferenceFactor, UserEnergyEmission, UserEnergyEmissionReference, \
+    UserEnergyEmissionReferenceFactor, ProductionEnergyEmission, ProductionEnergyEmissionReference, \
+    ProductionEnergyEmissionReferenceFactor
+from core.models.product import ProductEmissionOverrideFactor
+from core.models.emission_trace import EmissionSplit, EmissionVector
+from core.models.lifecycle_stage import LifecycleStage
+from core.services import bom_closure
+from core.services.emission_delta import emission_contribution, factor_difference, line_item_delta, \
+    propagate_emission_deltas, reference_factor_deltas, vector_difference
+from core.services.reference_cache import reference_cache
+
 
 @receiver(user_locked_out)
 def on_user_locked_out(*args, **kwargs):
@@ -11,4 +25,240 @@ def on_user_locked_out(*args, **kwargs):
     This function maps the alert to a PermissionDenied exception which is then handled by DRF.
     """
     raise PermissionDenied(
-        "Too many failed login attempts, please try again later or contact support to unlock your account.")
\ No newline at end of file
+        "Too many failed login attempts, please try again later or contact support to unlock your account.")
+
+
+# Receivers below keep the materialized PCF of every product affected by a change up to date. Changes that can be
+# expressed as a change of the emissions of a single product are propagated as deltas (see propagate_emission_deltas),
+# everything else invalidates the PCF (see ProductEmissionCache.invalidate, which also walks up to all ancestors of
+# the given products).
+
+@receiver(pre_save, sender=Emission)
+@receiver(pre_save, sender=TransportEmission)
+@receiver(pre_save, sender=UserEnergyEmission)
+@receiver(pre_save, sender=ProductionEnergyEmission)
+def on_emission_saving(sender, instance: Emission, **kwargs):
+    """
+    Remembers the parent product and the contribution of an emission before it is saved.
+    """
+    old = sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._old_emission_state = (old.parent_product_id, emission_contribution(old)) if old else None
+
+
+@receiver(post_save, sender=Emission)
+@receiver(post_save, sender=TransportEmission)
+@receiver(post_save, sender=UserEnergyEmission)
+@receiver(post_save, sender=ProductionEnergyEmission)
+def on_emission_saved(sender, instance: Emission, **kwargs):
+    """
+    Propagates the change of the contribution of a saved emission, or invalidates the PCF of its parent products if
+     the change cannot be propagated, and counts it for its parent product.
+    """
+    old_state = getattr(instance, "_old_emission_state", None)
+    old_parent_product_id, old_contribution = old_state or (instance.parent_product_id, EmissionVector())
+    if old_state is None or old_parent_product_id != instance.parent_product_id:
+        if old_state is not None:
+            ProductEmissionCache.adjust_counts(old_parent_product_id, emissions=-1)
+        ProductEmissionCache.adjust_counts(instance.parent_product_id, emissions=1)
+    delta = vector_difference(emission_contribution(instance), old_contribution)
+    if old_parent_product_id != instance.parent_product_id or delta is None:
+        ProductEmissionCache.invalidate([old_parent_product_id, instance.parent_product_id])
+    else:
+        # Changes that do not affect the PCF, like a description, still change the emission trace
+        ProductEmissionCache.touch([instance.parent_product_id])
+        propagate_emission_deltas({instance.parent_product_id: delta})
+
+
+@receiver(post_delete, sender=Emission)
+@receiver(post_delete, sender=TransportEmission)
+@receiver(post_delete, sender=UserEnergyEmission)
+@receiver(post_delete, sender=ProductionEnergyEmission)
+def on_emission_deleted(sender, instance: Emission, **kwargs):
+    """
+    Invalidates the PCF of the parent product of a deleted emission and no longer counts it.
+    """
+    # Deleting an emission of a subclass also deletes, and signals, the row of the Emission it is based on
+    if sender is Emission:
+        ProductEmissionCache.adjust_counts(instance.parent_product_id, emissions=-1)
+    ProductEmissionCache.invalidate([instance.parent_product_id])
+
+
+@receiver([post_save, post_delete], sender=EmissionOverrideFactor)
+def on_emission_override_factor_changed(sender, instance: EmissionOverrideFactor, **kwargs):
+    """
+    Invalidates the PCF of the product whose emission has a saved or deleted override factor.
+    """
+    # The emission itself may already be deleted when the factor is removed through a cascade
+    ProductEmissionCache.invalidate(
+        Emission.non_polymorphic.filter(pk=instance.emission_id).values_list("parent_product_id", flat=True)
+    )
+
+
+@receiver([post_save, post_delete], sender=ProductEmissionOverrideFactor)
+def on_product_emission_override_factor_changed(sender, instance: ProductEmissionOverrideFactor, **kwargs):
+    """
+    Invalidates the PCF of the product of a saved or deleted product override factor.
+    """
+    ProductEmissionCache.invalidate([instance.product_id])
+
+
+@receiver(pre_save, sender=ProductBoMLineItem)
+def on_line_item_saving(sender, instance: ProductBoMLineItem, **kwargs):
+    """
+    Remembers the products and the quantity of a BoM line item before it is saved.
+    """
+    instance._old_line_item_state = ProductBoMLineItem.objects.filter(pk=instance.pk).values_list(
+        "parent_product_id", "line_item_product_id", "quantity"
+    ).first() if instance.pk else None
+
+
+@receiver(post_save, sender=ProductBoMLineItem)
+def on_line_item_saved(sender, instance: ProductBoMLineItem, **kwargs):
+    """
+    Updates the BoM closure and the line item counts for a saved BoM line item, and propagates the change of the
+     emissions of its parent product if it was created or its quantity changed, or invalidates the PCF of its parent
+     products if it has been moved.
+    """
+    old_state = getattr(instance, "_old_line_item_state", None)
+    if old_state is None:
+        ProductEmissionCache.adjust_counts(instance.parent_product_id, line_items=1)
+        bom_closure.apply_line_item_change(instance.parent_product_id, instance.line_item_product_id)
+        ProductEmissionCache.touch([instance.parent_product_id])
+        propagate_emission_deltas({instance.parent_product_id: line_item_delta(instance, 0)})
+        return
+
+    old_parent_product_id, old_line_item_product_id, old_quantity = old_state
+    if (old_parent_product_id, old_line_item_product_id) != (instance.parent_product_id,
+                                                             instance.line_item_product_id):
+        bom_closure.apply_line_item_change(old_parent_product_id, old_line_item_product_id)
+        bom_closure.apply_line_item_change(instance.parent_product_id, instance.line_item_product_id)
+        if old_parent_product_id != instance.parent_product_id:
+            ProductEmissionCache.adjust_counts(old_parent_product_id, line_items=-1)
+            ProductEmissionCache.adjust_counts(instance.parent_product_id, line_items=1)
+        ProductEmissionCache.invalidate([old_parent_product_id, instance.parent_product_id])
+    else:
+        if instance.quantity != old_quantity:
+            bom_closure.apply_line_item_change(instance.parent_product_id, instance.line_item_product_id)
+        ProductEmissionCache.touch([instance.parent_product_id])
+        propagate_emission_deltas({instance.parent_product_id: line_item_delta(instance, old_quantity)})
+
+
+@receiver(post_delete, sender=ProductBoMLineItem)
+def on_line_item_deleted(sender, instance: ProductBoMLineItem, **kwargs):
+    """
+    Removes a deleted BoM line item from the BoM closure and the line item counts, and invalidates the PCF of its
+     parent product.
+    """
+    bom_closure.apply_line_item_change(instance.parent_product_id, instance.line_item_product_id)
+    ProductEmissionCache.adjust_counts(instance.parent_product_id, line_items=-1)
+    ProductEmissionCache.invalidate([instance.parent_product_id])
+
+
+@receiver([post_save, post_delete], sender=ProductSharingRequest)
+def on_product_sharing_request_changed(sender, instance: ProductSharingRequest, **kwargs):
+    """
+    Invalidates the PCF of the products using the product of a saved or deleted sharing request, since the status
+     decides whether the emissions of the product are included.
+    """
+    ProductEmissionCache.invalidate([instance.product_id])
+
+
+@receiver(post_save, sender=Product)
+def on_product_saved(sender, instance: Product, created: bool, **kwargs):
+    """
+    Creates the cache entry of a new product, or marks the representations of a saved product and of the products
+     using it as changed, since their details, exports and emission traces show its fields. The PCF history of a
+     product moves along with it if its supplier changed.
+    """
+    if created:
+        ProductEmissionCache.objects.get_or_create(product_id=instance.pk)
+    else:
+        ProductEmissionCache.touch([instance.pk])
+        ProductEmissionSnapshot.objects.filter(product_id=instance.pk).exclude(
+            supplier_id=instance.supplier_id
+        ).update(supplier_id=instance.supplier_id)
+
+
+@receiver(post_save, sender=Company)
+def on_company_changed(sender, instance: Company, **kwargs):
+    """
+    Invalidates the PCF of the products using the products of a saved company, since the company decides whether
+     product sharing requests are approved automatically.
+    """
+    ProductEmissionCache.invalidate(instance.products.values_list("id", flat=True))
+
+
+REFERENCE_FACTOR_EMISSION_MODELS = {
+    TransportEmissionReferenceFactor: TransportEmission,
+    UserEnergyEmissionReferenceFactor: UserEnergyEmission,
+    ProductionEnergyEmissionReferenceFactor: ProductionEnergyEmission,
+}
+
+
+@receiver(pre_save, sender=TransportEmissionReferenceFactor)
+@receiver(pre_save, sender=UserEnergyEmissionReferenceFactor)
+@receiver(pre_save, sender=ProductionEnergyEmissionReferenceFactor)
+def on_reference_factor_saving(sender, instance, **kwargs):
+    """
+    Remembers the reference, lifecycle stage and values of a reference factor before it is saved.
+    """
+    instance._old_reference_factor_state = sender.objects.filter(pk=instance.pk).values_list(
+        "emission_reference_id", "lifecycle_stage", "co_2_emission_factor_biogenic", "co_2_emission_factor_non_biogenic"
+    ).first() if instance.pk else None
+
+
+@receiver(post_save, sender=TransportEmissionReferenceFactor)
+@receiver(post_save, sender=UserEnergyEmissionReferenceFactor)
+@receiver(post_save, sender=ProductionEnergyEmissionReferenceFactor)
+def on_reference_factor_saved(sender, instance, **kwargs):
+    """
+    Invalidates the cached reference data and propagates the change of a created or updated reference factor to the
+     products with an emission based on its reference. If the factor moved to another reference or lifecycle stage
+     (or has an unknown one), the PCF of those products is invalidated instead.
+    """
+    reference_cache.invalidate()
+    emission_model = REFERENCE_FACTOR_EMISSION_MODELS[sender]
+    old_state = getattr(instance, "_old_reference_factor_state", None)
+    if instance.lifecycle_stage not in LifecycleStage.values or (
+            old_state is not None and old_state[:2] != (instance.emission_reference_id, instance.lifecycle_stage)):
+        ProductEmissionCache.invalidate(
+            emission_model.objects.filter(
+                reference_id__in=[instance.emission_reference_id] + ([old_state[0]] if old_state else [])
+            ).values_list("parent_product_id", flat=True)
+        )
+        return
+
+    old_split = EmissionSplit(biogenic=old_state[2], non_biogenic=old_state[3]) if old_state else None
+
+    factor_delta = factor_difference(
+        instance.lifecycle_stage,
+        EmissionSplit(biogenic=instance.co_2_emission_factor_biogenic,
+                      non_biogenic=instance.co_2_emission_factor_non_biogenic),
+        old_split,
+    )
+    propagate_emission_deltas(reference_factor_deltas(emission_model, instance.emission_reference_id, factor_delta))
+
+
+@receiver(post_delete, sender=TransportEmissionReferenceFactor)
+@receiver(post_delete, sender=UserEnergyEmissionReferenceFactor)
+@receiver(post_delete, sender=ProductionEnergyEmissionReferenceFactor)
+def on_reference_factor_deleted(sender, instance, **kwargs):
+    """
+    Invalidates the cached reference data and the PCF of the products with an emission based on the reference of a
+     deleted factor.
+    """
+    reference_cache.invalidate()
+    ProductEmissionCache.invalidate(
+        REFERENCE_FACTOR_EMISSION_MODELS[sender].objects.filter(reference_id=instance.emission_reference_id)
+        .values_list("parent_product_id", flat=True)
+    )
+
+
+@receiver([post_save, post_delete], sender=TransportEmissionReference)
+@receiver([post_save, post_delete], sender=UserEnergyEmissionReference)
+@receiver([post_save, post_delete], sender=ProductionEnergyEmissionReference)
+def on_reference_changed(sender, instance, **kwargs):
+    """
+    Invalidates the cached reference data when a reference is saved or deleted.
+    """
+    reference_cache.invalidate()
@@ -0,0 +1,173 @@
+"""
+Tests for the transitive closure of the BoM graph
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APITestCase
+
+from core.models import Product, ProductBoMClosure, ProductBoMLineItem
+from core.services import bom_closure
+from core.services.bom_closure import MAX_PATH_COUNT, closure_rows
+from core.tests.setup_functions import tech_companies_setup
+
+User = get_user_model()
+
+
+class BoMClosureTestCase(APITestCase):
+    def setUp(self):
+        tech_companies_setup(self)
+
+    def assertClosureIsUpToDate(self):
+        """
+        Asserts that the maintained closure equals the closure calculated from scratch from all line items.
+        """
+
+        expected = closure_rows(
+            ProductBoMLineItem.objects.values_list("parent_product_id", "line_item_product_id", "quantity")
+        )
+        actual = {
+            (row.ancestor_id, row.descendant_id): row
+            for row in ProductBoMClosure.objects.all()
+        }
+        self.assertEqual(actual.keys(), expected.keys())
+        for key, (path_count, cumulative_quantity, min_depth) in expected.items():
+            self.assertEqual(actual[key].path_count, path_count)
+            self.assertAlmostEqual(actual[key].cumulative_quantity, cumulative_quantity)
+            self.assertEqual(actual[key].min_depth, min_depth)
+
+    def test_closure_of_setup(self):
+        self.assertClosureIsUpToDate()
+        glass_in_iphone = ProductBoMClosure.objects.get(ancestor=self.iphone, descendant=self.glass_material)
+        # Through the processor (1 * 0.5), the camera (3 * 0.2) and the display (1 * 0.3)
+        self.assertEqual(glass_in_iphone.path_count, 3)
+        self.assertEqual(glass_in_iphone.min_depth, 2)
+        self.assertAlmostEqual(glass_in_iphone.cumulative_quantity, 1.4)
+
+    def test_closure_is_maintained(self):
+        camera = ProductBoMLineItem.objects.get(parent_product=self.iphone, line_item_product=self.camera)
+        camera.quantity = 4
+        camera.save()
+        self.assertClosureIsUpToDate()
+
+        ProductBoMLineItem.objects.create(parent_product=self.camera, line_item_product=self.processor, quantity=2)
+        self.assertClosureIsUpToDate()
+
+        camera.line_item_product = self.silicon_material
+        camera.save()
+        self.assertClosureIsUpToDate()
+
+        ProductBoMLineItem.objects.get(parent_product=self.processor, line_item_product=self.glass_material).delete()
+        self.assertClosureIsUpToDate()
+
+        # Deleting a product deletes its line items, which removes every path through it
+        self.processor.delete()
+        self.assertClosureIsUpToDate()
+
+    def test_path_count_saturates(self):
+        """
+        Test that the path count of a BoM with two products per level, which doubles at every level, stays within
+         the column range.
+        """
+
+        levels = [
+            [
+                Product.objects.create(name=f"Part {level}.{index}", description="Part", supplier=self.samsung,
+                                       year_of_construction=2025)
+                for index in range(2)
+            ]
+            for level in range(66)
+        ]
+        ProductBoMLineItem.objects.bulk_create([
+            ProductBoMLineItem(parent_product=parent, line_item_product=child, quantity=1)
+            for upper, lower in zip(levels, levels[1:])
+            for parent in upper
+            for child in lower
+        ])
+        bom_closure.rebuild()
+        self.assertClosureIsUpToDate()
+
+        top = Product.objects.create(name="Top", description="Top", supplier=self.samsung, year_of_construction=2025)
+        ProductBoMLineItem.objects.create(parent_product=top, line_item_product=levels[0][0], quantity=1)
+        self.assertClosureIsUpToDate()
+        row = ProductBoMClosure.objects.get(ancestor=top, descendant=levels[-1][0])
+        self.assertEqual(row.path_count, MAX_PATH_COUNT)
+        self.assertEqual(row.min_depth, 66)
+
+    def test_cycle_check_is_a_single_query(self):
+        line_item = ProductBoMLineItem(parent_product=self.glass_material, line_item_product=self.iphone, quantity=1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(line_item._creates_cycle())
+        self.assertEqual(len(queries.captured_queries), 1)
+        with self.assertRaises(ValidationError):
+            line_item.save()
+
+
+class WhereUsedAPITestCase(APITestCase):
+    def setUp(self):
+        tech_companies_setup(self)
+        self.client.force_authenticate(User.objects.get(username="tsmc1@tsmc.com"))
+        self.bundle = Product.objects.create(name="iPhone bundle", description="Bundle", supplier=self.apple,
+                                             year_of_construction=2025, sku="BUNDLE")
+        ProductBoMLineItem.objects.create(parent_product=self.bundle, line_item_product=self.iphone, quantity=2)
+        prototype = Product.objects.create(name="Prototype", description="Prototype", supplier=self.samsung,
+                                           year_of_construction=2025, is_public=False)
+        ProductBoMLineItem.objects.create(parent_product=prototype, line_item_product=self.processor, quantity=1)
+        self.url = reverse("product-where-used", kwargs={"company_pk": self.tsmc.id, "pk": self.processor.id})
+
+    def test_where_used(self):
+        """
+        Test that all visible products using the product are returned with their depth and cumulative quantity.
+        """
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row["id"], row["depth"], row["path_count"], row["cumulative_quantity"]) for row in response.data],
+            [(self.iphone.id, 1, 1, 1.0), (self.bundle.id, 2, 1, 2.0)],
+        )
+        self.assertEqual(response.data[1]["supplier_name"], self.apple.name)
+        self.assertEqual(len([query for query in queries.captured_queries if "closure" in query["sql"]]), 1)
+
+    def test_where_used_max_depth_and_pagination(self):
+        response = self.client.get(self.url, {"max_depth": 1})
+        self.assertEqual([row["id"] for row in response.data], [self.iphone.id])
+
+        response = self.client.get(self.url, {"limit": 1, "offset": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual([row["id"] for row in response.data["results"]], [self.bundle.id])
+
+        self.assertEqual(self.client.get(self.url, {"max_depth": 0}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_where_used_max_depth_limits_aggregates(self):
+        """
+        Test that with a maximum depth, the number of paths and the cumulative quantity only include the paths of at
+         most that many levels.
+        """
+
+        ProductBoMLineItem.objects.create(parent_product=self.bundle, line_item_product=self.processor, quantity=5)
+        response = self.client.get(self.url)
+        self.assertEqual(
+            [(row["id"], row["depth"], row["path_count"], row["cumulative_quantity"]) for row in response.data],
+            [(self.iphone.id, 1, 1, 1.0), (self.bundle.id, 1, 2, 7.0)],
+        )
+
+        response = self.client.get(self.url, {"max_depth": 1})
+        self.assertEqual(
+            [(row["id"], row["depth"], row["path_count"], row["cumulative_quantity"]) for row in response.data],
+            [(self.iphone.id, 1, 1, 1.0), (self.bundle.id, 1, 1, 5.0)],
+        )
+
+        response = self.client.get(self.url, {"max_depth": 1, "limit": 1, "offset": 1})
+        self.assertEqual([(row["id"], row["cumulative_quantity"]) for row in response.data["results"]],
+                         [(self.bundle.id, 5.0)])
+
+    def test_where_used_unauthorized(self):
+        url = reverse("product-where-used", kwargs={"company_pk": self.apple.id, "pk": self.iphone.id})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
@@ -6,8 +6,12 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
+from django.test import TestCase
+from core.models import Product, ProductBoMLineItem
 from core.models.company import Company
 from core.models.company_membership import CompanyMembership
+from core.models.lifecycle_stage import LifecycleStage
+from core.models.product import ProductEmissionOverrideFactor
 from core.tests.setup_functions import paint_companies_setup
 
 User = get_user_model()
@@ -315,4 +319,46 @@ class CompanyAPITests(APITestCase):
         }
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertEqual(Company.objects.count(), company_count)
\ No newline at end of file
+        self.assertEqual(Company.objects.count(), company_count)
+
+
+class CompanyTotalEmissionsAcrossProductsTest(TestCase):
+    def setUp(self):
+        self.supplier = Company.objects.create(name="Supplier", vat_number="SUP", business_registration_number="SUP")
+        self.assembler = Company.objects.create(name="Assembler", vat_number="ASM", business_registration_number="ASM")
+        self.part, self.kit = (
+            self._product(name, self.supplier, biogenic)
+            for name, biogenic in (("Part", 1.0), ("Kit", 10.0))
+        )
+        self.module, self.device, self.bundle = (
+            self._product(name, self.assembler, 0.0) for name in ("Module", "Device", "Bundle")
+        )
+        for parent, child, quantity in (
+                (self.module, self.part, 2),
+                (self.module, self.kit, 1),
+                (self.kit, self.part, 5),
+                (self.device, self.module, 3),
+                (self.bundle, self.module, 1),
+                (self.bundle, self.device, 2),
+        ):
+            ProductBoMLineItem.objects.create(parent_product=parent, line_item_product=child, quantity=quantity)
+
+    def _product(self, name, supplier, biogenic):
+        product = Product.objects.create(name=name, description=name, supplier=supplier, year_of_construction=2025)
+        if biogenic:
+            ProductEmissionOverrideFactor.objects.create(
+                product=product,
+                lifecycle_stage=LifecycleStage.A1,
+                co_2_emission_factor_biogenic=biogenic,
+            )
+        return product
+
+    def test_total_emissions_across_products(self):
+        """
+        Test that uses are counted over every path, including shared parents, but not through products supplied by
+         the company itself.
+        """
+
+        # Module is used 1 + 3 * (1 + 2) + 2 = 11 times, so part is used 2 * 11 and kit 1 * 11 times
+        self.assertAlmostEqual(self.supplier.total_emissions_across_products, 22 * 1.0 + 11 * 10.0)
+        self.assertEqual(self.assembler.total_emissions_across_products, 0.0)
@@ -0,0 +1,110 @@
+"""
+Tests for the PCF history of products
+"""
+
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Product, ProductEmissionCache, ProductEmissionSnapshot
+from core.services.bom_graph import BoMGraph
+from core.tests.setup_functions import tech_companies_setup
+
+User = get_user_model()
+
+
+class EmissionHistoryTestCase(APITestCase):
+    def setUp(self):
+        tech_companies_setup(self)
+        for product in Product.objects.all():
+            ProductEmissionCache.get_for_product(product)
+        self.client.force_authenticate(User.objects.get(username="apple1@apple.com"))
+        self.product_url = reverse("product-emission-history", kwargs={"company_pk": self.apple.id,
+                                                                       "pk": self.iphone.id})
+        self.company_url = reverse("company-emission-history", kwargs={"pk": self.apple.id})
+
+    def _snapshots(self, product: Product):
+        return list(ProductEmissionSnapshot.objects.filter(product=product).between())
+
+    def test_snapshots_are_recorded_on_change(self):
+        snapshots = self._snapshots(self.iphone)
+        self.assertEqual(len(snapshots), 1)
+        entry = ProductEmissionCache.objects.get(product=self.iphone)
+        self.assertEqual(dict(snapshots[0].emissions_vector.items()), entry.get_emissions_subtotal())
+
+        # Recomputing an unchanged PCF does not grow the history
+        ProductEmissionCache.invalidate([self.iphone.id])
+        ProductEmissionCache.get_for_product(self.iphone)
+        self.assertEqual(len(self._snapshots(self.iphone)), 1)
+
+        # Changes applied as deltas are recorded as well
+        processor_snapshots = len(self._snapshots(self.processor))
+        self.iphone_line_processor_update_emission.energy_consumption = 1000
+        self.iphone_line_processor_update_emission.save()
+        self.assertEqual(len(self._snapshots(self.processor)), processor_snapshots + 1)
+        self.iphone_assembly_emission.energy_consumption = 3000
+        self.iphone_assembly_emission.save()
+        snapshots = self._snapshots(self.iphone)
+        self.assertEqual(len(snapshots), 2)
+        self.assertGreater(snapshots[1].emissions_vector.total, snapshots[0].emissions_vector.total)
+        self.assertAlmostEqual(snapshots[1].emissions_vector.total, self.iphone.get_emission_trace().total)
+
+    def test_product_history(self):
+        self.iphone_assembly_emission.energy_consumption = 3000
+        self.iphone_assembly_emission.save()
+        response = self.client.get(self.product_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[-1]["emission_total"], self.iphone.get_emission_trace().total)
+        self.assertEqual(response.data[-1]["product_id"], self.iphone.id)
+
+        response = self.client.get(self.product_url, {"since": response.data[-1]["recorded_at"]})
+        self.assertEqual(len(response.data), 1)
+        response = self.client.get(self.product_url, {"until": (timezone.now() - timedelta(days=1)).isoformat()})
+        self.assertEqual(response.data, [])
+        response = self.client.get(self.product_url, {"since": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_company_history(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.company_url, {"limit": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], Product.objects.filter(supplier=self.apple).count())
+        self.assertEqual([row["product_id"] for row in response.data["results"]], [self.iphone.id])
+        self.assertEqual(len([query for query in queries.captured_queries if "snapshot" in query["sql"]]), 2)
+
+        self.client.force_authenticate(User.objects.get(username="tsmc1@tsmc.com"))
+        self.assertEqual(self.client.get(self.company_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(self.product_url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_company_history_is_an_index_range_scan(self):
+        """
+        Test that the history of a company is read from the index on supplier and recording time, without joining the
+         products or sorting.
+        """
+
+        plan = ProductEmissionSnapshot.objects.filter(supplier=self.apple).between(since=timezone.now()).explain()
+        self.assertIn("core_produc_supplie_c0eacb_idx", plan)
+        self.assertNotRegex(plan, r"core_product\b")
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_history_recomputes_stale_entries_at_once(self):
+        ProductEmissionCache.objects.filter(product__supplier=self.apple).update(is_valid=False)
+        with mock.patch.object(BoMGraph, "load", wraps=BoMGraph.load) as load:
+            response = self.client.get(self.company_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        load.assert_called_once()
+        self.assertFalse(ProductEmissionCache.objects.filter(product__supplier=self.apple, is_valid=False).exists())
+
+    def test_history_follows_supplier_change(self):
+        self.iphone.supplier = self.samsung
+        self.iphone.save()
+        self.assertEqual(set(ProductEmissionSnapshot.objects.filter(product=self.iphone)
+                             .values_list("supplier_id", flat=True)), {self.samsung.id})
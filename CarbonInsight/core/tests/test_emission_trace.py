@@ -2,20 +2,48 @@
 Tests for the emission trace methods that calculate PCF and return subcomponents of a product
 """
 
+import sys
+from copy import deepcopy
 from typing import Union
-
+from unittest.mock import patch
+
+from django.db import connection
+from django.urls import reverse
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
 
 from core.models import Product, ProductBoMLineItem, TransportEmissionReference, TransportEmission, \
     ProductionEnergyEmissionReference, UserEnergyEmissionReference, \
     ProductionEnergyEmission, UserEnergyEmission, ProductSharingRequest, ProductSharingRequestStatus, \
-    EmissionOverrideFactor
-from core.models.emission_trace import EmissionTrace, EmissionTraceMentionClass
+    EmissionOverrideFactor, ProductEmissionCache
+from core.models.emission_trace import EmissionSplit, EmissionTrace, EmissionTraceMentionClass, EmissionVector
 from core.models.lifecycle_stage import LifecycleStage
 from core.models.product import ProductEmissionOverrideFactor
+from core.serializers.emission_trace_serializer import EmissionTraceSerializer
+from core.services import bom_closure
+from core.services.reference_cache import reference_cache
 from core.tests.setup_functions import tech_companies_setup
 
 
+class DeclaredFieldsEmissionTraceSerializer(EmissionTraceSerializer):
+    """
+    EmissionTraceSerializer that serializes every node through its declared fields.
+    """
+
+    def _fields_to_representation(self, obj: EmissionTrace, node) -> dict:
+        ret = {}
+        for field in self._readable_fields:
+            if field.field_name in self.tree_fields:
+                ret[field.field_name] = None
+                continue
+            attribute = field.get_attribute(obj)
+            ret[field.field_name] = None if attribute is None else field.to_representation(attribute)
+        return ret
+
+
 class EmissionTraceTestCase(APITestCase):
     def setUp(self):
         tech_companies_setup(self)
@@ -444,4 +472,281 @@ class EmissionTraceTestCase(APITestCase):
                     self.assertEqual(
                         trace_child.emission_trace.mentions[0].mention_class,
                         EmissionTraceMentionClass.WARNING
-                    )
\ No newline at end of file
+                    )
+    def _extend_bom(self, parent: Product, depth: int, width: int):
+        """
+        Appends a synthetic sub-BoM to a product. Every level has `width` products supplied by a different company than
+         their parent, each with transport, production energy and user energy emissions.
+
+        Args:
+            parent: product to attach the sub-BoM to
+            depth: number of levels to add
+            width: number of products per level
+        """
+        suppliers = [self.samsung, self.tsmc]
+        for level in range(depth):
+            supplier = suppliers[level % 2]
+            children = []
+            for index in range(width):
+                child = Product.objects.create(
+                    name=f"Component {parent.pk}-{level}-{index}",
+                    description="Synthetic component",
+                    supplier=supplier,
+                    year_of_construction=2025
+                )
+                ProductBoMLineItem.objects.create(parent_product=parent, line_item_product=child, quantity=2)
+                if parent.supplier != supplier:
+                    ProductSharingRequest.objects.create(
+                        product=child,
+                        requester=parent.supplier,
+                        status=ProductSharingRequestStatus.ACCEPTED if index % 3 else
+                        ProductSharingRequestStatus.PENDING
+                    )
+                TransportEmission.objects.create(parent_product=child, distance=10, weight=1,
+                                                 reference=self.transport_road)
+                ProductionEnergyEmission.objects.create(parent_product=child, energy_consumption=10,
+                                                        reference=self.assembly_line_reference)
+                emission = UserEnergyEmission.objects.create(parent_product=child, energy_consumption=10,
+                                                             reference=self.charging_phone)
+                EmissionOverrideFactor.objects.create(emission=emission, lifecycle_stage=LifecycleStage.B6,
+                                                      co_2_emission_factor_non_biogenic=1)
+                ProductBoMLineItem.objects.create(parent_product=child, line_item_product=self.glass_material,
+                                                  quantity=0.1)
+                children.append(child)
+            parent = children[0]
+
+    def test_product_get_emission_query_count_is_constant(self):
+        """
+        Test that the number of queries issued to calculate the emission trace does not grow with the BoM.
+        """
+
+        product = Product.objects.get(pk=self.processor2.pk)
+        # Warm up process-wide caches (e.g. content types), but compare with a cold reference cache, as reference
+        # factors are otherwise only loaded by the first call
+        product.get_emission_trace()
+        reference_cache.invalidate()
+        with CaptureQueriesContext(connection) as small_bom_queries:
+            product.get_emission_trace()
+
+        self._extend_bom(self.processor2, depth=4, width=3)
+        reference_cache.invalidate()
+        with CaptureQueriesContext(connection) as large_bom_queries:
+            trace = product.get_emission_trace()
+
+        self.assertEqual(len(small_bom_queries), len(large_bom_queries))
+        self._check_product_emission_trace(trace)
+
+    def test_product_get_emission_shared_subassemblies_are_built_once(self):
+        """
+        Test that every distinct product of a BoM with heavily shared subassemblies is only built once.
+        """
+
+        # Every level has two products which both use the two products of the next level,
+        # so the number of paths doubles with every level
+        depth = 12
+        root = Product.objects.create(
+            name="Assembly",
+            description="Assembly of shared subassemblies",
+            supplier=self.samsung,
+            year_of_construction=2025
+        )
+        level = [root]
+        products = 1
+        for level_index in range(depth):
+            next_level = [
+                Product.objects.create(
+                    name=f"Subassembly {level_index}-{index}",
+                    description="Shared subassembly",
+                    supplier=self.samsung,
+                    year_of_construction=2025
+                )
+                for index in range(2)
+            ]
+            for parent in level:
+                for child in next_level:
+                    ProductBoMLineItem.objects.create(parent_product=parent, line_item_product=child, quantity=2)
+            level = next_level
+            products += len(next_level)
+        for parent in level:
+            ProductBoMLineItem.objects.create(parent_product=parent, line_item_product=self.silicon_material,
+                                              quantity=1)
+        products += 1
+
+        with patch.object(Product, "_build_emission_trace", autospec=True,
+                          side_effect=Product._build_emission_trace) as build:
+            trace = root.get_emission_trace()
+
+        self.assertEqual(build.call_count, products)
+        # Every level doubles the number of paths and the quantity of each path
+        silicon_stages = self.silicon_material.get_emission_trace().emissions_subtotal
+        self.assertEqual(trace.emissions_subtotal.keys(), silicon_stages.keys())
+        for stage, split in silicon_stages.items():
+            self.assertAlmostEqual(trace.emissions_subtotal[stage].total, split.total * 4 ** depth)
+
+    def test_emission_trace_multiplication_references_original(self):
+        """
+        Test that multiplying an emission trace scales its subtotal without copying the original trace.
+        """
+
+        reference_trace = self.transport_air.get_emission_trace()
+        scaled = reference_trace * 2.5
+
+        self.assertEqual(len(scaled.children), 1)
+        child = next(iter(scaled.children))
+        self.assertIs(child.emission_trace, reference_trace)
+        self.assertEqual(child.quantity, 2.5)
+        self.assertIs(scaled.related_object, reference_trace.related_object)
+        self.assertEqual(scaled.mentions, [])
+        for stage, split in reference_trace.emissions_subtotal.items():
+            self.assertEqual(scaled.emissions_subtotal[stage], split * 2.5)
+        # The original trace is left untouched
+        self.assertEqual(reference_trace.total, self.transport_air.get_emission_trace().total)
+        self.assertEqual(len(reference_trace.mentions), 1)
+
+    def test_emission_subtotal_keeps_insertion_order(self):
+        """
+        Test that the stages of an emission subtotal are iterated in the order they were added, like a dictionary.
+        """
+
+        stages = [LifecycleStage.C1, LifecycleStage.A1, LifecycleStage.B1]
+        subtotal = EmissionVector({stage: EmissionSplit(biogenic=1.0, non_biogenic=2.0) for stage in stages})
+        self.assertEqual(list(subtotal), stages)
+        self.assertEqual(list(subtotal * 2), stages)
+
+        subtotal.add_weighted([(EmissionVector({LifecycleStage.A2: EmissionSplit(non_biogenic=1.0),
+                                                LifecycleStage.A1: EmissionSplit(non_biogenic=1.0)}), 3.0)])
+        self.assertEqual(list(subtotal), stages + [LifecycleStage.A2])
+        self.assertEqual(subtotal[LifecycleStage.A1], EmissionSplit(biogenic=1.0, non_biogenic=5.0))
+        del subtotal[LifecycleStage.A1]
+        self.assertEqual(list(deepcopy(subtotal)), [LifecycleStage.C1, LifecycleStage.B1, LifecycleStage.A2])
+
+    def test_product_get_emission_totals_matches_trace(self):
+        """
+        Test that the totals-only calculation returns the subtotals of the emission trace without building any trace.
+        """
+
+        self._extend_bom(self.processor2, depth=3, width=2)
+        for product in Product.objects.all():
+            trace = product.get_emission_trace()
+            with patch.object(EmissionTrace, "__post_init__", side_effect=AssertionError("EmissionTrace was built")):
+                totals = product.get_emission_totals()
+
+            self.assertEqual(totals.keys(), trace.emissions_subtotal.keys(), product.name)
+            for stage, split in trace.emissions_subtotal.items():
+                self.assertAlmostEqual(totals[stage].biogenic, split.biogenic, msg=product.name)
+                self.assertAlmostEqual(totals[stage].non_biogenic, split.non_biogenic, msg=product.name)
+
+    def test_product_emission_totals_batch(self):
+        """
+        Test that the batch endpoint returns the same totals as the product details and hides invisible emissions.
+        """
+
+        self._extend_bom(self.iphone, depth=2, width=2)
+        url = reverse("product-emission-totals", kwargs={"company_pk": self.apple.id})
+        response = self.client.post(url, {"ids": "all"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        totals = {row["id"]: row for row in response.data}
+        self.assertEqual(set(totals), set(Product.objects.filter(supplier=self.apple).values_list("id", flat=True)))
+        # Same values as the emission totals of the product serializer
+        for product in Product.objects.filter(supplier=self.apple):
+            cache = ProductEmissionCache.get_for_product(product)
+            self.assertEqual(totals[product.id]["emission_total"], cache.total)
+            self.assertEqual(totals[product.id]["emission_total_non_biogenic"], cache.total_non_biogenic)
+            self.assertEqual(totals[product.id]["emission_total_biogenic"], cache.total_biogenic)
+        self.assertIsNotNone(totals[self.iphone.id]["emission_total"])
+
+        # Apple is not a member of TSMC, which does not approve sharing requests automatically
+        url = reverse("product-emission-totals", kwargs={"company_pk": self.tsmc.id})
+        response = self.client.post(url, {"ids": [self.processor.id]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertIsNone(response.data[0]["emission_total"])
+
+        response = self.client.post(url, {"ids": [self.iphone.id]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {"ids": "some"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_product_emission_traces_depth_and_expand(self):
+        """
+        Test that the emission traces endpoint returns only the requested part of the tree when asked to.
+        """
+
+        url = reverse("product-emission-traces", kwargs={"company_pk": self.apple.id, "pk": self.iphone.id})
+        full = self.client.get(url).data
+        self.assertNotIn("id", full)
+
+        response = self.client.get(url, {"depth": 0})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], f"Product:{self.iphone.id}")
+        self.assertIsNone(response.data["children"])
+        self.assertEqual(response.data["children_count"], len(full["children"]))
+        self.assertEqual(response.data["total"], full["total"])
+
+        response = self.client.get(url, {"depth": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        children = response.data["children"]
+        self.assertEqual(len(children), len(full["children"]))
+        self.assertEqual(len({child["emission_trace"]["id"] for child in children}), len(children))
+        self.assertTrue(all(child["emission_trace"]["children"] is None for child in children))
+
+        # Expanding a node returns the same subtree as the complete trace
+        expandable = next(child for child in children if child["emission_trace"]["children_count"])
+        response = self.client.get(url, {"expand": expandable["emission_trace"]["id"], "depth": 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], expandable["emission_trace"]["id"])
+        self.assertEqual(len(response.data["children"]), expandable["emission_trace"]["children_count"])
+        self.assertEqual(response.data["emissions_subtotal"], expandable["emission_trace"]["emissions_subtotal"])
+        self.assertTrue(response.data["children"][0]["emission_trace"]["id"].startswith(response.data["id"] + "/"))
+
+        # Ids are stable between requests
+        self.assertEqual(self.client.get(url, {"depth": 1}).data, self.client.get(url, {"depth": 1}).data)
+
+        self.assertEqual(self.client.get(url, {"expand": "Product:0"}).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(url, {"depth": -1}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {"depth": "all"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_serialized_trace_matches_declared_fields(self):
+        """
+        Test that serializing a trace gives the same JSON as serializing every node through the declared fields.
+        """
+
+        for product in Product.objects.all():
+            trace = product.get_emission_trace()
+            self.assertEqual(
+                JSONRenderer().render(EmissionTraceSerializer(trace).data),
+                JSONRenderer().render(DeclaredFieldsEmissionTraceSerializer(trace).data),
+                product.name,
+            )
+
+    def test_product_get_emission_deep_chain(self):
+        """
+        Test that BoMs deeper than the recursion limit can be evaluated, serialized and checked for cycles.
+        """
+
+        depth = sys.getrecursionlimit() + 500
+        chain = Product.objects.bulk_create([
+            Product(name=f"Stage {index}", description="Deep chain", supplier=self.samsung, year_of_construction=2025)
+            for index in range(depth)
+        ])
+        ProductBoMLineItem.objects.bulk_create(
+            [ProductBoMLineItem(parent_product=parent, line_item_product=child, quantity=1)
+             for parent, child in zip(chain, chain[1:])]
+            + [ProductBoMLineItem(parent_product=chain[-1], line_item_product=self.silicon_material, quantity=1)]
+        )
+        # Bulk creation bypasses the signals that maintain the BoM closure used for cycle checks
+        bom_closure.rebuild()
+
+        silicon_totals = self.silicon_material.get_emission_totals()
+        totals = chain[0].get_emission_totals()
+        self.assertEqual(totals.keys(), silicon_totals.keys())
+        for stage, split in silicon_totals.items():
+            self.assertAlmostEqual(totals[stage].total, split.total)
+
+        trace = chain[0].get_emission_trace()
+        self.assertEqual(trace.total, round(silicon_totals.total, 2))
+        self.assertEqual(EmissionTraceSerializer(trace).data["total"], trace.total)
+
+        with self.assertRaises(ValidationError):
+            ProductBoMLineItem(parent_product=chain[-1], line_item_product=chain[0], quantity=1).full_clean()
@@ -0,0 +1,95 @@
+"""
+Tests for keyset pagination of products, BoM line items, sharing requests and audit logs
+"""
+
+from typing import List
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Product
+from core.tests.setup_functions import tech_companies_setup
+
+User = get_user_model()
+
+
+class KeysetPaginationTestCase(APITestCase):
+    def setUp(self):
+        tech_companies_setup(self)
+        self.client.force_authenticate(User.objects.get(username="samsung1@samsung.com"))
+        self.product_url = reverse("product-list", kwargs={"company_pk": self.samsung.id})
+        for index in range(5):
+            Product.objects.create(
+                name=f"Panel {index % 2}",
+                description="Panel",
+                manufacturer_name="Samsung",
+                manufacturer_country="KR",
+                manufacturer_city="Seul",
+                manufacturer_street="Hoinua",
+                manufacturer_zip_code="31PTTK",
+                year_of_construction=2025,
+                family="Display",
+                sku=f"PANEL-{index}",
+                supplier=self.samsung,
+            )
+
+    def _get_all_pages(self, url: str, params: dict) -> List[dict]:
+        """
+        Follows the next links of a paginated list and returns the results of all pages.
+        """
+        response = self.client.get(url, params)
+        results = []
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), params["page_size"])
+            results.extend(response.data["results"])
+            if response.data["next"] is None:
+                return results
+            response = self.client.get(response.data["next"])
+
+    def test_products_pages(self):
+        full = self.client.get(self.product_url).data
+        # Unpaginated lists are unchanged
+        self.assertIsInstance(full, list)
+        self.assertGreater(len(full), 5)
+
+        results = self._get_all_pages(self.product_url, {"page_size": 2})
+        self.assertEqual([product["id"] for product in results],
+                         [product["id"] for product in sorted(full, key=lambda product: (product["name"],
+                                                                                          product["id"]))])
+
+        # Pages follow the ordering and filters of the product list
+        params = {"ordering": "-emission_total", "search": "Panel"}
+        full = self.client.get(self.product_url, params).data
+        results = self._get_all_pages(self.product_url, {**params, "page_size": 2})
+        self.assertEqual([product["id"] for product in results],
+                         [product["id"] for product in sorted(full, key=lambda product: (-product["emission_total"],
+                                                                                          product["id"]))])
+
+    def test_other_lists_pages(self):
+        bom_url = reverse("product-bom-list", args=[self.apple.id, self.iphone.id])
+        self.client.force_authenticate(User.objects.get(username="apple1@apple.com"))
+        full = self.client.get(bom_url).data
+        results = self._get_all_pages(bom_url, {"page_size": 1})
+        self.assertEqual(sorted(line_item["id"] for line_item in full), [line_item["id"] for line_item in results])
+
+        audit_url = reverse("product-audit", kwargs={"company_pk": self.apple.id, "pk": self.iphone.id})
+        full = self.client.get(audit_url).data
+        self.assertGreater(len(full), 1)
+        results = self._get_all_pages(audit_url, {"page_size": 1})
+        self.assertEqual(sorted(entry["id"] for entry in results), sorted(entry["id"] for entry in full))
+        timestamps = [entry["timestamp"] for entry in results]
+        self.assertEqual(timestamps, sorted(timestamps, reverse=True))
+
+        sharing_url = reverse("product_sharing_requests-list", args=[self.samsung.id])
+        self.client.force_authenticate(User.objects.get(username="samsung1@samsung.com"))
+        full = self.client.get(sharing_url).data
+        results = self._get_all_pages(sharing_url, {"page_size": 1})
+        self.assertEqual(len(results), 2)
+        self.assertEqual(sorted(request["id"] for request in results), sorted(request["id"] for request in full))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.product_url, {"cursor": "invalid"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -3,6 +3,8 @@ Tests for the Product BOM
 """
 
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -10,8 +12,10 @@ from django.contrib.auth import get_user_model
 from core.models import CompanyMembership, Product, ProductBoMLineItem, \
     ProductionEnergyEmissionReference, EmissionBoMLink, ProductionEnergyEmission, UserEnergyEmissionReference, \
     UserEnergyEmission, LifecycleStage, \
-    TransportEmissionReference, TransportEmissionReferenceFactor, TransportEmission
-from core.tests.setup_functions import paint_companies_setup
+    TransportEmissionReference, TransportEmissionReferenceFactor, TransportEmission, ProductSharingRequest, \
+    ProductSharingRequestStatus, ProductEmissionCache
+from core.services.sharing_access import SharingAccessMatrix
+from core.tests.setup_functions import paint_companies_setup, tech_companies_setup
 
 User = get_user_model()
 
@@ -944,4 +948,55 @@ class ProductAPITest(APITestCase):
             parent_product=self.purple_paint,
             line_item_product=self.blue_paint,
             quantity=5
-        ).exists())
\ No newline at end of file
+        ).exists())
+
+class ProductBoMSharingStatusTest(APITestCase):
+    def setUp(self):
+        tech_companies_setup(self)
+
+    def test_list_bom_resolves_sharing_status_at_once(self):
+        """
+        Test that listing a BoM loads the product sharing requests of all line items with a single query and reports
+         the same status as every line item on its own.
+        """
+
+        # Materialize the PCF of every product, so only the queries of the BoM itself are captured
+        for product in Product.objects.all():
+            ProductEmissionCache.get_for_product(product)
+
+        url = reverse("product-bom-list", args=[self.apple.id, self.iphone.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        sharing_request_table = ProductSharingRequest._meta.db_table
+        self.assertEqual(
+            len([query for query in queries.captured_queries if f'FROM "{sharing_request_table}"' in query["sql"]]),
+            1
+        )
+        statuses = {item["id"]: item["product_sharing_request_status"] for item in response.data}
+        self.assertEqual(len(statuses), self.iphone.line_items.count())
+        self.assertIn(ProductSharingRequestStatus.REJECTED, statuses.values())
+        for line_item in ProductBoMLineItem.objects.filter(parent_product=self.iphone):
+            self.assertEqual(statuses[line_item.id], line_item.product_sharing_request_status)
+
+    def test_sharing_status_follows_request_changes(self):
+        """
+        Test that the sharing status of a line item reflects changes of its product sharing request, unless it was
+         loaded as part of a SharingAccessMatrix and has not been refreshed since.
+        """
+
+        line_item = next(
+            line_item for line_item in ProductBoMLineItem.objects.filter(parent_product=self.iphone)
+            if line_item.product_sharing_request_status == ProductSharingRequestStatus.REJECTED
+        )
+        loaded_line_item = ProductBoMLineItem.objects.get(pk=line_item.pk)
+        SharingAccessMatrix.for_line_items([loaded_line_item])
+
+        sharing_request = line_item.product_sharing_request
+        sharing_request.status = ProductSharingRequestStatus.ACCEPTED
+        sharing_request.save()
+        self.assertEqual(line_item.product_sharing_request_status, ProductSharingRequestStatus.ACCEPTED)
+        self.assertEqual(loaded_line_item.product_sharing_request_status, ProductSharingRequestStatus.REJECTED)
+        loaded_line_item.refresh_from_db()
+        self.assertEqual(loaded_line_item.product_sharing_request_status, ProductSharingRequestStatus.ACCEPTED)
@@ -0,0 +1,219 @@
+"""
+Tests for the materialized PCF of products and its invalidation
+"""
+
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Product, ProductBoMLineItem, ProductEmissionCache, ProductSharingRequest, \
+    ProductSharingRequestStatus, TransportEmission, TransportEmissionReferenceFactor, EmissionOverrideFactor
+from core.models.lifecycle_stage import LifecycleStage
+from core.models.product import ProductEmissionOverrideFactor
+from core.services.bulk_recompute import calculate_subtotals
+from core.tests.setup_functions import tech_companies_setup
+
+
+class ProductEmissionCacheTestCase(APITestCase):
+    def setUp(self):
+        tech_companies_setup(self)
+
+        # Materialize the PCF of every product
+        for product in Product.objects.all():
+            ProductEmissionCache.get_for_product(product)
+
+    def _assert_cache_consistent(self):
+        """
+        Recomputes the PCF of every product from scratch and compares it against the stored values.
+        """
+
+        for product in Product.objects.all():
+            entry = ProductEmissionCache.get_for_product(product)
+            expected = product.get_emission_trace()
+            stored = entry.get_emissions_subtotal()
+            self.assertEqual(set(stored.keys()), set(expected.emissions_subtotal.keys()), product.name)
+            for stage, split in expected.emissions_subtotal.items():
+                self.assertAlmostEqual(stored[stage].biogenic, split.biogenic, msg=product.name)
+                self.assertAlmostEqual(stored[stage].non_biogenic, split.non_biogenic, msg=product.name)
+            self.assertEqual(entry.total, expected.total)
+            self.assertEqual(entry.total_biogenic, expected.total_biogenic)
+            self.assertEqual(entry.total_non_biogenic, expected.total_non_biogenic)
+
+    def _is_valid(self, product: Product) -> bool:
+        return ProductEmissionCache.objects.get(product=product).is_valid
+
+    def test_cache_matches_emission_trace(self):
+        self._assert_cache_consistent()
+
+    def _version(self, product: Product) -> int:
+        return ProductEmissionCache.objects.get(product=product).version
+
+    def test_emission_change_propagates_to_ancestors(self):
+        display_version = self._version(self.display)
+        processor_version = self._version(self.processor)
+        self.iphone_line_processor_update_emission.energy_consumption = 1000
+        self.iphone_line_processor_update_emission.save()
+
+        # The change is added to the stored PCF instead of invalidating it
+        self.assertTrue(self._is_valid(self.processor))
+        self.assertTrue(self._is_valid(self.iphone))
+        self.assertGreater(self._version(self.processor), processor_version)
+        # display does not use processor, so its entry is untouched
+        self.assertEqual(self._version(self.display), display_version)
+        self._assert_cache_consistent()
+
+        # Removing an emission may remove lifecycle stages, so it falls back to invalidation
+        self.iphone_line_processor_update_emission.delete()
+        self.assertFalse(self._is_valid(self.processor))
+        self._assert_cache_consistent()
+
+    def test_emission_losing_stages_invalidates(self):
+        emission = TransportEmission.objects.get(pk=self.iphone_line_camera_transport.pk)
+        emission.reference = None
+        emission.save()
+        self.assertFalse(self._is_valid(self.iphone))
+        self._assert_cache_consistent()
+
+        emission.reference = self.transport_air
+        emission.save()
+        self.assertTrue(self._is_valid(self.iphone))
+        self._assert_cache_consistent()
+
+    def test_override_factor_changes_invalidate(self):
+        self.iphone_iphone_line_processor_transport_override.co_2_emission_factor_biogenic = 1
+        self.iphone_iphone_line_processor_transport_override.save()
+        self.assertFalse(self._is_valid(self.iphone))
+        self._assert_cache_consistent()
+
+        EmissionOverrideFactor.objects.create(
+            emission=self.iphone_line_camera_transport,
+            lifecycle_stage=LifecycleStage.A4,
+            co_2_emission_factor_non_biogenic=12,
+        )
+        self.assertFalse(self._is_valid(self.iphone))
+        self._assert_cache_consistent()
+
+        ProductEmissionOverrideFactor.objects.create(
+            product=self.camera,
+            lifecycle_stage=LifecycleStage.B1,
+            co_2_emission_factor_biogenic=5,
+        )
+        self.assertFalse(self._is_valid(self.camera))
+        self.assertFalse(self._is_valid(self.iphone))
+        self._assert_cache_consistent()
+
+    def test_line_item_changes(self):
+        self.iphone_line_camera.quantity = 3
+        self.iphone_line_camera.save()
+        self.assertTrue(self._is_valid(self.iphone))
+        self.assertTrue(self._is_valid(self.camera))
+        self._assert_cache_consistent()
+
+        self.camera_material_reference.delete()
+        self.assertFalse(self._is_valid(self.camera))
+        self.assertFalse(self._is_valid(self.iphone))
+        self._assert_cache_consistent()
+
+        ProductBoMLineItem.objects.create(
+            parent_product=self.display,
+            line_item_product=self.silicon_material,
+            quantity=4,
+        )
+        self.assertTrue(self._is_valid(self.display))
+        self.assertTrue(self._is_valid(self.iphone))
+        self._assert_cache_consistent()
+
+    def test_reference_factor_change_propagates(self):
+        factor = TransportEmissionReferenceFactor.objects.get(
+            emission_reference=self.transport_road,
+            lifecycle_stage=LifecycleStage.A3,
+        )
+        factor.co_2_emission_factor_non_biogenic = 2.5
+        factor.save()
+        self.assertTrue(TransportEmission.objects.filter(reference=self.transport_road).exists())
+        self.assertTrue(self._is_valid(self.iphone))
+        self._assert_cache_consistent()
+
+        self.transport_air.delete()
+        self._assert_cache_consistent()
+
+    def test_sharing_request_status_invalidates(self):
+        psr = ProductSharingRequest.objects.get(product=self.processor, requester=self.apple)
+        psr.status = ProductSharingRequestStatus.ACCEPTED
+        psr.save()
+        self.assertFalse(self._is_valid(self.iphone))
+        self._assert_cache_consistent()
+
+        # Bulk actions update the requests without signals
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": "admin@example.com", "password": "1234567890"},
+            format="json"
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        response = self.client.post(
+            reverse("product_sharing_requests-bulk-deny", args=[self.tsmc.id]),
+            {"ids": [psr.id]},
+            format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(self._is_valid(self.iphone))
+        self._assert_cache_consistent()
+
+    def test_company_auto_approve_invalidates(self):
+        self.tsmc.auto_approve_product_sharing_requests = True
+        self.tsmc.save()
+        self.assertFalse(self._is_valid(self.iphone))
+        self._assert_cache_consistent()
+
+    def test_invalidation_during_recompute_keeps_entry_invalid(self):
+        entry = ProductEmissionCache.objects.get(product=self.iphone)
+        ProductEmissionCache.invalidate([self.iphone.id])
+        # entry still holds the version read before the invalidation
+        entry.recompute(self.iphone)
+        self.assertFalse(entry.is_valid)
+        self.assertFalse(self._is_valid(self.iphone))
+
+    def test_recompute_command(self):
+        ProductEmissionCache.objects.filter(product=self.glass_material).delete()
+        ProductEmissionCache.objects.update(emissions_subtotal={})
+        out = StringIO()
+        call_command("recompute_emission_caches", workers=1, chunk_size=2, force=True, stdout=out)
+        self.assertEqual(ProductEmissionCache.objects.count(), Product.objects.count())
+        self.assertFalse(ProductEmissionCache.objects.filter(is_valid=False).exists())
+        self._assert_cache_consistent()
+
+        # Valid entries are skipped, so an interrupted run can be resumed
+        ProductEmissionCache.invalidate([self.iphone.id])
+        out = StringIO()
+        call_command("recompute_emission_caches", workers=1, stdout=out)
+        self.assertIn("Recomputed 1 products", out.getvalue())
+        self.assertTrue(self._is_valid(self.iphone))
+
+    def test_level_workers_only_read_stored_pcfs(self):
+        """
+        Test that a level worker neither recomputes nor writes the invalid PCF of a line item product, but reports the
+         products depending on it to the recompute command, which recomputes them itself.
+        """
+
+        ProductEmissionCache.objects.filter(product__in=[self.processor, self.iphone]).update(is_valid=False)
+        with CaptureQueriesContext(connection) as queries:
+            subtotals, versions, unavailable = calculate_subtotals([self.iphone.id, self.camera.id])
+        self.assertFalse([query for query in queries.captured_queries if not query["sql"].startswith("SELECT")])
+        self.assertEqual(unavailable, [self.iphone.id])
+        self.assertEqual(set(subtotals), {self.camera.id})
+        self.assertFalse(self._is_valid(self.processor))
+
+        out = StringIO()
+        with mock.patch("core.management.commands.recompute_emission_caches.topological_levels",
+                        return_value=[[self.iphone.id]]):
+            call_command("recompute_emission_caches", workers=1, stdout=out)
+        self.assertTrue(self._is_valid(self.iphone))
+        self.assertAlmostEqual(ProductEmissionCache.objects.get(product=self.iphone).total,
+                               self.iphone.get_emission_trace().total)
@@ -0,0 +1,101 @@
+"""
+Tests for ETags and conditional GET of product representations
+"""
+
+from io import StringIO
+from unittest import mock
+
+from auditlog.models import LogEntry
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Product, ProductionEnergyEmission
+from core.tests.setup_functions import tech_companies_setup
+
+User = get_user_model()
+
+
+class ProductETagTestCase(APITestCase):
+    def setUp(self):
+        tech_companies_setup(self)
+        self.trace_url = reverse("product-emission-traces", kwargs={"company_pk": self.apple.id,
+                                                                    "pk": self.iphone.id})
+
+    def _etag(self, url: str) -> str:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response["ETag"]
+
+    def test_unchanged_trace_is_not_recomputed(self):
+        etag = self._etag(self.trace_url)
+        with mock.patch.object(Product, "get_emission_trace") as get_emission_trace:
+            response = self.client.get(self.trace_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        get_emission_trace.assert_not_called()
+
+        response = self.client.get(self.trace_url, HTTP_IF_NONE_MATCH='"outdated"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etag_changes_with_data(self):
+        etag = self._etag(self.trace_url)
+        # A change to the PCF of a product in the BoM
+        self.iphone_assembly_emission.energy_consumption = 3000
+        self.iphone_assembly_emission.save()
+        self.assertNotEqual(self._etag(self.trace_url), etag)
+
+        # A change that does not affect any PCF
+        etag = self._etag(self.trace_url)
+        self.processor.name = "A19 Bionic"
+        self.processor.save()
+        self.assertNotEqual(self._etag(self.trace_url), etag)
+
+        # A change to reference data
+        etag = self._etag(self.trace_url)
+        self.transport_air.common_name = "Air freight"
+        self.transport_air.save()
+        self.assertNotEqual(self._etag(self.trace_url), etag)
+
+        # Changes to the products using a product keep its ETag
+        self.client.force_authenticate(User.objects.get(username="tsmc1@tsmc.com"))
+        processor_url = reverse("product-emission-traces", kwargs={"company_pk": self.tsmc.id,
+                                                                   "pk": self.processor.id})
+        etag = self._etag(processor_url)
+        self.iphone.name = "iPhone 17"
+        self.iphone.save()
+        self.assertEqual(self._etag(processor_url), etag)
+
+    def test_product_detail_and_export(self):
+        detail_url = reverse("product-detail", kwargs={"company_pk": self.apple.id, "pk": self.iphone.id})
+        export_url = reverse("product-export-aas-json", args=[self.apple.id, self.iphone.id])
+        for url in (detail_url, export_url):
+            etag = self._etag(url)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                             status.HTTP_304_NOT_MODIFIED)
+        # Conditional exports are audited as well
+        self.assertEqual(
+            list(LogEntry.objects.filter(action=LogEntry.Action.ACCESS, object_pk=str(self.iphone.pk))
+                 .order_by("timestamp", "id").values_list("changes_text", flat=True)),
+            ["Exported to AAS JSON format", "Exported to AAS JSON format (not modified)"],
+        )
+
+        # Members and non-members see different details
+        etag = self._etag(detail_url)
+        self.client.force_authenticate(User.objects.get(username="tsmc1@tsmc.com"))
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_etag_changes_after_forced_recompute(self):
+        detail_url = reverse("product-detail", kwargs={"company_pk": self.apple.id, "pk": self.iphone.id})
+        etag = self._etag(detail_url)
+        # A data fix that bypasses the signals
+        ProductionEnergyEmission.objects.filter(pk=self.iphone_assembly_emission.pk).update(energy_consumption=3000)
+        self.assertEqual(self._etag(detail_url), etag)
+
+        call_command("recompute_emission_caches", "--force", "--workers", "1", stdout=StringIO())
+        new_etag = self._etag(detail_url)
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
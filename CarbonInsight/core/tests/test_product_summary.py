@@ -0,0 +1,130 @@
+"""
+Tests for the summary columns of products
+"""
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Product, ProductEmissionCache
+from core.services.bom_graph import BoMGraph
+from core.tests.setup_functions import tech_companies_setup
+
+User = get_user_model()
+
+
+class ProductSummaryTestCase(APITestCase):
+    def setUp(self):
+        tech_companies_setup(self)
+        self.client.force_authenticate(User.objects.get(username="samsung1@samsung.com"))
+        self.url = reverse("product-list", kwargs={"company_pk": self.samsung.id})
+
+    def _entry(self, product: Product) -> ProductEmissionCache:
+        return ProductEmissionCache.objects.get(product=product)
+
+    def test_counts_are_maintained(self):
+        entry = self._entry(self.iphone)
+        self.assertEqual(entry.line_item_count, self.iphone.line_items.count())
+        self.assertEqual(entry.emission_count, self.iphone.emissions.count())
+        self.assertGreater(entry.line_item_count, 0)
+        self.assertGreater(entry.emission_count, 0)
+
+        self.iphone_line_display.delete()
+        self.iphone_assembly_emission.delete()
+        updated = self._entry(self.iphone)
+        self.assertEqual(updated.line_item_count, entry.line_item_count - 1)
+        self.assertEqual(updated.emission_count, entry.emission_count - 1)
+
+    def test_totals_are_maintained(self):
+        ProductEmissionCache.get_for_product(self.iphone)
+        # Changes applied as deltas
+        self.iphone_assembly_emission.energy_consumption = 3000
+        self.iphone_assembly_emission.save()
+        entry = self._entry(self.iphone)
+        self.assertTrue(entry.is_valid)
+        totals = self.iphone.get_emission_totals()
+        self.assertAlmostEqual(entry.emission_total, totals.total)
+        self.assertAlmostEqual(entry.emission_total_biogenic, totals.biogenic)
+        self.assertAlmostEqual(entry.emission_total_non_biogenic, totals.non_biogenic)
+
+        # Changes applied by recomputing
+        self.iphone_line_display.delete()
+        ProductEmissionCache.get_for_product(self.iphone)
+        self.assertAlmostEqual(self._entry(self.iphone).emission_total, self.iphone.get_emission_totals().total)
+
+    def test_order_and_filter_by_summary(self):
+        products = Product.objects.filter(supplier=self.samsung)
+        ProductEmissionCache.invalidate(products.values_list("id", flat=True))
+
+        response = self.client.get(self.url, {"ordering": "-emission_total"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        totals = {product.id: product.get_emission_totals().total for product in products}
+        self.assertEqual([product["id"] for product in response.data],
+                         sorted(totals, key=totals.get, reverse=True))
+        self.assertTrue(all(entry.is_valid for entry in ProductEmissionCache.objects.filter(product__in=products)))
+
+        highest = max(totals.values())
+        response = self.client.get(self.url, {"emission_total_min": highest - 0.001})
+        self.assertEqual([product["id"] for product in response.data], [max(totals, key=totals.get)])
+        response = self.client.get(self.url, {"line_item_count_max": 0, "ordering": "name"})
+        self.assertEqual(
+            [product["name"] for product in response.data],
+            sorted(product.name for product in products if not product.line_items.exists()),
+        )
+
+        # The emissions of the products are not visible to non-members
+        self.client.force_authenticate(User.objects.get(username="apple1@apple.com"))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        response = self.client.get(self.url, {"ordering": "-emission_total"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_summary_filters_do_not_apply_to_single_products(self):
+        self.client.force_authenticate(User.objects.get(username="apple1@apple.com"))
+        url = reverse("product-detail", kwargs={"company_pk": self.samsung.id, "pk": self.display.id})
+        total = self.display.get_emission_totals().total
+        for params in ({"emission_total_max": total - 0.01}, {"emission_total_min": total - 0.01},
+                       {"emission_total_min": total + 0.01}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIsNone(response.data["emission_total"])
+
+    def test_stale_entries_are_recomputed_at_once(self):
+        products = Product.objects.filter(supplier=self.samsung)
+        ProductEmissionCache.invalidate(products.values_list("id", flat=True))
+        with mock.patch.object(BoMGraph, "load", wraps=BoMGraph.load) as load:
+            response = self.client.get(self.url, {"ordering": "emission_total"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        load.assert_called_once()
+        for product in products:
+            entry = self._entry(product)
+            self.assertTrue(entry.is_valid)
+            self.assertAlmostEqual(entry.emission_total, product.get_emission_totals().total)
+
+    def test_admin_validates_listed_products(self):
+        ProductEmissionCache.invalidate(Product.objects.values_list("id", flat=True))
+        self.client.force_login(User.objects.get(username="admin@example.com"))
+        response = self.client.get(reverse("admin:core_product_changelist"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(ProductEmissionCache.objects.filter(is_valid=False).exists())
+
+    def test_admin_validates_before_filtering_and_ordering(self):
+        self.client.force_login(User.objects.get(username="admin@example.com"))
+        camera, display = self.camera, self.display
+        for params, expected in (({"o": "-6"}, [display, camera]), ({"emission_total": "100-1000"}, [display])):
+            ProductEmissionCache.invalidate(Product.objects.values_list("id", flat=True))
+            # Stale summary columns would put the products in the wrong order and range
+            ProductEmissionCache.objects.update(emission_total=0)
+            with mock.patch.object(BoMGraph, "load", wraps=BoMGraph.load) as load:
+                response = self.client.get(reverse("admin:core_product_changelist"),
+                                           {"supplier__id__exact": self.samsung.id, **params})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            load.assert_called_once()
+            self.assertEqual(list(response.context["cl"].result_list), expected)
+            # Only the products selected by the other filters are recomputed
+            self.assertFalse(ProductEmissionCache.objects.filter(product__supplier=self.samsung,
+                                                                 is_valid=False).exists())
+            self.assertTrue(ProductEmissionCache.objects.filter(product=self.iphone, is_valid=False).exists())
+
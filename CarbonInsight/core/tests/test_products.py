@@ -2,6 +2,8 @@
 Tests for product API
 """
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -511,4 +513,36 @@ class ProductAPITest(APITestCase):
                                           })
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertEqual(Product.objects.filter(name="Red paint").count(), 1)
\ No newline at end of file
+        self.assertEqual(Product.objects.filter(name="Red paint").count(), 1)
+
+    def test_products_list_permission_queries_do_not_grow(self):
+        """
+        Test that the companies and memberships are queried a fixed number of times, however many products are listed.
+        """
+
+        url = reverse("product-list", kwargs={"company_pk": self.red_company.id})
+
+        def count_permission_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len([query for query in queries.captured_queries
+                        if 'FROM "core_company"' in query["sql"] or '"core_companymembership"' in query["sql"]])
+
+        expected = count_permission_queries()
+        self.assertLessEqual(expected, 2)
+        for index in range(5):
+            Product.objects.create(
+                name=f"Red paint {index}",
+                description="Red paint",
+                supplier=self.red_company,
+                manufacturer_name="Red company",
+                manufacturer_country="NL",
+                manufacturer_city="Eindhoven",
+                manufacturer_street="De Zaale",
+                manufacturer_zip_code="5612AZ",
+                year_of_construction=2025,
+                family="Paint",
+                sku=f"red-{index}",
+            )
+        self.assertEqual(count_permission_queries(), expected)
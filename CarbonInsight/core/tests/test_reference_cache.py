@@ -0,0 +1,89 @@
+"""
+Tests for the in-process cache of reference data
+"""
+
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from core.models import Product, ReferenceDataVersion, TransportEmissionReferenceFactor
+from core.models.lifecycle_stage import LifecycleStage
+from core.models.product import ProductEmissionOverrideFactor
+from core.services.bom_graph import BoMGraph
+from core.services.reference_cache import reference_cache
+from core.tests.setup_functions import tech_companies_setup
+
+
+class ReferenceCacheTestCase(APITestCase):
+    def setUp(self):
+        tech_companies_setup(self)
+        reference_cache.invalidate()
+
+    def _factor_queries(self, queries) -> list:
+        return [query["sql"] for query in queries if "referencefactor" in query["sql"]]
+
+    def test_reference_factors_are_loaded_once(self):
+        with CaptureQueriesContext(connection) as first_load:
+            first = BoMGraph.load([self.iphone.id]).get_emission_totals(self.iphone.id)
+        self.assertTrue(self._factor_queries(first_load.captured_queries))
+
+        with CaptureQueriesContext(connection) as second_load:
+            second = BoMGraph.load([self.iphone.id]).get_emission_totals(self.iphone.id)
+        self.assertEqual(self._factor_queries(second_load.captured_queries), [])
+        self.assertEqual(dict(first.items()), dict(second.items()))
+        self.assertEqual(second.total, self.iphone.get_emission_trace().total)
+
+    def test_reference_factor_change_invalidates(self):
+        BoMGraph.load([self.iphone.id]).get_emission_totals(self.iphone.id)
+        version = ReferenceDataVersion.current()
+
+        factor = TransportEmissionReferenceFactor.objects.get(
+            emission_reference=self.transport_road,
+            lifecycle_stage=LifecycleStage.A3,
+        )
+        factor.co_2_emission_factor_non_biogenic = 2.5
+        factor.save()
+        self.assertGreater(ReferenceDataVersion.current(), version)
+
+        totals = BoMGraph.load([self.iphone.id]).get_emission_totals(self.iphone.id)
+        self.assertEqual(self.transport_road.get_emission_totals()[LifecycleStage.A3].non_biogenic, 2.5)
+        self.assertAlmostEqual(totals.total, self.iphone.get_emission_trace().total)
+
+    def test_other_process_change_invalidates(self):
+        BoMGraph.load([self.iphone.id]).get_emission_totals(self.iphone.id)
+
+        # Simulate another process changing reference data without signals reaching this one
+        TransportEmissionReferenceFactor.objects.filter(emission_reference=self.transport_road).update(
+            co_2_emission_factor_non_biogenic=7
+        )
+        ReferenceDataVersion.bump()
+
+        with CaptureQueriesContext(connection) as queries:
+            totals = BoMGraph.load([self.iphone.id]).get_emission_totals(self.iphone.id)
+        self.assertTrue(self._factor_queries(queries.captured_queries))
+        self.assertAlmostEqual(totals.total, self.iphone.get_emission_trace().total)
+
+    def test_reference_products_are_pinned(self):
+        BoMGraph.load([self.iphone.id]).get_emission_totals(self.iphone.id)
+        self.assertIsNotNone(reference_cache.get_product_totals(self.glass_material.id))
+        self.assertIsNone(reference_cache.get_product_totals(self.processor.id))
+
+        with patch.object(Product, "_build_emission_totals", autospec=True,
+                          side_effect=Product._build_emission_totals) as build:
+            BoMGraph.load([self.iphone.id]).get_emission_totals(self.iphone.id)
+        built = {call.args[0].id for call in build.call_args_list}
+        self.assertNotIn(self.glass_material.id, built)
+        self.assertNotIn(self.silicon_material.id, built)
+        self.assertIn(self.iphone.id, built)
+
+        ProductEmissionOverrideFactor.objects.filter(product=self.glass_material).update(
+            co_2_emission_factor_biogenic=4
+        )
+        override = ProductEmissionOverrideFactor.objects.filter(product=self.glass_material).first()
+        override.save()
+        self.assertIsNone(reference_cache.get_product_totals(self.glass_material.id))
+
+        totals = BoMGraph.load([self.glass_material.id]).get_emission_totals(self.glass_material.id)
+        self.assertEqual(totals.biogenic, 4)
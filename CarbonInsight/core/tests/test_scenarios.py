@@ -0,0 +1,104 @@
+"""
+Tests for the what-if scenario API
+"""
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models.lifecycle_stage import LifecycleStage
+from core.models.product import ProductEmissionOverrideFactor
+from core.tests.setup_functions import tech_companies_setup
+
+
+class ScenarioAPITestCase(APITestCase):
+    def setUp(self):
+        tech_companies_setup(self)
+        self.url = reverse("product-scenarios", kwargs={"company_pk": self.apple.id, "pk": self.iphone.id})
+
+    def test_scenarios_match_saved_changes(self):
+        """
+        Test that a scenario results in the same totals as saving its changes, without writing anything.
+        """
+
+        baseline_total = self.iphone.get_emission_trace().total
+        data = {"scenarios": [
+            {"name": "unchanged"},
+            {
+                "name": "alternative",
+                "line_item_quantities": {str(self.iphone_line_camera.id): 1},
+                "removed_line_items": [self.iphone_line_display.id],
+                "emission_references": {str(self.iphone_line_camera_transport.id): self.transport_air.id},
+            },
+            {
+                "name": "override",
+                "override_factors": {str(self.iphone.id): [
+                    {"lifecycle_stage": LifecycleStage.A1, "co_2_emission_factor_non_biogenic": 2.0},
+                ]},
+            },
+        ]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+        ])
+        self.assertEqual(response.data["baseline"]["emission_total"], baseline_total)
+        self.assertEqual(response.data["scenarios"][0]["name"], "unchanged")
+        self.assertEqual(response.data["scenarios"][0]["emission_total"], baseline_total)
+        self.assertEqual(self.iphone.get_emission_trace().total, baseline_total)
+
+        self.iphone_line_camera.quantity = 1
+        self.iphone_line_camera.save()
+        self.iphone_line_display.delete()
+        self.iphone_line_camera_transport.reference = self.transport_air
+        self.iphone_line_camera_transport.save()
+        expected_total = self.iphone.get_emission_trace().total
+        self.assertNotEqual(expected_total, baseline_total)
+        self.assertEqual(response.data["scenarios"][1]["emission_total"], expected_total)
+
+        ProductEmissionOverrideFactor.objects.create(
+            product=self.iphone,
+            lifecycle_stage=LifecycleStage.A1,
+            co_2_emission_factor_non_biogenic=2.0,
+        )
+        self.assertEqual(response.data["scenarios"][2]["emission_total"], self.iphone.get_emission_trace().total)
+
+    def test_scenarios_outside_bom(self):
+        data = {"scenarios": [{"removed_line_items": [self.processor_material_reference.id + 1000]}]}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        data = {"scenarios": [{"emission_references": {str(self.iphone_line_camera_transport.id): 0}}]}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(self.url, {"scenarios": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_scenarios_outside_owned_bom(self):
+        """
+        Test that scenarios cannot change the BoMs of suppliers, which would reveal their hidden emissions, and that
+         they are rejected the same way as objects that do not exist.
+        """
+
+        missing_id = self.camera_material_reference.id + 1000
+        errors = []
+        for line_item_id in (self.camera_material_reference.id, missing_id):
+            data = {"scenarios": [{"line_item_quantities": {str(line_item_id): 0}}]}
+            response = self.client.post(self.url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            errors.append(str(response.data).replace(str(line_item_id), "ID"))
+        self.assertEqual(errors[0], errors[1])
+
+        for scenario in (
+            {"emission_references": {str(self.iphone_line_processor_update_emission.id): self.update_processor.id}},
+            {"override_factors": {str(self.camera.id): [
+                {"lifecycle_stage": LifecycleStage.A1, "co_2_emission_factor_non_biogenic": 2.0},
+            ]}},
+        ):
+            response = self.client.post(self.url, {"scenarios": [scenario]}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,65 @@
+"""
+Tests for choosing the returned fields of products and BoM line items
+"""
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Product
+from core.services.sharing_access import SharingAccessMatrix
+from core.tests.setup_functions import tech_companies_setup
+
+User = get_user_model()
+
+
+class SparseFieldsetTestCase(APITestCase):
+    def setUp(self):
+        tech_companies_setup(self)
+        self.client.force_authenticate(User.objects.get(username="apple1@apple.com"))
+        self.product_url = reverse("product-detail", kwargs={"company_pk": self.apple.id, "pk": self.iphone.id})
+        self.bom_url = reverse("product-bom-list", args=[self.apple.id, self.iphone.id])
+
+    def test_product_fields_and_omit(self):
+        full = self.client.get(self.product_url).data
+        with mock.patch.object(Product, "get_emission_totals") as get_emission_totals:
+            response = self.client.get(self.product_url, {"fields": "id, name,unknown"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"id": full["id"], "name": full["name"]})
+        get_emission_totals.assert_not_called()
+
+        response = self.client.get(self.product_url, {"omit": "description,emission_total"})
+        self.assertEqual(set(response.data), set(full) - {"description", "emission_total"})
+
+        # The fields that are written do not depend on the query parameters
+        response = self.client.patch(f"{self.product_url}?fields=id", {"description": "New"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["description"], "New")
+
+    def test_bom_nested_fields(self):
+        full = self.client.get(self.bom_url).data
+        response = self.client.get(self.bom_url, {"fields": "id,line_item_product.name"})
+        self.assertEqual(response.data, [
+            {"id": line_item["id"], "line_item_product": {"name": line_item["line_item_product"]["name"]}}
+            for line_item in full
+        ])
+
+        response = self.client.get(self.bom_url, {"fields": "quantity,line_item_product",
+                                                  "omit": "line_item_product.description"})
+        for line_item, full_line_item in zip(response.data, full):
+            self.assertEqual(set(line_item), {"quantity", "line_item_product"})
+            self.assertEqual(set(line_item["line_item_product"]),
+                             set(full_line_item["line_item_product"]) - {"description"})
+            # The emissions shown depend on the sharing status even if it is not returned
+            self.assertEqual(line_item["line_item_product"]["emission_total"],
+                             full_line_item["line_item_product"]["emission_total"])
+
+    def test_bom_skips_sharing_status(self):
+        with mock.patch.object(SharingAccessMatrix, "for_line_items") as for_line_items:
+            response = self.client.get(self.bom_url, {"fields": "id,quantity"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for_line_items.assert_not_called()
+        self.assertTrue(all(set(line_item) == {"id", "quantity"} for line_item in response.data))
@@ -0,0 +1,100 @@
+"""
+Tests for comparing emission traces
+"""
+
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import ProductEmissionCache, ProductEmissionSnapshot
+from core.services.scenarios import Scenario, ScenarioEngine
+from core.services.trace_diff import TraceNodeStatus, diff_traces
+from core.tests.setup_functions import tech_companies_setup
+
+
+class TraceDiffTestCase(APITestCase):
+    def setUp(self):
+        tech_companies_setup(self)
+        self.url = reverse("product-emission-trace-diff", kwargs={"company_pk": self.apple.id, "pk": self.iphone.id})
+
+    def test_child_node_ids_match_trace(self):
+        trace = self.iphone.get_emission_trace()
+        for node_id, child in trace.get_child_nodes_by_id().items():
+            self.assertIs(trace.find_node(f"{trace.node_id}/{node_id}"), child.emission_trace)
+
+    def test_diff_traces(self):
+        trace = self.iphone.get_emission_trace()
+        self.assertEqual(diff_traces(trace, self.iphone.get_emission_trace()), [])
+
+        engine = ScenarioEngine.load(self.iphone.id)
+        scenario = Scenario(
+            removed_line_items={self.iphone_line_display.id},
+            emission_references={self.iphone_line_camera_transport.id: self.transport_air.id},
+        )
+        engine.prepare([scenario])
+        scenario_trace = engine.trace(scenario)
+        self.assertAlmostEqual(scenario_trace.emissions_subtotal.total, engine.evaluate(scenario).total)
+        # The snapshot of the engine is left as it is
+        self.assertEqual(diff_traces(trace, engine.graph.get_emission_trace(self.iphone.id)), [])
+
+        diffs = {diff.id: diff for diff in diff_traces(trace, scenario_trace)}
+        root = f"Product:{self.iphone.id}"
+        self.assertEqual(diffs[root].status, TraceNodeStatus.CHANGED)
+        self.assertEqual(diffs[root].new_total, scenario_trace.total)
+        self.assertEqual(diffs[f"{root}/Product:{self.display.id}"].status, TraceNodeStatus.REMOVED)
+        transport = f"{root}/TransportEmission:{self.iphone_line_camera_transport.id}"
+        self.assertEqual(diffs[transport].status, TraceNodeStatus.CHANGED)
+        self.assertTrue(diffs[transport].stages)
+        # The swapped reference is a different node
+        self.assertEqual(diffs[f"{transport}/TransportEmissionReference:{self.transport_road.id}"].status,
+                         TraceNodeStatus.REMOVED)
+        self.assertEqual(diffs[f"{transport}/TransportEmissionReference:{self.transport_air.id}"].status,
+                         TraceNodeStatus.ADDED)
+        # Unchanged nodes are left out
+        self.assertEqual(len(diffs), 5)
+
+    def test_diff_with_scenario(self):
+        data = {"scenario": {"removed_line_items": [self.iphone_line_display.id]}}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["old_total"], self.iphone.get_emission_trace().total)
+        root = f"Product:{self.iphone.id}"
+        self.assertEqual(
+            [(node["id"], node["status"]) for node in response.data["nodes"]],
+            [(root, "changed"), (f"{root}/Product:{self.display.id}", "removed")],
+        )
+
+        data["max_depth"] = 0
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(len(response.data["nodes"]), 1)
+
+    def test_diff_with_snapshot(self):
+        ProductEmissionCache.get_for_product(self.iphone)
+        snapshot = ProductEmissionSnapshot.objects.filter(product=self.iphone).latest("recorded_at")
+        self.iphone_assembly_emission.energy_consumption = 3000
+        self.iphone_assembly_emission.save()
+
+        response = self.client.post(self.url, {"snapshot": snapshot.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["nodes"]), 1)
+        node = response.data["nodes"][0]
+        self.assertEqual(node["id"], f"Product:{self.iphone.id}")
+        self.assertEqual(node["old_total"], round(snapshot.emissions_vector.total, 2))
+        self.assertEqual(node["new_total"], self.iphone.get_emission_trace().total)
+        self.assertEqual(node["added_mentions"], [])
+
+    def test_diff_invalid_requests(self):
+        self.assertEqual(self.client.post(self.url, {}, format="json").status_code, status.HTTP_400_BAD_REQUEST)
+        ProductEmissionCache.get_for_product(self.processor)
+        other_snapshot = ProductEmissionSnapshot.objects.filter(product=self.processor).first()
+        response = self.client.post(self.url, {"snapshot": other_snapshot.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {"scenario": {"removed_line_items": [0]}}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_diff_scenario_outside_owned_bom(self):
+        # Changes to the BoM of a supplier would show the hidden nodes of its sub-BoM
+        data = {"scenario": {"line_item_quantities": {str(self.camera_material_reference.id): 0}}}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn("nodes", response.data)
@@ -8,13 +8,17 @@ from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound
 from rest_framework.filters import SearchFilter
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from core.models import Company, CompanyMembership, Product
+from core.models import Company, CompanyMembership, Product, ProductEmissionCache, ProductEmissionSnapshot
+from core.pagination import KeysetPagination, KEYSET_PAGINATION_PARAMETERS
 from core.permissions import IsCompanyMember, CanEditCompany
 from core.serializers.audit_log_entry_serializer import AuditLogEntrySerializer
 from core.serializers.company_serializer import CompanyDetailSerializer, CompanyListSerializer
+from core.serializers.product_emission_snapshot_serializer import EmissionHistoryQuerySerializer, \
+    ProductEmissionSnapshotSerializer
 from core.serializers.user_serializer import UserUsernameSerializer, UserSerializer
 from core.views.mixins.company_mixin import CompanyMixin
 
@@ -78,6 +82,8 @@ class CompanyViewSet(viewsets.ModelViewSet):
             return CompanyListSerializer
         if self.action in ['audit']:
             return AuditLogEntrySerializer
+        if self.action in ['emission_history']:
+            return ProductEmissionSnapshotSerializer
         return super().get_serializer_class()
 
     def get_object(self):
@@ -109,7 +115,9 @@ class CompanyViewSet(viewsets.ModelViewSet):
     @extend_schema(
         tags=["Companies"],
         summary="Audit log for company",
-        description="Retrieve the audit log entries for a specific company and its products. ",
+        description="Retrieve the audit log entries for a specific company and its products, newest first. "
+                    "Entries are paginated by a cursor if `page_size` or `cursor` is given.",
+        parameters=KEYSET_PAGINATION_PARAMETERS,
         responses=AuditLogEntrySerializer(many=True),
     )
     @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated, IsCompanyMember], url_path="audit")
@@ -123,7 +131,8 @@ class CompanyViewSet(viewsets.ModelViewSet):
             **kwargs: Arbitrary keyword arguments, including the company's primary key.
 
         Returns:
-            Response: An HTTP 200 OK response containing the serialized audit log entries.
+            Response: An HTTP 200 OK response containing the serialized audit log entries, paginated if `page_size`
+             or `cursor` is given.
         """
         company = self.get_object()
 
@@ -140,9 +149,63 @@ class CompanyViewSet(viewsets.ModelViewSet):
         )
 
         logs = LogEntry.objects.filter(base_q).order_by("-timestamp")
+        paginator = KeysetPagination(ordering=("-timestamp", "-id"))
+        page = paginator.paginate_queryset(logs, request, view=self)
+        if page is None:
+            return Response(self.get_serializer(logs, many=True).data, status=status.HTTP_200_OK)
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
 
-        serializer = self.get_serializer(logs, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    @extend_schema(
+        tags=["Companies"],
+        summary="PCF history of the products of a company",
+        description="Retrieve every recorded change of the emissions of the products of a specific company in "
+                    "chronological order, optionally limited to a time range. "
+                    "Action is available only to company members.",
+        parameters=[
+            EmissionHistoryQuerySerializer,
+            OpenApiParameter(
+                name="limit",
+                type=int,
+                location="query",
+                required=False,
+                description="Number of snapshots to return per page, all snapshots are returned if omitted",
+            ),
+            OpenApiParameter(
+                name="offset",
+                type=int,
+                location="query",
+                required=False,
+                description="Index of the first snapshot to return",
+            ),
+        ],
+        responses=ProductEmissionSnapshotSerializer(many=True),
+    )
+    @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated, IsCompanyMember])
+    def emission_history(self, request, *args, **kwargs):
+        """
+        Retrieves the recorded PCF snapshots of all products of a specific company.
+
+        Args:
+            request (HttpRequest): The HTTP request object, optionally with `since`, `until`, `limit` and `offset`
+             query parameters.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments, including the company's primary key.
+
+        Returns:
+            Response: An HTTP 200 OK response containing the serialized snapshots, paginated if `limit` is given.
+        """
+        company = self.get_object()
+        query = EmissionHistoryQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        # Make sure the current PCFs have been recorded, recomputing the stale ones in a single pass
+        ProductEmissionCache.validate_all(Product.objects.filter(supplier=company))
+        snapshots = ProductEmissionSnapshot.objects.filter(supplier=company).between(**query.validated_data)
+        paginator = LimitOffsetPagination()
+        page = paginator.paginate_queryset(snapshots, request, view=self)
+        if page is None:
+            return Response(self.get_serializer(snapshots, many=True).data)
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
 
 @extend_schema(
     parameters=[
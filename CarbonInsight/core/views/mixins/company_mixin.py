@@ -1,35 +1,26 @@
 from typing import TypeVar
 
-from django.core.exceptions import ValidationError
-from django.shortcuts import get_object_or_404
+from django.http import Http404
 from rest_framework.exceptions import NotFound
 from rest_framework.viewsets import ModelViewSet
 
-from core.models import Company
+from core.services.request_context import RequestContext
 
 T = TypeVar('T', bound=ModelViewSet)
 
-def resolve_company_pk(company_pk: str) -> int:
-    """
-    Resolves the company_pk from the URL, handling the special case
-    for the reference company.
-    """
-    if company_pk == "reference":
-        return Company.objects.get(is_reference=True).pk
-    return int(company_pk)
-
 class CompanyMixin:
     """
     Provides `get_parent_company()` for viewsets whose URL includes
-    a `company_pk` kwarg.
+    a `company_pk` kwarg. The company is resolved once per request
+    (see RequestContext).
     """
     def get_parent_company(self:T):
         if 'company_pk' not in self.kwargs:
             return NotFound("Company not specified in URL.")
-        return get_object_or_404(
-            Company,
-            pk=resolve_company_pk(self.kwargs.get('company_pk'))
-        )
+        company = RequestContext.for_request(self.request).get_company(self.kwargs.get('company_pk'))
+        if company is None:
+            raise Http404("No Company matches the given query.")
+        return company
 
     def get_parent_company_pk(self:T):
-        return self.get_parent_company().pk
\ No newline at end of file
+        return self.get_parent_company().pk
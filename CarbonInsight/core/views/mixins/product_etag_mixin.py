@@ -0,0 +1,58 @@
+import hashlib
+from typing import Optional, TypeVar
+
+from django.http import HttpResponseBase
+from django.utils.cache import get_conditional_response, quote_etag
+from rest_framework.viewsets import ModelViewSet
+
+from core.models import Product, ProductEmissionCache, ReferenceDataVersion
+
+T = TypeVar('T', bound=ModelViewSet)
+
+class ProductETagMixin:
+    """
+    Provides strong ETags and conditional GET for the representations of a product.
+
+    The ETag is a fingerprint of the content version of the product (see ProductEmissionCache), which changes
+     whenever data of the product or of any product in its BoM changes, and of the version of the reference data. It
+     is checked with two small queries if the PCF of the product is up to date, so an unchanged representation is
+     never computed.
+    """
+
+    def get_product_etag(self: T, product: Product, *variants) -> str:
+        """
+        Returns the ETag of a representation of the product for the current request.
+
+        Args:
+            product: Product object
+            *variants: anything else the representation depends on, e.g. whether the user can see its emissions
+        Returns:
+            quoted strong ETag
+        """
+
+        # Recomputing a stale entry bumps its content version if the PCF changed, so that has to happen first
+        content_version = ProductEmissionCache.get_for_product(product).content_version
+        renderer = getattr(self.request, "accepted_renderer", None)
+        fingerprint = ":".join(str(part) for part in (
+            product.pk,
+            content_version,
+            ReferenceDataVersion.current(),
+            renderer.format if renderer else None,
+            *variants,
+        ))
+        return quote_etag(hashlib.blake2b(fingerprint.encode(), digest_size=16).hexdigest())
+
+    def get_not_modified_response(self: T, etag: str) -> Optional[HttpResponseBase]:
+        """
+        Evaluates the conditional headers of the current request against an ETag.
+
+        Args:
+            etag: ETag of the current representation
+        Returns:
+            304 Not Modified (or 412 Precondition Failed) response, or None if the representation has to be sent
+        """
+
+        response = get_conditional_response(self.request, etag=etag)
+        if response is not None:
+            response["ETag"] = etag
+        return response
@@ -5,8 +5,10 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from core.models import Product, ProductBoMLineItem, Company
+from core.pagination import KeysetPagination
 from core.permissions import ProductSubAPIPermission
 from core.serializers.product_bom_line_item_serializer import ProductBoMLineItemSerializer
+from core.serializers.sparse_fieldset_mixin import SPARSE_FIELDSET_PARAMETERS
 from core.views.mixins.company_mixin import CompanyMixin
 from core.views.mixins.product_mixin import ProductMixin
 
@@ -37,11 +39,16 @@ from core.views.mixins.product_mixin import ProductMixin
         tags=["Product BoM line items"],
         summary="Retrieve all BoM line items for a product",
         description="Retrieve all BoM line items for a specific product. "
+                    "The returned fields can be chosen with `fields` and `omit`. "
+                    "Line items are paginated by a cursor if `page_size` or `cursor` is given.",
+        parameters=SPARSE_FIELDSET_PARAMETERS,
     ),
     retrieve=extend_schema(
         tags=["Product BoM line items"],
         summary="Retrieve a specific BoM line item for a product",
         description="Retrieve a specific BoM line item for a product. "
+                    "The returned fields can be chosen with `fields` and `omit`.",
+        parameters=SPARSE_FIELDSET_PARAMETERS,
     ),
     create=extend_schema(
         tags=["Product BoM line items"],
@@ -87,6 +94,8 @@ class ProductBoMLineItemViewSet(
     queryset = ProductBoMLineItem.objects.none()
     serializer_class = ProductBoMLineItemSerializer
     permission_classes = [IsAuthenticated, ProductSubAPIPermission]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("parent_product_id", "id")
 
     def get_queryset(self):
         """
@@ -96,7 +105,9 @@ class ProductBoMLineItemViewSet(
             QuerySet: A queryset of ProductBoMLineItem instances related to the parent product.
         """
         product = self.get_parent_product()
-        return ProductBoMLineItem.objects.filter(parent_product=product)
+        return ProductBoMLineItem.objects.filter(parent_product=product).select_related(
+            "parent_product__supplier", "line_item_product__supplier"
+        )
 
     def perform_create(self, serializer):
         """
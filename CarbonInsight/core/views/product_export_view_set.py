@@ -14,14 +14,19 @@ from core.permissions import ProductPermission, ProductSubAPIPermission
 from core.resources.product_resource import ProductResource
 from core.serializers.product_serializer import ProductSerializer
 from core.views.mixins.company_mixin import CompanyMixin
+from core.views.mixins.product_etag_mixin import ProductETagMixin
 
 
 class ProductExportViewSet(
     CompanyMixin,
+    ProductETagMixin,
     viewsets.GenericViewSet
 ):
     """
     Manages product exports in various formats including AAS AASX, AAS XML, AAS JSON, SCSN XML, CSV, and XLSX.
+
+    Every export of a product is audited as an access, including conditional exports answered with 304 Not Modified,
+     as the client still gets to use the data it holds.
     """
     http_method_names = ["get", "post", "put", "patch", "delete", "head", "options"]
     queryset = Product.objects.all()
@@ -55,17 +60,26 @@ class ProductExportViewSet(
 
         Returns:
             FileResponse: A downloadable AASX file.
+            HttpResponseNotModified: If the file has not changed since the `ETag` in `If-None-Match`.
         """
         product = self.get_object()
+        etag = self.get_product_etag(product)
+        not_modified = self.get_not_modified_response(etag)
+        if not_modified is not None:
+            LogEntry.objects.log_create(instance=product, force_log=True, action=LogEntry.Action.ACCESS,
+                                        changes_text="Exported to AAS AASX format (not modified)")
+            return not_modified
         file = product.export_to_aas_aasx()
         validate_aas_aasx(file)
         LogEntry.objects.log_create(instance=product, force_log=True, action=LogEntry.Action.ACCESS, changes_text="Exported to AAS AASX format")
-        return FileResponse(
+        response = FileResponse(
             file,
             as_attachment=True,
             filename=f"{product.name}_aas.aasx",
             content_type="application/asset-administration-shell-package",
         )
+        response["ETag"] = etag
+        return response
 
     @extend_schema(
         tags=["Products"],
@@ -93,17 +107,26 @@ class ProductExportViewSet(
 
         Returns:
             FileResponse: A downloadable XML file.
+            HttpResponseNotModified: If the file has not changed since the `ETag` in `If-None-Match`.
         """
         product = self.get_object()
+        etag = self.get_product_etag(product)
+        not_modified = self.get_not_modified_response(etag)
+        if not_modified is not None:
+            LogEntry.objects.log_create(instance=product, force_log=True, action=LogEntry.Action.ACCESS,
+                                        changes_text="Exported to AAS XML format (not modified)")
+            return not_modified
         file = product.export_to_aas_xml()
         validate_aas_xml(file)
         LogEntry.objects.log_create(instance=product, force_log=True, action=LogEntry.Action.ACCESS, changes_text="Exported to AAS XML format")
-        return FileResponse(
+        response = FileResponse(
             file,
             as_attachment=True,
             filename=f"{product.name}_aas.xml",
             content_type="application/xml",
         )
+        response["ETag"] = etag
+        return response
 
     @extend_schema(
         tags=["Products"],
@@ -131,17 +154,26 @@ class ProductExportViewSet(
 
         Returns:
             FileResponse: A downloadable JSON file.
+            HttpResponseNotModified: If the file has not changed since the `ETag` in `If-None-Match`.
         """
         product = self.get_object()
+        etag = self.get_product_etag(product)
+        not_modified = self.get_not_modified_response(etag)
+        if not_modified is not None:
+            LogEntry.objects.log_create(instance=product, force_log=True, action=LogEntry.Action.ACCESS,
+                                        changes_text="Exported to AAS JSON format (not modified)")
+            return not_modified
         file = product.export_to_aas_json()
         validate_aas_json(file)
         LogEntry.objects.log_create(instance=product, force_log=True, action=LogEntry.Action.ACCESS, changes_text="Exported to AAS JSON format")
-        return FileResponse(
+        response = FileResponse(
             file,
             as_attachment=True,
             filename=f"{product.name}_aas.json",
             content_type="application/json",
         )
+        response["ETag"] = etag
+        return response
 
     @extend_schema(
         tags=["Products"],
@@ -170,16 +202,25 @@ class ProductExportViewSet(
 
         Returns:
             FileResponse: A downloadable XML file containing partial SCSN PCF data.
+            HttpResponseNotModified: If the file has not changed since the `ETag` in `If-None-Match`.
         """
         product = self.get_object()
+        etag = self.get_product_etag(product)
+        not_modified = self.get_not_modified_response(etag)
+        if not_modified is not None:
+            LogEntry.objects.log_create(instance=product, force_log=True, action=LogEntry.Action.ACCESS,
+                                        changes_text="Exported to SCSN XML format (partial) (not modified)")
+            return not_modified
         file = product.export_to_scsn_pcf_xml()
         LogEntry.objects.log_create(instance=product, force_log=True, action=LogEntry.Action.ACCESS, changes_text="Exported to SCSN XML format (partial)")
-        return FileResponse(
+        response = FileResponse(
             file,
             as_attachment=True,
             filename=f"{product.name}_scsn_pcf.xml",
             content_type="application/xml",
         )
+        response["ETag"] = etag
+        return response
 
     @extend_schema(
         tags=["Products"],
@@ -207,16 +248,25 @@ class ProductExportViewSet(
 
         Returns:
             FileResponse: A downloadable XML file containing full SCSN PCF data with placeholders.
+            HttpResponseNotModified: If the file has not changed since the `ETag` in `If-None-Match`.
         """
         product = self.get_object()
+        etag = self.get_product_etag(product)
+        not_modified = self.get_not_modified_response(etag)
+        if not_modified is not None:
+            LogEntry.objects.log_create(instance=product, force_log=True, action=LogEntry.Action.ACCESS,
+                                        changes_text="Exported to SCSN XML format (full) (not modified)")
+            return not_modified
         file = product.export_to_scsn_full_xml()
         LogEntry.objects.log_create(instance=product, force_log=True, action=LogEntry.Action.ACCESS, changes_text="Exported to SCSN XML format (full)")
-        return FileResponse(
+        response = FileResponse(
             file,
             as_attachment=True,
             filename=f"{product.name}_scsn_full.xml",
             content_type="application/xml",
         )
+        response["ETag"] = etag
+        return response
 
     @extend_schema(
         tags=["Products"],
@@ -243,17 +293,26 @@ class ProductExportViewSet(
 
         Returns:
             FileResponse: A downloadable ZIP archive of the product's data.
+            HttpResponseNotModified: If the file has not changed since the `ETag` in `If-None-Match`.
         """
         product = self.get_object()
+        etag = self.get_product_etag(product)
+        not_modified = self.get_not_modified_response(etag)
+        if not_modified is not None:
+            LogEntry.objects.log_create(instance=product, force_log=True, action=LogEntry.Action.ACCESS,
+                                        changes_text="Exported to ZIP (not modified)")
+            return not_modified
         file = product.export_to_zip()
         LogEntry.objects.log_create(instance=product, force_log=True, action=LogEntry.Action.ACCESS,
                                     changes_text="Exported to ZIP")
-        return FileResponse(
+        response = FileResponse(
             file,
             as_attachment=True,
             filename=f"{product.name}.zip",
             content_type="application/zip",
         )
+        response["ETag"] = etag
+        return response
 
 
 
@@ -7,10 +7,12 @@ from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from core.models import Company, ProductSharingRequest, ProductSharingRequestStatus
+from core.models import Company, ProductSharingRequest, ProductSharingRequestStatus, ProductEmissionCache
+from core.pagination import KeysetPagination
 from core.permissions import IsCompanyMember
 from core.serializers.product_sharing_request_serializer import ProductSharingRequestSerializer
 from core.serializers.bulk_action_serializer import BulkActionSerializer
+from core.services.request_context import RequestContext
 from core.views.mixins.company_mixin import CompanyMixin
 
 
@@ -28,7 +30,8 @@ from core.views.mixins.company_mixin import CompanyMixin
     list=extend_schema(
         tags=["Product sharing requests"],
         summary="Retrieve all product sharing requests",
-        description="Retrieve the details of all product sharing requests for the company with `company_pk`."
+        description="Retrieve the details of all product sharing requests for the company with `company_pk`, "
+                    "newest first. Requests are paginated by a cursor if `page_size` or `cursor` is given."
     )
 )
 class ProductSharingRequestViewSet(
@@ -44,6 +47,8 @@ class ProductSharingRequestViewSet(
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["status"]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-created_at", "-id")
 
     def get_serializer_class(self):
         """
@@ -76,7 +81,7 @@ class ProductSharingRequestViewSet(
 
         # Then enforce company membership
         company = self.get_parent_company()
-        if not company.user_is_member(request.user):
+        if not RequestContext.for_request(request).is_member(company):
             self.permission_denied(
                 request,
                 message='You are not a member of this company.'
@@ -102,6 +107,8 @@ class ProductSharingRequestViewSet(
         """
         qs = self.get_queryset().filter(id__in=request.data.get("ids"))
         updated = qs.update(status=ProductSharingRequestStatus.ACCEPTED)
+        # QuerySet.update() bypasses the signals, so the affected PCFs are invalidated explicitly
+        ProductEmissionCache.invalidate(qs.values_list("product_id", flat=True))
         for psr in qs:
             LogEntry.objects.log_create(instance=self.get_parent_company(), force_log=True, action=LogEntry.Action.UPDATE,
                                         changes_text=f"Approved product emissions sharing request for product {psr.product.name} from {psr.product.supplier.name}.")
@@ -127,6 +134,8 @@ class ProductSharingRequestViewSet(
         """
         qs = self.get_queryset().filter(id__in=request.data.get("ids"))
         updated = qs.update(status=ProductSharingRequestStatus.REJECTED)
+        # QuerySet.update() bypasses the signals, so the affected PCFs are invalidated explicitly
+        ProductEmissionCache.invalidate(qs.values_list("product_id", flat=True))
         for psr in qs:
             LogEntry.objects.log_create(instance=self.get_parent_company(), force_log=True, action=LogEntry.Action.UPDATE,
                                         changes_text=f"Denied product emissions sharing request for product {psr.product.name} from {psr.product.supplier.name}.")
@@ -1,3 +1,5 @@
+from dataclasses import replace
+
 from auditlog.models import LogEntry
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Q
@@ -5,20 +7,38 @@ from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.exceptions import ValidationError, PermissionDenied
+from rest_framework.exceptions import ValidationError, PermissionDenied, NotFound
 from rest_framework.filters import SearchFilter
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 from rest_framework.response import Response
 
-from core.models import Product, Company, TransportEmission, UserEnergyEmission, ProductionEnergyEmission
+from core.models import Product, Company, TransportEmission, UserEnergyEmission, ProductionEnergyEmission, \
+    ProductEmissionCache, ProductEmissionSnapshot
+from core.filters import ProductFilter
 from core.models.ai_conversation_log import AIConversationLog
+from core.pagination import KeysetPagination, KEYSET_PAGINATION_PARAMETERS
 from core.permissions import ProductPermission, ProductSubAPIPermission
 from core.serializers.ai_conversation_log_serializer import AIConversationLogSerializer
 from core.serializers.audit_log_entry_serializer import AuditLogEntrySerializer
-from core.serializers.emission_trace_serializer import EmissionTraceSerializer
+from core.serializers.emission_trace_serializer import EmissionTraceSerializer, EmissionTraceNodeSerializer
+from core.serializers.product_emission_snapshot_serializer import EmissionHistoryQuerySerializer, \
+    ProductEmissionSnapshotSerializer
+from core.serializers.product_emission_totals_serializer import ProductEmissionTotalsRequestSerializer, \
+    ProductEmissionTotalsSerializer
 from core.serializers.product_serializer import ProductSerializer
 from core.serializers.product_sharing_request_serializer import ProductSharingRequestRequestAccessSerializer
+from core.serializers.product_where_used_serializer import ProductWhereUsedSerializer
+from core.serializers.scenario_serializer import ScenarioRequestSerializer, ScenarioResponseSerializer, \
+    ScenarioSerializer
+from core.serializers.sparse_fieldset_mixin import SPARSE_FIELDSET_PARAMETERS
+from core.serializers.trace_diff_serializer import TraceDiffRequestSerializer, TraceDiffSerializer
 from core.services.ai_service import generate_ai_response
+from core.services import bom_closure
+from core.services.bom_graph import BoMGraph
+from core.services.request_context import RequestContext
+from core.services.scenarios import ScenarioEngine
+from core.services.trace_diff import diff_traces
 from core.views.product_export_view_set import ProductExportViewSet
 from core.views.product_import_view_set import ProductImportViewSet
 
@@ -42,12 +62,22 @@ from core.views.product_import_view_set import ProductImportViewSet
     list=extend_schema(
         tags=["Products"],
         summary="Retrieve all products",
-        description="Retrieve the details of all products with `company_pk` as the supplier.",
+        description="Retrieve the details of all products with `company_pk` as the supplier. "
+                    "Products can be filtered by ranges of their emission totals and BoM size (e.g. "
+                    "`emission_total_min`, `line_item_count_max`) and ordered by them "
+                    "(e.g. `ordering=-emission_total`) if their emissions are visible to the current user. "
+                    "There is no filter or ordering by the emissions of a single lifecycle stage; the emissions "
+                    "per stage of a product are returned by `emission_traces`. "
+                    "The returned fields can be chosen with `fields` and `omit`. "
+                    "Products are paginated by a cursor if `page_size` or `cursor` is given.",
+        parameters=SPARSE_FIELDSET_PARAMETERS,
     ),
     retrieve=extend_schema(
         tags=["Products"],
         summary="Retrieve a specific product",
-        description="Retrieve the details of a specific product by its ID.",
+        description="Retrieve the details of a specific product by its ID. "
+                    "The returned fields can be chosen with `fields` and `omit`.",
+        parameters=SPARSE_FIELDSET_PARAMETERS,
     ),
     partial_update=extend_schema(
         tags=["Products"],
@@ -83,8 +113,36 @@ class ProductViewSet(
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated, ProductPermission]
     filter_backends = [DjangoFilterBackend, SearchFilter]
-    filterset_fields = ['name', 'description', 'manufacturer_name', 'sku', 'is_public']
+    filterset_class = ProductFilter
     search_fields = ['name', 'description', 'manufacturer_name', 'sku']
+    pagination_class = KeysetPagination
+
+    def get_keyset_ordering(self) -> tuple:
+        """
+        Returns the ordering of paginated product lists, which is the one requested with `ordering` or else by name,
+         made unique by the id.
+
+        Returns:
+            tuple of field names, descending ones prefixed with "-"
+        """
+        ordering = ProductFilter.get_ordering(self.request.query_params)
+        if ordering:
+            return *ordering, "id"
+        return "supplier_id", "name", "id"
+
+    def filter_queryset(self, queryset):
+        """
+        Applies the filters and the ordering of the request to lists of products only. Single products are looked up
+         unfiltered, as filtering them by the summary columns would reveal emissions that are hidden from the user.
+
+        Args:
+            queryset: queryset of products
+        Returns:
+            QuerySet: the filtered queryset for the list action, otherwise the queryset as it is
+        """
+        if self.action != "list":
+            return queryset
+        return super().filter_queryset(queryset)
 
     def get_serializer_class(self):
         """
@@ -94,10 +152,20 @@ class ProductViewSet(
             return ProductSharingRequestRequestAccessSerializer
         if self.action in ["emission_traces"]:
             return EmissionTraceSerializer
+        if self.action in ["emission_totals"]:
+            return ProductEmissionTotalsRequestSerializer
         if self.action in ["ai"]:
             return AIConversationLogSerializer
         if self.action in ["audit"]:
             return AuditLogEntrySerializer
+        if self.action in ["where_used"]:
+            return ProductWhereUsedSerializer
+        if self.action in ["scenarios"]:
+            return ScenarioRequestSerializer
+        if self.action in ["emission_history"]:
+            return ProductEmissionSnapshotSerializer
+        if self.action in ["emission_trace_diff"]:
+            return TraceDiffRequestSerializer
         return super().get_serializer_class()
 
     def get_queryset(self):
@@ -108,14 +176,63 @@ class ProductViewSet(
             QuerySet: A queryset of Product instances.
         """
         company = self.get_parent_company()
-        qs = Product.objects.filter(supplier=company)
-        user = self.request.user
+        # The supplier and the emission totals are shown for every product
+        qs = Product.objects.filter(supplier=company).select_related("supplier", "emission_cache")
 
         # If listing with a non-member user, only show public
-        if self.request.method in SAFE_METHODS and not company.user_is_member(user):
+        if ((self.request.method in SAFE_METHODS or self.action == "emission_totals")
+                and not RequestContext.for_request(self.request).is_member(company)):
             return qs.filter(is_public=True)
         return qs
 
+    def list(self, request, *args, **kwargs):
+        """
+        Lists the products of the parent company. Filtering and ordering by emission totals or BoM size run on the
+         summary columns of the products (see ProductFilter), whose stale entries are first recomputed in a single
+         pass (see ProductEmissionCache.validate_all).
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments, including the parent company's primary key.
+
+        Returns:
+            Response: An HTTP 200 OK response containing the serialized products.
+
+        Raises:
+            PermissionDenied: If the summary columns are used but the emissions of the products are not visible.
+        """
+        if ProductFilter.uses_summary(request.query_params):
+            company = self.get_parent_company()
+            if not (RequestContext.for_request(request).is_member(company)
+                    or company.auto_approve_product_sharing_requests):
+                raise PermissionDenied("The emissions of the products of this company are not visible to you.")
+            ProductEmissionCache.validate_all(self.get_queryset())
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieves the details of a specific product, unless they have not changed since the `ETag` in
+         `If-None-Match`.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments, including the product's primary key.
+
+        Returns:
+            Response: An HTTP 200 OK response containing the serialized product.
+            HttpResponseNotModified: If the product has not changed since the `ETag` in `If-None-Match`.
+        """
+        product = self.get_object()
+        serializer = self.get_serializer(product)
+        # Whether the emissions are shown depends on the user
+        etag = self.get_product_etag(product, serializer._can_see_emissions(product))
+        not_modified = self.get_not_modified_response(etag)
+        if not_modified is not None:
+            return not_modified
+        return Response(serializer.data, headers={"ETag": etag})
+
     def perform_create(self, serializer):
         """
         Performs the creation of a new product, associating it with the parent company as the supplier.
@@ -156,7 +273,7 @@ class ProductViewSet(
         requester = Company.objects.get(pk=serializer.data.get("requester"))
         user = request.user
 
-        if not requester.user_is_member(user):
+        if not RequestContext.for_request(request).is_member(requester):
             raise PermissionDenied("You are not a member of the requesting company.")
 
         # Try to request access
@@ -175,27 +292,361 @@ class ProductViewSet(
         tags=["Products"],
         summary="Get emission traces for a product",
         description=(
-            "Retrieve the emission traces for a specific product by its ID."
-        )
+            "Retrieve the emission traces for a specific product by its ID. "
+            "Without `depth` and `expand` the complete tree is returned. "
+            "With either of them, only the node `expand` (the root by default) and its children up to `depth` levels "
+            "(1 by default) are returned. Every node then has an `id` that can be passed as `expand` to load the "
+            "children that were left out."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="depth",
+                type=int,
+                location="query",
+                required=False,
+                description="Number of levels of children to return below the requested node",
+            ),
+            OpenApiParameter(
+                name="expand",
+                type=str,
+                location="query",
+                required=False,
+                description="`id` of the node to return, as returned by a previous request",
+            ),
+        ],
     )
     @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated, ProductPermission])
     def emission_traces(self, request, *args, **kwargs):
         """
-        Retrieves the complete emission trace for a specific product.
+        Retrieves the emission trace for a specific product, either completely or only a part of it.
 
         Args:
-            request (HttpRequest): The HTTP request object.
+            request (HttpRequest): The HTTP request object, optionally with `depth` and `expand` query parameters.
             *args: Variable length argument list.
             **kwargs: Arbitrary keyword arguments, including the product's primary key.
 
         Returns:
             Response: An HTTP 200 OK response containing the serialized emission trace data.
+            HttpResponseNotModified: If the trace has not changed since the `ETag` in `If-None-Match`.
+
+        Raises:
+            ValidationError: If `depth` is not a non-negative integer.
+            NotFound: If there is no node with the `expand` id.
         """
         product = self.get_object()
+        etag = self.get_product_etag(product)
+        not_modified = self.get_not_modified_response(etag)
+        if not_modified is not None:
+            return not_modified
         emission_trace = product.get_emission_trace()
-        serializer = self.get_serializer(emission_trace)
+        depth = request.query_params.get("depth")
+        expand = request.query_params.get("expand")
+        if depth is None and expand is None:
+            serializer = self.get_serializer(emission_trace)
+            return Response(serializer.data, headers={"ETag": etag})
+
+        try:
+            depth = 1 if depth is None else int(depth)
+        except ValueError:
+            depth = -1
+        if depth < 0:
+            raise ValidationError({"depth": "Must be a non-negative integer."})
+
+        node_id = expand or emission_trace.node_id
+        node = emission_trace.find_node(node_id)
+        if node is None:
+            raise NotFound(f"Emission trace node {node_id} not found.")
+        serializer = EmissionTraceNodeSerializer(
+            node,
+            context={**self.get_serializer_context(), "node_id": node_id, "depth": depth},
+        )
+        return Response(serializer.data, headers={"ETag": etag})
+
+    @extend_schema(
+        tags=["Products"],
+        summary="Get emission totals for many products",
+        description=(
+            "Retrieve the emission totals of many products of the company with `company_pk` at once. "
+            "`ids` is a list of product IDs or `\"all\"` for all products. "
+            "Totals are null for products whose emissions are not visible to the current user."
+        ),
+        request=ProductEmissionTotalsRequestSerializer,
+        responses=ProductEmissionTotalsSerializer(many=True),
+    )
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated])
+    def emission_totals(self, request, *args, **kwargs):
+        """
+        Calculates the emission totals of many products in a single pass over their combined BoM.
+
+        Args:
+            request (HttpRequest): The HTTP request object containing the product IDs.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments, including the parent company's primary key.
+
+        Returns:
+            Response: An HTTP 200 OK response containing the emission totals of the products.
+
+        Raises:
+            ValidationError: If some of the requested products do not exist or are not visible.
+        """
+        request_serializer = self.get_serializer(data=request.data)
+        request_serializer.is_valid(raise_exception=True)
+        ids = request_serializer.validated_data["ids"]
+
+        products = self.get_queryset().select_related("supplier")
+        if ids != "all":
+            products = products.filter(pk__in=ids)
+        products = list(products)
+        if ids != "all":
+            missing = set(ids) - {product.pk for product in products}
+            if missing:
+                raise ValidationError({"ids": f"Products not found: {sorted(missing)}"})
+
+        serializer = ProductEmissionTotalsSerializer(products, many=True, context=self.get_serializer_context())
+        visible_ids = [product.pk for product in products if serializer.child._can_see_emissions(product)]
+        graph = BoMGraph.load(visible_ids)
+        serializer.context["emission_totals"] = graph.get_all_emission_totals(visible_ids)
+        return Response(serializer.data)
+
+    @extend_schema(
+        tags=["Products"],
+        summary="Get the products using a product",
+        description=(
+            "Retrieve every product that uses a specific product in its BoM, at any depth, with the number of paths "
+            "to it and its cumulative quantity, ordered by depth. If `max_depth` is given, the number of paths and "
+            "the cumulative quantity only include the paths of at most `max_depth` levels. Only products that are "
+            "public or supplied by a company of the current user are returned. Action is available only to the "
+            "supplier's members."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="max_depth",
+                type=int,
+                location="query",
+                required=False,
+                description="Maximum number of BoM levels between the using product and the product along the "
+                            "shortest path",
+            ),
+            OpenApiParameter(
+                name="limit",
+                type=int,
+                location="query",
+                required=False,
+                description="Number of products to return per page, all products are returned if omitted",
+            ),
+            OpenApiParameter(
+                name="offset",
+                type=int,
+                location="query",
+                required=False,
+                description="Index of the first product to return",
+            ),
+        ],
+        responses=ProductWhereUsedSerializer(many=True),
+    )
+    @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated, ProductSubAPIPermission])
+    def where_used(self, request, *args, **kwargs):
+        """
+        Retrieves the products that use a specific product in their BoM, directly or indirectly, from the BoM closure.
+
+        Args:
+            request (HttpRequest): The HTTP request object, optionally with `max_depth`, `limit` and `offset` query
+             parameters.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments, including the product's primary key.
+
+        Returns:
+            Response: An HTTP 200 OK response containing the serialized using products, paginated if `limit` is given.
+
+        Raises:
+            ValidationError: If `max_depth` is not a positive integer.
+        """
+        product = self.get_object()
+        max_depth = request.query_params.get("max_depth")
+        if max_depth is not None:
+            try:
+                max_depth = int(max_depth)
+            except ValueError:
+                max_depth = 0
+            if max_depth < 1:
+                raise ValidationError({"max_depth": "Must be a positive integer."})
+
+        rows = bom_closure.where_used(product.pk, max_depth).filter(
+            Q(ancestor__is_public=True)
+            | Q(ancestor__supplier_id__in=RequestContext.for_request(request).member_company_ids)
+        )
+        paginator = LimitOffsetPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        results = rows if page is None else page
+        if max_depth is not None:
+            # The closure rows aggregate the paths of any depth
+            totals = bom_closure.depth_limited_totals(product.pk, max_depth)
+            results = [
+                {**row, "path_count": totals[row["ancestor_id"]][0],
+                 "cumulative_quantity": totals[row["ancestor_id"]][1]}
+                for row in results
+            ]
+        data = self.get_serializer(results, many=True).data
+        if page is None:
+            return Response(data)
+        return paginator.get_paginated_response(data)
+
+    @extend_schema(
+        tags=["Products"],
+        summary="Evaluate what-if scenarios for a product",
+        description=(
+            "Calculate the emission totals of a specific product for many hypothetical changes to its BoM at once, "
+            "without saving anything. Every scenario can change line item quantities, leave out line items, swap the "
+            "reference of emissions and override the emissions of products in the BoM. Scenarios can only change "
+            "the products of the supplier that are not part of the BoM of another company, and their line items and "
+            "emissions. Action is available only to the supplier's members."
+        ),
+        request=ScenarioRequestSerializer,
+        responses=ScenarioResponseSerializer,
+    )
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, ProductSubAPIPermission])
+    def scenarios(self, request, *args, **kwargs):
+        """
+        Evaluates scenarios against a single in-memory snapshot of the BoM of a product.
+
+        Args:
+            request (HttpRequest): The HTTP request object containing the scenarios.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments, including the product's primary key.
+
+        Returns:
+            Response: An HTTP 200 OK response containing the emission totals without changes and per scenario.
+
+        Raises:
+            ValidationError: If a scenario refers to objects that are not in the part of the BoM of the product owned by
+             its supplier.
+        """
+        product = self.get_object()
+        request_serializer = self.get_serializer(data=request.data)
+        request_serializer.is_valid(raise_exception=True)
+        scenarios = request_serializer.to_scenarios()
+
+        engine = ScenarioEngine.load(product.pk)
+        engine.prepare(scenarios)
+        serializer = ScenarioResponseSerializer({
+            "baseline": ("baseline", engine.baseline[product.pk]),
+            "scenarios": [(scenario.name, engine.evaluate(scenario)) for scenario in scenarios],
+        })
+        return Response(serializer.data)
+
+    @extend_schema(
+        tags=["Products"],
+        summary="Compare the emission trace of a product with another version",
+        description=(
+            "Compare the current emission trace of a specific product with a recorded PCF snapshot of it or with a "
+            "what-if scenario, and return only the nodes whose emissions per lifecycle stage, quantities or mentions "
+            "differ. Nodes are identified by the same paths as in the emission traces endpoint. Scenarios are limited "
+            "like in the scenarios endpoint. Action is available only to the supplier's members."
+        ),
+        request=TraceDiffRequestSerializer,
+        responses=TraceDiffSerializer,
+    )
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, ProductSubAPIPermission])
+    def emission_trace_diff(self, request, *args, **kwargs):
+        """
+        Compares the current emission trace of a product with a recorded snapshot or a scenario.
+
+        Args:
+            request (HttpRequest): The HTTP request object containing either a snapshot ID or a scenario.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments, including the product's primary key.
+
+        Returns:
+            Response: An HTTP 200 OK response containing the totals of both versions and the changed nodes.
+
+        Raises:
+            ValidationError: If the snapshot does not belong to the product, or the scenario is invalid or changes the
+             BoM of another company.
+        """
+        product = self.get_object()
+        request_serializer = self.get_serializer(data=request.data)
+        request_serializer.is_valid(raise_exception=True)
+        data = request_serializer.validated_data
+
+        if "snapshot" in data:
+            snapshot = ProductEmissionSnapshot.objects.filter(product=product, pk=data["snapshot"]).first()
+            if snapshot is None:
+                raise ValidationError({"snapshot": "Snapshot not found for this product."})
+            new = BoMGraph.load([product.pk]).get_emission_trace(product.pk)
+            # Snapshots only hold the emissions of the product itself
+            old = replace(new, emissions_subtotal=snapshot.emissions_vector, children=set())
+            max_depth = 0
+        else:
+            scenario = ScenarioSerializer.to_scenario(data["scenario"])
+            engine = ScenarioEngine.load(product.pk)
+            engine.prepare([scenario])
+            old = engine.graph.get_emission_trace(product.pk)
+            new = engine.trace(scenario)
+            max_depth = data.get("max_depth")
+
+        serializer = TraceDiffSerializer({
+            "old_total": old.total,
+            "new_total": new.total,
+            "nodes": diff_traces(old, new, max_depth),
+        })
         return Response(serializer.data)
 
+    @extend_schema(
+        tags=["Products"],
+        summary="Get the PCF history of a product",
+        description=(
+            "Retrieve every recorded change of the emissions of a specific product in chronological order, optionally "
+            "limited to a time range. Action is available only to the supplier's members."
+        ),
+        parameters=[
+            EmissionHistoryQuerySerializer,
+            OpenApiParameter(
+                name="limit",
+                type=int,
+                location="query",
+                required=False,
+                description="Number of snapshots to return per page, all snapshots are returned if omitted",
+            ),
+            OpenApiParameter(
+                name="offset",
+                type=int,
+                location="query",
+                required=False,
+                description="Index of the first snapshot to return",
+            ),
+        ],
+        responses=ProductEmissionSnapshotSerializer(many=True),
+    )
+    @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated, ProductSubAPIPermission])
+    def emission_history(self, request, *args, **kwargs):
+        """
+        Retrieves the recorded PCF snapshots of a specific product.
+
+        Args:
+            request (HttpRequest): The HTTP request object, optionally with `since`, `until`, `limit` and `offset`
+             query parameters.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments, including the product's primary key.
+
+        Returns:
+            Response: An HTTP 200 OK response containing the serialized snapshots, paginated if `limit` is given.
+
+        Raises:
+            ValidationError: If the time range is invalid.
+        """
+        product = self.get_object()
+        query = EmissionHistoryQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        # Make sure the current PCF has been recorded
+        ProductEmissionCache.validate_all(Product.objects.filter(pk=product.pk))
+        snapshots = ProductEmissionSnapshot.objects.filter(product=product).between(**query.validated_data)
+        paginator = LimitOffsetPagination()
+        page = paginator.paginate_queryset(snapshots, request, view=self)
+        if page is None:
+            return Response(self.get_serializer(snapshots, many=True).data)
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
     @extend_schema(
         tags=["Products"],
         summary="Request AI recommendations",
@@ -249,7 +700,9 @@ class ProductViewSet(
     @extend_schema(
         tags=["Products"],
         summary="Audit log for product",
-        description="Retrieve the audit log entries for a specific product, its BoM and its emissions.",
+        description="Retrieve the audit log entries for a specific product, its BoM and its emissions, newest first. "
+                    "Entries are paginated by a cursor if `page_size` or `cursor` is given.",
+        parameters=KEYSET_PAGINATION_PARAMETERS,
         responses=AuditLogEntrySerializer(many=True),
     )
     @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated, ProductSubAPIPermission], url_path="audit")
@@ -263,7 +716,8 @@ class ProductViewSet(
             **kwargs: Arbitrary keyword arguments, including the product's primary key.
 
         Returns:
-            Response: An HTTP 200 OK response containing the serialized audit log entries.
+            Response: An HTTP 200 OK response containing the serialized audit log entries, paginated if `page_size`
+             or `cursor` is given.
         """
         product = self.get_object()
 
@@ -292,6 +746,8 @@ class ProductViewSet(
         )
 
         logs = LogEntry.objects.filter(base_q).order_by("-timestamp")
-
-        serializer = self.get_serializer(logs, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        paginator = KeysetPagination(ordering=("-timestamp", "-id"))
+        page = paginator.paginate_queryset(logs, request, view=self)
+        if page is None:
+            return Response(self.get_serializer(logs, many=True).data, status=status.HTTP_200_OK)
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
\ No newline at end of file